@@ -1,4 +1,11 @@
 from .apis.tool import list_tools, load_tool
-from .search import search_tool
 
 __all__ = ['load_tool', 'list_tools', 'search_tool']
+
+
+def __getattr__(name):
+    # Import the search module on demand since it requires numpy.
+    if name == 'search_tool':
+        from .search import search_tool
+        return search_tool
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
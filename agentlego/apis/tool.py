@@ -1,24 +1,104 @@
+import ast
 import importlib
 import inspect
+from collections.abc import Mapping
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
 
 import agentlego.tools
-from agentlego.tools import BaseTool
 from agentlego.utils.cache import load_or_build_object
 
-NAMES2TOOLS = {}
+if TYPE_CHECKING:
+    from agentlego.tools import BaseTool
+
+
+def _static_description(module: str, class_name: str) -> Optional[str]:
+    """Read the description in ``DEFAULT_TOOLMETA`` of a tool class from the
+    source file, without importing the module."""
+    path = Path(agentlego.tools.__file__).parent.joinpath(
+        *module.lstrip('.').split('.')).with_suffix('.py')
+    try:
+        tree = ast.parse(path.read_text(encoding='utf-8'))
+    except (OSError, SyntaxError):
+        return None
+    for node in tree.body:
+        if not (isinstance(node, ast.ClassDef) and node.name == class_name):
+            continue
+        for stmt in node.body:
+            if (isinstance(stmt, ast.Assign)
+                    and isinstance(stmt.value, ast.Call) and any(
+                        getattr(t, 'id', None) == 'DEFAULT_TOOLMETA'
+                        for t in stmt.targets)):
+                for keyword in stmt.value.keywords:
+                    if keyword.arg == 'description':
+                        try:
+                            return ast.literal_eval(keyword.value)
+                        except ValueError:
+                            return None
+    return None
+
+
+class ToolRegistry(Mapping):
+    """A mapping from tool names to tool classes, which imports the tool
+    modules lazily.
+
+    The built-in tools are declared in :data:`agentlego.tools.TOOL_MODULES`
+    and their modules are imported at the first access.
+    """
+
+    def __init__(self, modules: Optional[Dict[str, str]] = None):
+        self._modules = dict(modules or {})
+        self._classes = {}
+        self._descriptions = {}
+
+    def register(self, name: str, tool_cls: type):
+        self._modules.pop(name, None)
+        self._classes[name] = tool_cls
+
+    def __getitem__(self, name: str) -> type:
+        if name not in self._classes:
+            if name not in self._modules:
+                raise KeyError(name)
+            module = importlib.import_module(self._modules[name],
+                                             agentlego.tools.__name__)
+            self._classes[name] = getattr(module, name)
+        return self._classes[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self._classes or name in self._modules
+
+    def __iter__(self):
+        return iter(dict.fromkeys([*self._modules, *self._classes]))
+
+    def __len__(self) -> int:
+        return len(set(self._modules) | set(self._classes))
+
+    def description(self, name: str) -> str:
+        """Get the default description of a tool, without importing the tool
+        module if possible."""
+        if name in self._classes:
+            return self._classes[name].DEFAULT_TOOLMETA.description
+        if name not in self._descriptions:
+            description = _static_description(self._modules[name], name)
+            if description is None:
+                description = self[name].DEFAULT_TOOLMETA.description
+            self._descriptions[name] = description
+        return self._descriptions[name]
+
+
+NAMES2TOOLS = ToolRegistry(agentlego.tools.TOOL_MODULES)
 
 
 def register_all_tools(module):
+    from agentlego.tools import BaseTool
+
     if isinstance(module, str):
         module = importlib.import_module(module)
 
     for k, v in module.__dict__.items():
         if (isinstance(v, type) and issubclass(v, BaseTool)
                 and (v is not BaseTool)):
-            NAMES2TOOLS[k] = v
-
-
-register_all_tools(agentlego.tools)
+            NAMES2TOOLS.register(k, v)
 
 
 def list_tools(with_description=False):
@@ -39,8 +119,8 @@ def list_tools(with_description=False):
         ...     print(name, description)
     """
     if with_description:
-        return list((name, cls.DEFAULT_TOOLMETA.description)
-                    for name, cls in NAMES2TOOLS.items())
+        return list(
+            (name, NAMES2TOOLS.description(name)) for name in NAMES2TOOLS)
     else:
         return list(NAMES2TOOLS.keys())
 
@@ -49,7 +129,7 @@ def load_tool(tool_type: str,
               name: str = None,
               description: str = None,
               device=None,
-              **kwargs) -> BaseTool:
+              **kwargs) -> 'BaseTool':
     """Load a configurable callable tool for different task.
 
     Args:
@@ -83,7 +163,7 @@ def load_tool(tool_type: str,
                          'tools are:\n' + '\n'.join(NAMES2TOOLS.keys()))
 
     tool_type = NAMES2TOOLS[tool_type]
-    if 'device' in inspect.getfullargspec(tool_type).args:
+    if 'device' in inspect.signature(tool_type).parameters:
         kwargs['device'] = device
 
     if name or description:
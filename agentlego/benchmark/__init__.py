@@ -0,0 +1,8 @@
+from .fixtures import fixture_file, make_inputs
+from .runner import benchmark_tool, build_tool, run_benchmarks
+from .stubs import STUB_TOOLS
+
+__all__ = [
+    'fixture_file', 'make_inputs', 'benchmark_tool', 'build_tool',
+    'run_benchmarks', 'STUB_TOOLS'
+]
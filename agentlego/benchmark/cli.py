@@ -0,0 +1,232 @@
+"""Benchmark the latency, throughput, setup time and memory of tools.
+
+Examples:
+    # Benchmark the default tools, which run offline on CPU.
+    agentlego-bench --output before.json
+    # Compare with the results of another commit.
+    agentlego-bench --output after.json --compare before.json
+    # Benchmark the tools on a running tool server.
+    agentlego-bench --server http://127.0.0.1:16180
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+from typing import List, Optional
+
+from .runner import REMOTE_PREFIX, run_benchmarks
+
+# The tools that run offline on CPU without downloading any model.
+DEFAULT_TOOLS = [
+    'StubTextToText', 'StubImageToImage', 'Calculator', 'ImageToCanny'
+]
+
+# The metrics to compare, and whether a higher value is better.
+COMPARE_METRICS = {
+    'latency_ms.p50': False,
+    'latency_ms.p95': False,
+    'latency_ms.p99': False,
+    'throughput': True,
+    'setup_seconds': False,
+    'peak_rss_mb': False,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='agentlego-bench',
+        description=__doc__.split('\n')[0],
+        epilog=__doc__.split('\n', 1)[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        'tools',
+        type=str,
+        nargs='*',
+        help='The tools to benchmark, including the registered tools, the '
+        'stub tools and `remote:<domain>` tools. Defaults to the tools which '
+        'run offline on CPU, or all tools on the server if `--server` is '
+        'specified.')
+    parser.add_argument(
+        '--server', type=str, help='The url of the tool server.')
+    parser.add_argument('--device', type=str, default='cpu')
+    parser.add_argument(
+        '-n',
+        '--iterations',
+        type=int,
+        default=20,
+        help='The number of calls to measure the latency and the throughput.')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument(
+        '-c',
+        '--concurrency',
+        type=int,
+        default=4,
+        help='The number of concurrent callers to measure the throughput.')
+    parser.add_argument(
+        '--data-dir',
+        type=str,
+        help='The directory of the fixtures. Defaults to `tests/data`, and '
+        'synthetic fixtures are used if not found.')
+    parser.add_argument(
+        '--no-isolate',
+        action='store_true',
+        help='Benchmark all tools in the current process.')
+    parser.add_argument(
+        '-o', '--output', type=str, help='The path to save the results.')
+    parser.add_argument(
+        '--compare',
+        type=str,
+        help='The path of the baseline results to compare with.')
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.1,
+        help='The relative change to regard as a regression.')
+    parser.add_argument(
+        '--fail-on-regression',
+        action='store_true',
+        help='Exit with code 1 if any regression is found.')
+    return parser.parse_args(argv)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                                capture_output=True,
+                                text=True,
+                                timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def server_tools(server: str) -> List[str]:
+    from agentlego.tools.remote import default_session
+    response = default_session().get(server, timeout=(5, 30)).json()
+    return [REMOTE_PREFIX + info['domain'] for info in response]
+
+
+def _get(result: dict, metric: str):
+    for key in metric.split('.'):
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result
+
+
+def compare_results(baseline: dict,
+                    current: dict,
+                    threshold: float = 0.1) -> List[dict]:
+    """Compare the results of two benchmark runs.
+
+    Args:
+        baseline (dict): The baseline results, loaded from the output file.
+        current (dict): The current results.
+        threshold (float): The relative change to regard as a regression.
+            Defaults to 0.1.
+
+    Returns:
+        list[dict]: The comparison of every metric of the tools in both
+        results, with the relative change and whether it's a regression.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        for metric, higher_better in COMPARE_METRICS.items():
+            old, new = _get(base, metric), _get(result, metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = -change > threshold if higher_better \
+                else change > threshold
+            rows.append(
+                dict(
+                    tool=name,
+                    metric=metric,
+                    baseline=old,
+                    current=new,
+                    change=round(change, 4),
+                    regressed=regressed))
+    return rows
+
+
+def print_result(name: str, result: dict):
+    if 'error' in result:
+        print(f'{name:<24} ERROR {result["error"]}')
+        return
+    latency = result['latency_ms']
+    rss = result['peak_rss_mb']
+    print(
+        f'{name:<24} '
+        f'setup {result["setup_seconds"]:>8.3f}s  '
+        f'p50 {latency["p50"]:>9.2f}ms  '
+        f'p95 {latency["p95"]:>9.2f}ms  '
+        f'p99 {latency["p99"]:>9.2f}ms  '
+        f'{result["throughput"]:>8.2f} call/s  '
+        f'rss {"-" if rss is None else f"{rss:.0f}MiB"}',
+        flush=True)
+
+
+def print_comparison(rows: List[dict]):
+    print(f'\n{"tool":<24} {"metric":<16} {"baseline":>12} '
+          f'{"current":>12} {"change":>8}')
+    for row in rows:
+        mark = '  REGRESSION' if row['regressed'] else ''
+        print(f'{row["tool"]:<24} {row["metric"]:<16} '
+              f'{row["baseline"]:>12.3f} {row["current"]:>12.3f} '
+              f'{row["change"]:>+8.1%}{mark}')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    tools = args.tools
+    if not tools:
+        tools = server_tools(args.server) if args.server else DEFAULT_TOOLS
+
+    from agentlego.version import __version__
+    meta = dict(
+        version=__version__,
+        commit=git_commit(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        timestamp=datetime.datetime.now().isoformat(timespec='seconds'),
+        device=args.device,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        concurrency=args.concurrency,
+        isolate=not args.no_isolate,
+    )
+    results = run_benchmarks(
+        tools,
+        isolate=not args.no_isolate,
+        callback=print_result,
+        device=args.device,
+        server=args.server,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        concurrency=args.concurrency,
+        data_dir=args.data_dir,
+    )
+    output = dict(meta=meta, results=results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, output, args.threshold)
+        print_comparison(rows)
+        if args.fail_on_regression and any(r['regressed'] for r in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
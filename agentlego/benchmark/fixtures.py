@@ -0,0 +1,111 @@
+import os
+import os.path as osp
+import tempfile
+import wave
+from typing import Dict, Optional
+
+import numpy as np
+
+from agentlego.schema import Parameter
+
+DEFAULT_DATA_DIR = osp.join('tests', 'data')
+
+# The fixture file of every input category under the data directory.
+FIXTURE_FILES = {
+    'image': osp.join('images', 'dog.jpg'),
+    'audio': osp.join('audio', 'cat.wav'),
+}
+
+# The text inputs of the tools which don't accept arbitrary text, keyed by
+# the tool name.
+FIXTURE_TEXTS = {
+    'Calculator': '(3.5 + 2) * 12 / 7',
+    'GoogleSearch': 'AgentLego',
+}
+DEFAULT_TEXT = 'a dog sitting on the grass'
+
+FIXTURE_VALUES = {
+    'int': 1,
+    'float': 0.5,
+    'bool': True,
+}
+
+
+def _synthetic_image(path: str, size: int = 512):
+    import cv2
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    cv2.imwrite(path, image)
+
+
+def _synthetic_audio(path: str, seconds: float = 2., rate: int = 16000):
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 440 * t) * 0.3 * 32767).astype(np.int16)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+
+_SYNTHESIZERS = {
+    'image': ('.png', _synthetic_image),
+    'audio': ('.wav', _synthetic_audio),
+}
+
+
+def fixture_file(category: str, data_dir: Optional[str] = None) -> str:
+    """Get the fixture file of an input category.
+
+    Args:
+        category (str): The input category, "image" or "audio".
+        data_dir (str, optional): The directory of the test data. Defaults
+            to ``tests/data`` under the working directory. If the fixture
+            doesn't exist, a synthetic one is generated instead, so that the
+            benchmarks can run out of the source tree.
+
+    Returns:
+        str: The path of the fixture file.
+    """
+    data_dir = data_dir or DEFAULT_DATA_DIR
+    path = osp.join(data_dir, FIXTURE_FILES[category])
+    if osp.exists(path):
+        return path
+
+    suffix, synthesize = _SYNTHESIZERS[category]
+    path = osp.join(tempfile.gettempdir(), f'agentlego_bench_{category}'
+                    f'{suffix}')
+    if not osp.exists(path):
+        synthesize(path)
+    return path
+
+
+def make_inputs(tool_name: str,
+                parameters: Dict[str, Parameter],
+                data_dir: Optional[str] = None) -> dict:
+    """Build the keyword inputs to call a tool like an agent.
+
+    The inputs are in the agent types of :class:`DefaultParser`, like the
+    path of an image, and the optional parameters are left as default.
+
+    Args:
+        tool_name (str): The name of the tool, used to select the text
+            input.
+        parameters (dict[str, Parameter]): The parameters of the tool.
+        data_dir (str, optional): The directory of the test data.
+
+    Returns:
+        dict: The keyword inputs.
+    """
+    inputs = {}
+    for name, param in parameters.items():
+        if param.optional:
+            continue
+        if param.category in FIXTURE_FILES:
+            inputs[name] = os.path.abspath(
+                fixture_file(param.category, data_dir))
+        elif param.category in FIXTURE_VALUES:
+            inputs[name] = FIXTURE_VALUES[param.category]
+        else:
+            inputs[name] = FIXTURE_TEXTS.get(tool_name, DEFAULT_TEXT)
+    return inputs
@@ -0,0 +1,185 @@
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin
+
+import numpy as np
+
+from .fixtures import make_inputs
+from .stubs import STUB_TOOLS
+
+REMOTE_PREFIX = 'remote:'
+
+
+def peak_rss_mb() -> Optional[float]:
+    """The peak resident set size of the current process in MiB.
+
+    Returns None on the platforms without the :mod:`resource` module.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports in KiB and macOS reports in bytes.
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / scale, 1)
+
+
+def build_tool(name: str, device: str = 'cpu', server: Optional[str] = None):
+    """Build a tool to benchmark.
+
+    Args:
+        name (str): The class name of a registered tool, the name of a stub
+            tool in :data:`STUB_TOOLS`, or ``remote:<domain>`` for a tool on
+            the tool server.
+        device (str): The device to load the tool. Defaults to "cpu".
+        server (str, optional): The url of the tool server, required by
+            the remote tools. Defaults to None.
+    """
+    if name.startswith(REMOTE_PREFIX):
+        from agentlego.tools.remote import RemoteTool
+        assert server is not None, \
+            f'The server url is required to benchmark `{name}`.'
+        domain = name[len(REMOTE_PREFIX):]
+        return RemoteTool(urljoin(server.rstrip('/') + '/', domain))
+    elif name in STUB_TOOLS:
+        return STUB_TOOLS[name]()
+    else:
+        from agentlego.apis import load_tool
+        return load_tool(name, device=device)
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    latencies = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return dict(
+        mean=round(float(latencies.mean()), 3),
+        min=round(float(latencies.min()), 3),
+        p50=round(float(p50), 3),
+        p95=round(float(p95), 3),
+        p99=round(float(p99), 3),
+        max=round(float(latencies.max()), 3),
+    )
+
+
+def benchmark_tool(build: Callable,
+                   inputs: Optional[dict] = None,
+                   iterations: int = 20,
+                   warmup: int = 2,
+                   concurrency: int = 4,
+                   data_dir: Optional[str] = None) -> dict:
+    """Benchmark a tool in the current process.
+
+    The benchmark has four stages:
+
+    1. Build and setup the tool, which usually loads the model.
+    2. Call the tool ``warmup`` times, and record the first call.
+    3. Call the tool ``iterations`` times sequentially for the latency.
+    4. Call the tool ``iterations`` times by ``concurrency`` threads for the
+       throughput.
+
+    Args:
+        build (Callable): The function to build the tool.
+        inputs (dict, optional): The keyword inputs of the tool in the agent
+            types. Defaults to None, which means to generate from fixtures.
+        iterations (int): The number of calls of every stage. Defaults to 20.
+        warmup (int): The number of calls before measuring. Defaults to 2.
+        concurrency (int): The number of concurrent callers in the
+            throughput stage. Defaults to 4.
+        data_dir (str, optional): The directory of the fixtures.
+
+    Returns:
+        dict: The results, where the latencies are in milliseconds.
+    """
+    start = time.perf_counter()
+    tool = build()
+    tool.lazy_setup()
+    setup_seconds = time.perf_counter() - start
+
+    if inputs is None:
+        inputs = make_inputs(tool.name, tool.parameters, data_dir)
+
+    first_call_seconds = None
+    for i in range(warmup):
+        start = time.perf_counter()
+        tool(**inputs)
+        if i == 0:
+            first_call_seconds = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        tool(**inputs)
+        latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        start = time.perf_counter()
+        for _ in executor.map(lambda _: tool(**inputs), range(iterations)):
+            pass
+        wall = time.perf_counter() - start
+
+    return dict(
+        tool=tool.name,
+        setup_seconds=round(setup_seconds, 4),
+        first_call_seconds=(None if first_call_seconds is None else round(
+            first_call_seconds, 4)),
+        iterations=iterations,
+        latency_ms=_percentiles(latencies),
+        concurrency=concurrency,
+        throughput=round(iterations / wall, 3),
+        peak_rss_mb=peak_rss_mb(),
+    )
+
+
+def run_case(name: str,
+             device: str = 'cpu',
+             server: Optional[str] = None,
+             **kwargs) -> dict:
+    """Benchmark a tool by name, and record the error instead of raising.
+
+    Args:
+        name (str): The tool name, see :func:`build_tool`.
+        device (str): The device to load the tool. Defaults to "cpu".
+        server (str, optional): The url of the tool server.
+        **kwargs: The other arguments of :func:`benchmark_tool`.
+    """
+    try:
+        return benchmark_tool(
+            lambda: build_tool(name, device=device, server=server), **kwargs)
+    except Exception as e:
+        return dict(error=f'{type(e).__name__}: {e}')
+
+
+def run_benchmarks(names: List[str],
+                   isolate: bool = True,
+                   callback: Optional[Callable] = None,
+                   **kwargs) -> Dict[str, dict]:
+    """Benchmark multiple tools.
+
+    Args:
+        names (list[str]): The tool names, see :func:`build_tool`.
+        isolate (bool): Whether to benchmark every tool in a new process, so
+            that the setup time and the peak RSS aren't affected by the
+            models loaded by the other tools. Defaults to True.
+        callback (Callable, optional): Called with the name and the result
+            after every tool is finished. Defaults to None.
+        **kwargs: The other arguments of :func:`run_case`.
+
+    Returns:
+        dict: The results of every tool.
+    """
+    results = {}
+    for name in names:
+        if isolate:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                result = executor.submit(run_case, name, **kwargs).result()
+        else:
+            result = run_case(name, **kwargs)
+        results[name] = result
+        if callback is not None:
+            callback(name, result)
+    return results
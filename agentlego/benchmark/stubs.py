@@ -0,0 +1,81 @@
+"""Tools with trivial ``apply`` to measure the overhead around the models.
+
+The stub tools go through the same parser and IO conversions as the real
+tools, so that the regressions of the framework can be measured without
+downloading any model.
+"""
+import time
+
+from agentlego.parsers import DefaultParser
+from agentlego.schema import ToolMeta
+from agentlego.tools import BaseTool
+from agentlego.types import AudioIO, ImageIO
+
+
+class StubImageTool(BaseTool):
+    """Load the input image and return it as a new array."""
+
+    DEFAULT_TOOLMETA = ToolMeta(
+        name='StubImageToImage',
+        description='Return the input image.',
+        inputs=['image'],
+        outputs=['image'],
+    )
+
+    def __init__(self, toolmeta=DEFAULT_TOOLMETA, parser=DefaultParser):
+        super().__init__(toolmeta=toolmeta, parser=parser)
+
+    def apply(self, image: ImageIO) -> ImageIO:
+        return ImageIO(image.to_array().copy())
+
+
+class StubAudioTool(BaseTool):
+    """Load the input audio and return it as a new tensor."""
+
+    DEFAULT_TOOLMETA = ToolMeta(
+        name='StubAudioToAudio',
+        description='Return the input audio.',
+        inputs=['audio'],
+        outputs=['audio'],
+    )
+
+    def __init__(self, toolmeta=DEFAULT_TOOLMETA, parser=DefaultParser):
+        super().__init__(toolmeta=toolmeta, parser=parser)
+
+    def apply(self, audio: AudioIO) -> AudioIO:
+        return AudioIO(
+            audio.to_tensor().clone(), sampling_rate=audio.sampling_rate)
+
+
+class StubTextTool(BaseTool):
+    """Sleep to simulate a model and return the input text.
+
+    Args:
+        delay (float): The seconds to sleep in every call, which releases
+            the GIL like a model running on the device. Defaults to 0.01.
+    """
+
+    DEFAULT_TOOLMETA = ToolMeta(
+        name='StubTextToText',
+        description='Return the input text.',
+        inputs=['text'],
+        outputs=['text'],
+    )
+
+    def __init__(self,
+                 toolmeta=DEFAULT_TOOLMETA,
+                 parser=DefaultParser,
+                 delay: float = 0.01):
+        super().__init__(toolmeta=toolmeta, parser=parser)
+        self.delay = delay
+
+    def apply(self, text: str) -> str:
+        time.sleep(self.delay)
+        return text
+
+
+STUB_TOOLS = {
+    'StubImageToImage': StubImageTool,
+    'StubAudioToAudio': StubAudioTool,
+    'StubTextToText': StubTextTool,
+}
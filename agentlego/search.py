@@ -1,4 +1,8 @@
-from typing import List
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
 
 import numpy as np
 
@@ -6,13 +10,119 @@ from .apis.tool import list_tools
 from .utils import load_or_build_object
 
 
-def _cosine_similarity(a: np.array, b: np.array) -> list:
-    """Calculate the cosine similarity of a and b."""
-    dot_product = np.dot(b, a)
-    norm_a = np.linalg.norm(a)
-    norm_b = np.linalg.norm(b, axis=1)
-    res = dot_product / (norm_a * norm_b)
-    return res
+def _default_index_dir() -> str:
+    cache_home = os.getenv('XDG_CACHE_HOME', '~/.cache')
+    root = os.getenv('AGENTLEGO_HOME', os.path.join(cache_home, 'agentlego'))
+    return os.path.join(os.path.expanduser(root), 'search_index')
+
+
+class EmbeddingIndex:
+    """An index of the embeddings of tool descriptions.
+
+    The embeddings are indexed by the hash of descriptions, so that only the
+    new or modified descriptions are embedded when the tools change. The
+    index is persisted to ``{index_dir}/{model}.npz``.
+
+    Args:
+        model (str): The embedding model name, used as the index name.
+        embed_fn (Callable): The function to embed a list of texts into an
+            array of shape (N, C).
+        index_dir (str, optional): The directory to persist the index.
+            Defaults to None, which means ``$AGENTLEGO_HOME/search_index``
+            or ``~/.cache/agentlego/search_index``. If empty string, don't
+            persist the index.
+    """
+
+    def __init__(self,
+                 model: str,
+                 embed_fn: Callable[[List[str]], np.ndarray],
+                 index_dir: Optional[str] = None):
+        self.model = model
+        self.embed_fn = embed_fn
+        if index_dir is None:
+            index_dir = _default_index_dir()
+        self.path = None
+        if index_dir:
+            filename = model.replace('/', '--') + '.npz'
+            self.path = Path(index_dir) / filename
+
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._matrix_key = None
+        self._matrix = None
+        self._load()
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embed_fn(texts), dtype=np.float32)
+        norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norm, 1e-12)
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with np.load(self.path) as data:
+                self._vectors = dict(zip(data['keys'], data['vectors']))
+        except Exception:
+            # Rebuild a corrupted index.
+            self._vectors = {}
+
+    def _save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f'.{os.getpid()}.tmp.npz')
+        np.savez(
+            tmp_path,
+            keys=np.array(list(self._vectors)),
+            vectors=np.stack(list(self._vectors.values())))
+        os.replace(tmp_path, self.path)
+
+    def matrix(self, texts: Sequence[str]) -> np.ndarray:
+        """Get the normalized embeddings of texts in a matrix, and embed the
+        texts not in the index."""
+        keys = tuple(self._hash(text) for text in texts)
+        with self._lock:
+            if keys == self._matrix_key:
+                return self._matrix
+
+            missing = [
+                i for i, key in enumerate(keys) if key not in self._vectors
+            ]
+            if missing:
+                vectors = self._embed([texts[i] for i in missing])
+                for i, vector in zip(missing, vectors):
+                    self._vectors[keys[i]] = vector
+                self._save()
+
+            self._matrix = np.stack([self._vectors[key] for key in keys])
+            self._matrix_key = keys
+            return self._matrix
+
+    def search(self, query: str, texts: Sequence[str], topk=5) -> List[str]:
+        """Search the most similar texts to the query by cosine similarity.
+        """
+        matrix = self.matrix(texts)
+        similarity = matrix @ self._embed([query])[0]
+        topk = min(topk, len(texts))
+        indices = np.argpartition(-similarity, topk - 1)[:topk]
+        indices = indices[np.argsort(-similarity[indices])]
+        return [texts[i] for i in indices]
+
+
+_INDEXES: Dict[str, EmbeddingIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _get_index(model: str, embed_fn: Callable) -> EmbeddingIndex:
+    with _INDEXES_LOCK:
+        if model not in _INDEXES:
+            _INDEXES[model] = EmbeddingIndex(model, embed_fn)
+        return _INDEXES[model]
 
 
 def _search_with_openai(query,
@@ -42,12 +152,11 @@ def _search_with_openai(query,
             'please install openai to enable searching tools powered by '
             'openai')
 
-    embeddings = get_embeddings([query] + choices, engine=model)
-    similarity = _cosine_similarity(
-        np.array(embeddings[0]), np.array(embeddings[1:]))
+    def embed_fn(texts):
+        return get_embeddings(texts, engine=model)
 
-    indices = np.argsort(-similarity)[:topk]
-    return [choices[i] for i in indices]
+    index = _get_index(f'openai/{model}', embed_fn)
+    return index.search(query, choices, topk=topk)
 
 
 def _serach_with_sentence_transformers(
@@ -68,12 +177,12 @@ def _serach_with_sentence_transformers(
     """
     from sentence_transformers import SentenceTransformer
 
-    model = load_or_build_object(SentenceTransformer, model)
-    embeddings = model.encode([query] + choices)
-    similarity = _cosine_similarity(embeddings[0], embeddings[1:])
+    def embed_fn(texts):
+        encoder = load_or_build_object(SentenceTransformer, model)
+        return encoder.encode(texts)
 
-    indices = np.argsort(-similarity)[:topk]
-    return [choices[i] for i in indices]
+    index = _get_index(model, embed_fn)
+    return index.search(query, choices, topk=topk)
 
 
 def _search_with_thefuzz(query, choices, topk=5):
@@ -92,6 +201,11 @@ def search_tool(query: str, kind: str = 'thefuzz', topk=5) -> List[str]:
             "openai", and "st". Defaults to "thefuzz".
         topk (int): Return the top-k results. Defaults to 5.
 
+    Note:
+        For "openai" and "st", the embeddings of tool descriptions are
+        computed once and persisted by :class:`EmbeddingIndex`, and only the
+        query is embedded at every search.
+
     Examples:
         >>> from agentlego import search_tool
         >>> # use the thefuzz to search tools
@@ -1,29 +1,55 @@
-from .base import BaseTool
-from .calculator import Calculator
-from .image_canny import CannyTextToImage, ImageToCanny
-from .image_depth import DepthTextToImage, ImageToDepth
-from .image_editing import (ImageExpansion, ImageStylization, ObjectRemove,
-                            ObjectReplace)
-from .image_pose import HumanBodyPose, HumanFaceLandmark, PoseToImage
-from .image_scribble import ImageToScribble, ScribbleTextToImage
-from .image_text import ImageCaption, TextToImage
-from .imagebind import (AudioImageToImage, AudioTextToImage, AudioToImage,
-                        ThermalToImage)
-from .object_detection import ObjectDetection, TextToBbox
-from .ocr import OCR
-from .search import GoogleSearch
-from .segmentation import SegmentAnything, SegmentObject, SemanticSegmentation
-from .speech_text import SpeechToText, TextToSpeech
-from .translation import Translation
-from .vqa import VisualQuestionAnswering
+import importlib
 
-__all__ = [
-    'CannyTextToImage', 'ImageToCanny', 'DepthTextToImage', 'ImageToDepth',
-    'ImageExpansion', 'ObjectRemove', 'ObjectReplace', 'HumanFaceLandmark',
-    'HumanBodyPose', 'PoseToImage', 'ImageToScribble', 'ScribbleTextToImage',
-    'ImageCaption', 'TextToImage', 'VisualQuestionAnswering',
-    'ObjectDetection', 'TextToBbox', 'OCR', 'SegmentObject', 'SegmentAnything',
-    'SemanticSegmentation', 'ImageStylization', 'AudioToImage',
-    'ThermalToImage', 'AudioImageToImage', 'AudioTextToImage', 'SpeechToText',
-    'TextToSpeech', 'Translation', 'GoogleSearch', 'Calculator', 'BaseTool'
-]
+# The module of every tool. The tool modules are imported at the first
+# access of the tool classes, to keep `import agentlego` fast.
+TOOL_MODULES = {
+    'CannyTextToImage': '.image_canny.canny_to_image',
+    'ImageToCanny': '.image_canny.image_to_canny',
+    'DepthTextToImage': '.image_depth.depth_to_image',
+    'ImageToDepth': '.image_depth.image_to_depth',
+    'ImageExpansion': '.image_editing.expansion',
+    'ObjectRemove': '.image_editing.remove',
+    'ObjectReplace': '.image_editing.replace',
+    'HumanFaceLandmark': '.image_pose.facelandmark',
+    'HumanBodyPose': '.image_pose.image_to_pose',
+    'PoseToImage': '.image_pose.pose_to_image',
+    'ImageToScribble': '.image_scribble.image_to_scribble',
+    'ScribbleTextToImage': '.image_scribble.scribble_to_image',
+    'ImageCaption': '.image_text.image_to_text',
+    'TextToImage': '.image_text.text_to_image',
+    'VisualQuestionAnswering': '.vqa.visual_question_answering',
+    'ObjectDetection': '.object_detection.object_detection',
+    'TextToBbox': '.object_detection.text_to_bbox',
+    'OCR': '.ocr.ocr',
+    'SegmentObject': '.segmentation.segment_anything',
+    'SegmentAnything': '.segmentation.segment_anything',
+    'SemanticSegmentation': '.segmentation.semantic_segmentation',
+    'ImageStylization': '.image_editing.stylization',
+    'AudioToImage': '.imagebind.anything_to_image',
+    'ThermalToImage': '.imagebind.anything_to_image',
+    'AudioImageToImage': '.imagebind.anything_to_image',
+    'AudioTextToImage': '.imagebind.anything_to_image',
+    'SpeechToText': '.speech_text.speech_to_text',
+    'TextToSpeech': '.speech_text.text_to_speech',
+    'Translation': '.translation.translation',
+    'GoogleSearch': '.search.google',
+    'Calculator': '.calculator.python_calculator',
+}
+
+__all__ = list(TOOL_MODULES) + ['BaseTool']
+
+
+def __getattr__(name):
+    if name == 'BaseTool':
+        module = '.base'
+    elif name in TOOL_MODULES:
+        module = TOOL_MODULES[name]
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    obj = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = obj
+    return obj
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
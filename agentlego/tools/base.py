@@ -1,14 +1,26 @@
 import copy
 import inspect
+import threading
+import time
 from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
 from types import MethodType
-from typing import Any, Callable, Dict, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from agentlego.schema import Parameter, ToolMeta
+from agentlego.utils.batching import MicroBatcher
+from agentlego.utils.cache import cache_owner
+from .hooks import TOOL_HOOKS, payload_bytes, run_stage
 
 
 class BaseTool(metaclass=ABCMeta):
 
+    # Whether the tool always returns the same outputs for the same inputs,
+    # which allows to cache the results by :meth:`enable_result_cache`.
+    deterministic: bool = False
+    # The seconds to keep the cached results, None means never to expire.
+    result_ttl: Optional[float] = None
+
     def __init__(self, toolmeta: Union[dict, ToolMeta], parser: Callable):
         toolmeta = copy.deepcopy(toolmeta)
         if isinstance(toolmeta, dict):
@@ -16,6 +28,14 @@ class BaseTool(metaclass=ABCMeta):
         self.toolmeta = toolmeta
         self.set_parser(parser)
         self._is_setup = False
+        self._setup_lock = threading.RLock()
+        self._setup_attrs = set()
+        self._calls_lock = threading.Lock()
+        self._active_calls = 0
+        self._stale = False
+        self._batcher = None
+        self._result_cache = None
+        self._result_ttl = None
 
     @property
     def name(self) -> str:
@@ -42,24 +62,223 @@ class BaseTool(metaclass=ABCMeta):
         first call of ```apply()```, for example loading the model."""
         self._is_setup = True
 
-    def __call__(self, *args: Any, **kwargs) -> Any:
+    def lazy_setup(self):
+        """Setup the tool if it's not setup yet.
 
-        if not self._is_setup:
-            self.setup()
+        The objects loaded by :func:`load_or_build_object` during setup are
+        recorded, and the tool will be released if any of them is evicted
+        from the cache.
+        """
+        if self._is_setup:
+            return
+        # The tool is in use during setup, so that the objects loaded
+        # already are not evicted before the setup finishes.
+        with self.in_use(), self._setup_lock:
+            # Other threads may have finished the setup during waiting.
+            if self._is_setup:
+                return
+            attrs = set(self.__dict__)
+            with cache_owner(self):
+                if TOOL_HOOKS:
+                    run_stage(list(TOOL_HOOKS), self, 'setup', self.setup)
+                else:
+                    self.setup()
+            self._setup_attrs = set(self.__dict__) - attrs
             self._is_setup = True
 
-        inputs, kwinputs = self.parser.parse_inputs(*args, **kwargs)
+    def release(self):
+        """Drop the attributes created by :meth:`setup`, and the tool will
+        setup again at the next call."""
+        with self._setup_lock:
+            self._is_setup = False
+            self._stale = False
+            for attr in self._setup_attrs:
+                self.__dict__.pop(attr, None)
+            self._setup_attrs = set()
+
+    def _release_if_idle(self) -> bool:
+        """Release the tool unless it's in use or being setup, without
+        waiting for the setup lock. Otherwise, mark the tool stale and it
+        will be released when the last call exits."""
+        if not self._setup_lock.acquire(blocking=False):
+            self._stale = True
+            return False
+        try:
+            # Hold the calls lock during releasing, so that no call can pass
+            # the setup check of :meth:`lazy_setup` meanwhile.
+            with self._calls_lock:
+                if self._active_calls > 0:
+                    self._stale = True
+                    return False
+                self.release()
+                return True
+        finally:
+            self._setup_lock.release()
+
+    @contextmanager
+    def in_use(self):
+        """Mark the tool in use in the context, and the objects it loaded
+        won't be evicted from the cache meanwhile."""
+        with self._calls_lock:
+            self._active_calls += 1
+        try:
+            yield
+        finally:
+            with self._calls_lock:
+                self._active_calls -= 1
+                stale = self._stale and self._active_calls == 0
+            if stale:
+                self._release_if_idle()
+
+    def __call__(self, *args: Any, **kwargs) -> Any:
+        if TOOL_HOOKS:
+            return self._call_with_hooks(list(TOOL_HOOKS), args, kwargs)
+
+        with self.in_use():
+            self.lazy_setup()
+
+            inputs, kwinputs = self.parser.parse_inputs(*args, **kwargs)
+            outputs = self._apply(inputs, kwinputs)
+            results = self.parser.parse_outputs(outputs)
+        return results
 
-        outputs = self.apply(*inputs, **kwinputs)
+    def _call_with_hooks(self, hooks: list, args: tuple, kwargs: dict):
+        """The same as :meth:`__call__`, and call the hooks after every
+        stage."""
+        with self.in_use():
+            start = time.perf_counter()
+            input_bytes, output_bytes, error = 0, None, None
+            try:
+                self.lazy_setup()
 
-        results = self.parser.parse_outputs(outputs)
+                inputs, kwinputs = run_stage(hooks, self, 'parse_inputs',
+                                             self.parser.parse_inputs, *args,
+                                             **kwargs)
+                input_bytes = payload_bytes(inputs) + payload_bytes(kwinputs)
+                outputs = run_stage(hooks, self, 'apply', self._apply, inputs,
+                                    kwinputs)
+                output_bytes = payload_bytes(outputs)
+                results = run_stage(hooks, self, 'parse_outputs',
+                                    self.parser.parse_outputs, outputs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                for hook in hooks:
+                    hook.after_call(self, seconds, input_bytes, output_bytes,
+                                    error)
         return results
 
+    def _apply(self, inputs: tuple, kwinputs: dict) -> Any:
+        if self._result_cache is not None:
+            return self._result_cache.apply(
+                self,
+                inputs,
+                kwinputs,
+                self._apply_uncached,
+                ttl=self._result_ttl)
+        return self._apply_uncached(inputs, kwinputs)
+
+    def _apply_uncached(self, inputs: tuple, kwinputs: dict) -> Any:
+        if self._batcher is not None:
+            for arg, arg_name in zip(inputs, self.parameters):
+                kwinputs[arg_name] = arg
+            return self._batcher.submit(kwinputs)
+        return self.apply(*inputs, **kwinputs)
+
     @abstractmethod
     def apply(self, *args, **kwargs) -> Any:
         """Implement the actual function here."""
         raise NotImplementedError
 
+    def apply_batch(self, batch_inputs: List[dict]) -> list:
+        """Process a batch of inputs at once.
+
+        Override this method if the tool can handle multiple inputs more
+        efficiently than calling :meth:`apply` one by one, for example by
+        running the model on a batch.
+
+        Args:
+            batch_inputs (list[dict]): The keyword arguments of
+                :meth:`apply` for every request in the batch.
+
+        Returns:
+            list: The outputs of every request, in the same order.
+        """
+        return [self.apply(**inputs) for inputs in batch_inputs]
+
+    def enable_batching(self, max_batch_size: int = 8, max_wait: float = 0.01):
+        """Gather concurrent calls of the tool into batches and process them
+        by :meth:`apply_batch`. If a batch fails, its calls are processed by
+        :meth:`apply` one by one.
+
+        Args:
+            max_batch_size (int): The maximum number of calls in a batch.
+                Defaults to 8.
+            max_wait (float): The maximum seconds to wait for more calls
+                to form a batch. Defaults to 0.01.
+        """
+        self._batcher = MicroBatcher(
+            self.apply_batch,
+            max_batch_size=max_batch_size,
+            max_wait=max_wait,
+            single_fn=lambda inputs: self.apply(**inputs),
+        )
+
+    def disable_batching(self):
+        """Process every call by :meth:`apply` directly."""
+        self._batcher = None
+
+    def cache_config(self) -> dict:
+        """The configs which affect the outputs, used in the key of the
+        result cache.
+
+        Defaults to the arguments of ``__init__`` of simple types, which are
+        saved as the attributes of the same names, like the model name. The
+        other attributes, like the runtime states, are not included.
+        Override it if other configs affect the outputs.
+        """
+        from .result_cache import _is_simple
+        names = set()
+        for cls in type(self).__mro__:
+            if '__init__' in vars(cls):
+                names.update(inspect.signature(cls.__init__).parameters)
+        return {
+            k: v
+            for k, v in self.__dict__.items()
+            if k in names and k not in self._setup_attrs and _is_simple(v)
+        }
+
+    def enable_result_cache(self,
+                            cache=None,
+                            ttl: Optional[float] = None,
+                            force: bool = False):
+        """Reuse the outputs of the previous calls with the same inputs.
+
+        Args:
+            cache (ResultCache, optional): The cache to store the results.
+                Defaults to None, which means the cache shared by all tools,
+                see :func:`~agentlego.tools.result_cache.default_result_cache`.
+            ttl (float, optional): The seconds to keep the results. Defaults
+                to None, which means to use :attr:`result_ttl`. Use
+                ``float('inf')`` to never expire.
+            force (bool): Whether to cache the results even if the tool
+                isn't :attr:`deterministic`. Defaults to False.
+        """
+        from .result_cache import default_result_cache
+        if not (self.deterministic or force):
+            raise ValueError(f'The tool `{self.name}` is not deterministic, '
+                             'use `force=True` to cache its results anyway.')
+        if ttl is None:
+            ttl = self.result_ttl
+        self._result_ttl = None if ttl == float('inf') else ttl
+        self._result_cache = cache or default_result_cache()
+
+    def disable_result_cache(self):
+        """Call the tool without the result cache."""
+        self._result_cache = None
+
     def __repr__(self) -> str:
         repr_str = (f'{type(self).__name__}('
                     f'toolmeta={self.toolmeta}, '
@@ -87,6 +306,10 @@ class BaseTool(metaclass=ABCMeta):
         obj = object.__new__(type(self))
         obj.__dict__.update(self.__dict__)
         obj.toolmeta = copy.deepcopy(self.toolmeta)
+        obj._setup_lock = threading.RLock()
+        obj._calls_lock = threading.Lock()
+        obj._active_calls = 0
+        obj._stale = False
         obj.set_parser(self._parser_constructor)
         return obj
 
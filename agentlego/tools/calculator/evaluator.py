@@ -0,0 +1,227 @@
+"""Evaluate Python expressions in a pool of sandboxed worker processes.
+
+The worker processes are started once and reused by all calls. A worker
+evaluating an expression longer than the timeout, like ``9**9**9``, is
+killed and replaced, so that a runaway expression never keeps burning a
+core of the server. The workers also limit their memory usage.
+"""
+import builtins
+import json
+import math
+import os
+import queue
+import subprocess
+import sys
+import threading
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Optional
+
+# The namespace of the expressions, built once in every process.
+_MATH_METHODS = {
+    k: v
+    for k, v in math.__dict__.items() if not k.startswith('_')
+}
+NAMESPACE = {
+    'math': SimpleNamespace(**_MATH_METHODS),
+    'max': max,
+    'min': min,
+    'round': round,
+    'sum': sum,
+    **_MATH_METHODS,
+    '__builtins__': None,
+}
+
+
+@lru_cache(maxsize=1024)
+def _compile(expression: str):
+    return compile(expression, '<expression>', 'eval')
+
+
+def safe_eval(expression: str):
+    """Evaluate an expression with the functions in :mod:`math`.
+
+    The compiled code of the recent expressions is cached. Every expression
+    has its own local variables, so that it cannot affect the others.
+    """
+    return eval(_compile(expression), NAMESPACE, {})
+
+
+def _address_space() -> Optional[int]:
+    """The current virtual memory size of the process, Linux only."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def _limit_memory(max_memory: Optional[int]):
+    """Limit the memory the process can allocate besides what it uses."""
+    if not max_memory:
+        return
+    try:
+        import resource
+    except ImportError:  # Windows
+        return
+    current = _address_space()
+    if current is None:
+        return
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = current + max_memory
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _serve(max_memory: Optional[int]):
+    """The main loop of a worker process, which reads an expression from
+    every line of stdin, and writes the result to stdout as a JSON line."""
+    _limit_memory(max_memory)
+    for line in sys.stdin:
+        try:
+            response = dict(result=str(safe_eval(json.loads(line))))
+        except BaseException as e:
+            response = dict(error=type(e).__name__, message=str(e))
+        sys.stdout.write(json.dumps(response) + '\n')
+        sys.stdout.flush()
+
+
+def _rebuild_error(name: str, message: str) -> Exception:
+    cls = getattr(builtins, name, None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        return cls(message)
+    return RuntimeError(f'{name}: {message}')
+
+
+class _Worker:
+    """A worker process running this file as a script.
+
+    The worker only depends on the standard library, and starts in an
+    isolated interpreter without site packages, which takes tens of
+    milliseconds.
+    """
+
+    def __init__(self, max_memory: Optional[int]):
+        self.process = subprocess.Popen(
+            [sys.executable, '-I', '-S', __file__,
+             str(max_memory or 0)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1)
+        # Read the responses in a thread to wait them with a timeout.
+        self.responses = queue.Queue()
+        self._reader = threading.Thread(
+            target=self._read, name='CalculatorWorker', daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        with self.process.stdout:
+            for line in self.process.stdout:
+                self.responses.put(json.loads(line))
+        # The process exited.
+        self.responses.put(None)
+
+    def send(self, expression: str):
+        self.process.stdin.write(json.dumps(expression) + '\n')
+        self.process.stdin.flush()
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+        # The stdout is closed by the reader thread at EOF.
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+
+class EvaluatorPool:
+    """A pool of persistent worker processes to evaluate expressions.
+
+    Args:
+        workers (int): The number of worker processes, which is also the
+            number of expressions to evaluate concurrently. Defaults to 2.
+        max_memory (int, optional): The maximum bytes every worker can
+            allocate. Defaults to 512 MiB. If None, don't limit it.
+    """
+
+    def __init__(self,
+                 workers: int = 2,
+                 max_memory: Optional[int] = 512 << 20):
+        assert workers >= 1, '`workers` should be positive.'
+        self.max_memory = max_memory
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self) -> _Worker:
+        worker = _Worker(self.max_memory)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _replace_worker(self, worker: _Worker) -> _Worker:
+        with self._lock:
+            self._workers.discard(worker)
+        worker.kill()
+        return self._start_worker()
+
+    def evaluate(self, expression: str, timeout: float = 2.) -> str:
+        """Evaluate an expression in a worker process.
+
+        Args:
+            expression (str): The expression.
+            timeout (float): The maximum seconds of the evaluation, and the
+                worker is killed if exceeds. Defaults to 2.
+
+        Returns:
+            str: The string of the result.
+        """
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError('All calculator workers are busy.') from None
+
+        response = None
+        try:
+            worker.send(expression)
+            response = worker.responses.get(timeout=timeout)
+        except (queue.Empty, OSError):
+            pass
+        finally:
+            if response is None:
+                # Timeout, or the worker crashed like exceeding the memory.
+                worker = self._replace_worker(worker)
+            self._idle.put(worker)
+
+        if response is None:
+            raise TimeoutError(
+                f'Failed to evaluate the expression in {timeout} seconds.')
+        if 'error' in response:
+            raise _rebuild_error(response['error'], response['message'])
+        return response['result']
+
+    def close(self):
+        """Kill all worker processes."""
+        with self._lock:
+            workers, self._workers = self._workers, set()
+        for worker in workers:
+            worker.kill()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+if __name__ == '__main__':
+    _serve(int(sys.argv[1]) or None)
@@ -1,39 +1,29 @@
-import math
-from typing import Callable, Union
-
-import addict
-from func_timeout import func_timeout
+from typing import Callable, Optional, Union
 
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
+from agentlego.utils import load_or_build_object
 from ..base import BaseTool
-
-
-def safe_eval(expr):
-    math_methods = {
-        k: v
-        for k, v in math.__dict__.items() if not k.startswith('_')
-    }
-    allowed_methods = {
-        'math': addict.Addict(math_methods),
-        'max': max,
-        'min': min,
-        'round': round,
-        'sum': sum,
-        **math_methods,
-    }
-    allowed_methods['__builtins__'] = None
-    return eval(expr, allowed_methods, allowed_methods)
+from .evaluator import EvaluatorPool, safe_eval  # noqa: F401
 
 
 class Calculator(BaseTool):
     """A calculator based on Python expression.
 
+    The expressions are evaluated in a pool of worker processes shared by
+    all calculators of the same settings, and the worker is killed if the
+    evaluation exceeds the timeout.
+
     Args:
         toolmeta (dict | ToolMeta): The meta info of the tool. Defaults to
             the :attr:`DEFAULT_TOOLMETA`.
         parser (Callable): The parser constructor, Defaults to
             :class:`DefaultParser`.
+        timeout (float): The maximum seconds to evaluate an expression.
+            Defaults to 2.
+        workers (int): The number of worker processes. Defaults to 2.
+        max_memory (int, optional): The maximum bytes every worker process
+            can allocate. Defaults to 512 MiB.
     """
 
     DEFAULT_TOOLMETA = ToolMeta(
@@ -44,14 +34,22 @@ class Calculator(BaseTool):
         inputs=['text'],
         outputs=['text'],
     )
+    deterministic = True
 
     def __init__(self,
                  toolmeta: Union[dict, ToolMeta] = DEFAULT_TOOLMETA,
                  parser: Callable = DefaultParser,
-                 timeout=2):
+                 timeout=2,
+                 workers: int = 2,
+                 max_memory: Optional[int] = 512 << 20):
         super().__init__(toolmeta=toolmeta, parser=parser)
         self.timeout = timeout
+        self.workers = workers
+        self.max_memory = max_memory
+
+    def setup(self):
+        self._pool = load_or_build_object(
+            EvaluatorPool, workers=self.workers, max_memory=self.max_memory)
 
     def apply(self, expression: str) -> str:
-        res = func_timeout(self.timeout, safe_eval, [expression])
-        return str(res)
+        return self._pool.evaluate(expression, timeout=self.timeout)
@@ -0,0 +1,205 @@
+"""The hooks around the stages of calling tools.
+
+Calling a tool has four stages: "setup", which runs only at the first call,
+"parse_inputs", "apply" and "parse_outputs". The registered hooks are
+called after every stage and every call, and the calls skip all the
+instrumentation if no hook is registered.
+"""
+import os
+import time
+from io import BytesIO
+from typing import List, Optional
+
+import numpy as np
+
+from agentlego.utils.metrics import BYTES_BUCKETS, METRICS, MetricsRegistry
+
+STAGES = ('setup', 'parse_inputs', 'apply', 'parse_outputs')
+
+
+class ToolHook:
+    """The base class of tool hooks.
+
+    The methods are called in the thread of the call, and should be cheap
+    and thread-safe.
+    """
+
+    def after_stage(self,
+                    tool,
+                    stage: str,
+                    seconds: float,
+                    error: Optional[BaseException] = None):
+        """Called after every stage.
+
+        Args:
+            tool (BaseTool): The called tool.
+            stage (str): The stage name, see :data:`STAGES`.
+            seconds (float): The duration of the stage.
+            error (BaseException, optional): The exception raised in the
+                stage. Defaults to None.
+        """
+
+    def after_call(self,
+                   tool,
+                   seconds: float,
+                   input_bytes: int,
+                   output_bytes: Optional[int],
+                   error: Optional[BaseException] = None):
+        """Called after every call.
+
+        Args:
+            tool (BaseTool): The called tool.
+            seconds (float): The duration of the call.
+            input_bytes (int): The size of the inputs, see
+                :func:`payload_bytes`. It's 0 if the call fails before
+                parsing the inputs.
+            output_bytes (int, optional): The size of the outputs of
+                :meth:`BaseTool.apply`, or None if the call fails.
+            error (BaseException, optional): The exception raised in the
+                call. Defaults to None.
+        """
+
+
+# The hooks of all tools.
+TOOL_HOOKS: List[ToolHook] = []
+
+
+def register_hook(hook: ToolHook) -> ToolHook:
+    """Register a hook for all tools."""
+    if hook not in TOOL_HOOKS:
+        TOOL_HOOKS.append(hook)
+    return hook
+
+
+def remove_hook(hook: ToolHook):
+    """Remove a registered hook."""
+    if hook in TOOL_HOOKS:
+        TOOL_HOOKS.remove(hook)
+
+
+def payload_bytes(obj) -> int:
+    """Estimate the size of the inputs or outputs without any conversion.
+
+    The image and audio are measured in the representations they already
+    have, like the array size or the file size, and the numbers and other
+    objects are counted as 0.
+    """
+    from agentlego.types import IOType
+
+    if isinstance(obj, IOType):
+        obj = obj.value
+        if isinstance(obj, str):
+            return os.path.getsize(obj) if os.path.isfile(obj) else 0
+    if isinstance(obj, (str, bytes)):
+        return len(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, BytesIO):
+        return obj.getbuffer().nbytes
+    if isinstance(obj, dict):
+        return sum(payload_bytes(v) for v in obj.values())
+    if isinstance(obj, (tuple, list)):
+        return sum(payload_bytes(v) for v in obj)
+    if hasattr(obj, 'element_size'):  # torch.Tensor
+        return obj.element_size() * obj.nelement()
+    if hasattr(obj, 'getbands'):  # PIL.Image.Image
+        return obj.width * obj.height * len(obj.getbands())
+    return 0
+
+
+def run_stage(hooks: List[ToolHook], tool, stage: str, func, *args, **kwargs):
+    """Run a stage and call the hooks with its duration."""
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except BaseException as e:
+        seconds = time.perf_counter() - start
+        for hook in hooks:
+            hook.after_stage(tool, stage, seconds, e)
+        raise
+    seconds = time.perf_counter() - start
+    for hook in hooks:
+        hook.after_stage(tool, stage, seconds)
+    return result
+
+
+async def arun_stage(hooks: List[ToolHook], tool, stage: str, func, *args,
+                     **kwargs):
+    """The same as :func:`run_stage` for a coroutine function."""
+    start = time.perf_counter()
+    try:
+        result = await func(*args, **kwargs)
+    except BaseException as e:
+        seconds = time.perf_counter() - start
+        for hook in hooks:
+            hook.after_stage(tool, stage, seconds, e)
+        raise
+    seconds = time.perf_counter() - start
+    for hook in hooks:
+        hook.after_stage(tool, stage, seconds)
+    return result
+
+
+class MetricsHook(ToolHook):
+    """Record the durations, sizes and errors into a metrics registry.
+
+    Args:
+        registry (MetricsRegistry): The registry to record.
+            Defaults to the :data:`METRICS` of the process.
+    """
+
+    def __init__(self, registry: MetricsRegistry = METRICS):
+        self.stage_seconds = registry.histogram(
+            'agentlego_tool_stage_seconds',
+            'The duration of every stage of the tool calls.',
+            ('tool', 'stage'))
+        self.call_seconds = registry.histogram(
+            'agentlego_tool_call_seconds', 'The duration of the tool calls.',
+            ('tool', ))
+        self.calls = registry.counter('agentlego_tool_calls_total',
+                                      'The number of the tool calls.',
+                                      ('tool', 'status'))
+        self.errors = registry.counter(
+            'agentlego_tool_errors_total',
+            'The number of the errors in every stage.',
+            ('tool', 'stage', 'error'))
+        self.input_bytes = registry.histogram(
+            'agentlego_tool_input_bytes',
+            'The size of the parsed inputs of the tool calls.', ('tool', ),
+            buckets=BYTES_BUCKETS)
+        self.output_bytes = registry.histogram(
+            'agentlego_tool_output_bytes',
+            'The size of the outputs of the tool calls before parsing.',
+            ('tool', ),
+            buckets=BYTES_BUCKETS)
+
+    def after_stage(self, tool, stage, seconds, error=None):
+        self.stage_seconds.observe(seconds, tool=tool.name, stage=stage)
+        if error is not None:
+            self.errors.inc(
+                tool=tool.name, stage=stage, error=type(error).__name__)
+
+    def after_call(self, tool, seconds, input_bytes, output_bytes, error=None):
+        status = 'ok' if error is None else 'error'
+        self.calls.inc(tool=tool.name, status=status)
+        self.call_seconds.observe(seconds, tool=tool.name)
+        if error is None:
+            self.input_bytes.observe(input_bytes, tool=tool.name)
+            self.output_bytes.observe(output_bytes, tool=tool.name)
+
+
+_metrics_hook: Optional[MetricsHook] = None
+
+
+def enable_metrics() -> MetricsHook:
+    """Record the metrics of all tools into :data:`METRICS`."""
+    global _metrics_hook
+    if _metrics_hook is None:
+        _metrics_hook = MetricsHook()
+    return register_hook(_metrics_hook)
+
+
+def disable_metrics():
+    """Stop recording the metrics, the recorded metrics are kept."""
+    if _metrics_hook is not None:
+        remove_hook(_metrics_hook)
@@ -1,6 +1,5 @@
 from typing import Callable, Union
 
-import cv2
 import numpy as np
 from PIL import Image
 
@@ -9,6 +8,8 @@ from agentlego.schema import ToolMeta
 from agentlego.types import ImageIO
 from agentlego.utils import is_package_available, load_or_build_object, require
 from ..base import BaseTool
+from ..utils.grounding import ground
+from ..utils.mask import dilate
 
 if is_package_available('torch'):
     import torch
@@ -70,46 +71,28 @@ class ObjectRemove(BaseTool):
         self.inpainting = load_or_build_object(Inpainting, device=self.device)
 
     def apply(self, image: ImageIO, text: str) -> ImageIO:
-        image_path = image.to_path()
         image_pil = image.to_pil()
+        image = image.to_array()
 
         text1 = text
         text2 = 'background'
-        results = self.grounding(
-            inputs=image_path,
-            texts=[text1],
-            no_save_vis=True,
-            return_datasamples=True)
-        results = results['predictions'][0].pred_instances
+        results = ground(self.grounding, self.grounding_model, image,
+                         text1).pred_instances
 
         boxes_filt = results.bboxes
 
-        image = cv2.imread(image_path)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        self.sam_predictor.set_image(image)
         masks = self.get_mask_with_boxes(image_pil, image, boxes_filt)
         mask = torch.sum(masks, dim=0).unsqueeze(0)
         mask = torch.where(mask > 0, True, False)
         mask = mask.squeeze(0).squeeze(0).cpu()
 
-        mask = self.pad_edge(mask, padding=20)
+        mask = dilate(mask, radius=20).astype(np.uint8) * 255
         mask_image = Image.fromarray(mask)
         output_image = self.inpainting(
             prompt=text2, image=image_pil, mask_image=mask_image)
         output_image = output_image.resize(image_pil.size)
         return ImageIO(output_image)
 
-    def pad_edge(self, mask, padding):
-        mask = mask.numpy()
-        true_indices = np.argwhere(mask)
-        mask_array = np.zeros_like(mask, dtype=bool)
-        for idx in true_indices:
-            padded_slice = tuple(
-                slice(max(0, i - padding), i + padding + 1) for i in idx)
-            mask_array[padded_slice] = True
-        new_mask = (mask_array * 255).astype(np.uint8)
-        return new_mask
-
     def get_mask_with_boxes(self, image_pil, image, boxes_filt):
         boxes_filt = boxes_filt.cpu()
         transformed_boxes = self.sam_predictor.transform.apply_boxes_torch(
@@ -3,23 +3,24 @@ from typing import Callable, Union
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
 from agentlego.types import ImageIO
-from agentlego.utils import is_package_available, load_or_build_object, require
+from agentlego.utils import load_or_build_object, require
 from ..base import BaseTool
-
-if is_package_available('torch'):
-    import torch
+from ..utils.diffusers import load_sd_unet_variant
 
 
 def load_instruct_pix2pix(model, device):
     from diffusers import (EulerAncestralDiscreteScheduler,
                            StableDiffusionInstructPix2PixPipeline)
 
-    dtype = torch.float16 if 'cuda' in device else torch.float32
-    instruct_pix2pix = StableDiffusionInstructPix2PixPipeline.from_pretrained(
+    # Only the UNet is fine-tuned, and the other components are shared with
+    # Stable Diffusion 1.5.
+    instruct_pix2pix = load_sd_unet_variant(
+        StableDiffusionInstructPix2PixPipeline,
         model,
+        device=device,
         safety_checker=None,
-        torch_dtype=dtype,
-    ).to(device)
+        requires_safety_checker=False,
+    )
     instruct_pix2pix.scheduler = EulerAncestralDiscreteScheduler.from_config(
         instruct_pix2pix.scheduler.config)
 
@@ -1,4 +1,4 @@
-from typing import Callable, Union
+from typing import Callable, List, Union
 
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
@@ -28,6 +28,7 @@ class ImageCaption(BaseTool):
         inputs=['image'],
         outputs=['text'],
     )
+    deterministic = True
 
     @require('mmpretrain')
     def __init__(self,
@@ -52,3 +53,10 @@ class ImageCaption(BaseTool):
     def apply(self, image: ImageIO) -> str:
         image = image.to_array()[:, :, ::-1]
         return self._inferencer(image)[0]['pred_caption']
+
+    def apply_batch(self, batch_inputs: List[dict]) -> List[str]:
+        images = [
+            inputs['image'].to_array()[:, :, ::-1] for inputs in batch_inputs
+        ]
+        results = self._inferencer(images, batch_size=len(images))
+        return [res['pred_caption'] for res in results]
@@ -11,7 +11,8 @@ import os
 
 from PIL import Image
 
-from agentlego.utils import is_package_available
+from agentlego.utils import (LRUCache, is_package_available,
+                             load_or_build_object)
 
 if is_package_available('torch'):
     import torch
@@ -36,6 +37,9 @@ DEFAULT_AUDIO_FRAME_SHIFT_MS = 10  # in milliseconds
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 BPE_PATH = os.path.join(CURRENT_DIR, 'bpe/bpe_simple_vocab_16e6.txt.gz')
 
+# The token ids of the recent prompts.
+TEXT_TOKEN_CACHE = LRUCache(max_size=1024)
+
 
 def waveform2melspec(waveform, sample_rate, num_mel_bins, target_length):
     # Based on https://github.com/YuanGongND/ast/blob/d7d8b4b8e06cdaeb6c843cdb38794c1c7692234c/src/dataloader.py#L102  # noqa
@@ -156,13 +160,33 @@ def load_and_transform_thermal_data(thermal_paths, device):
     return torch.stack(thermal_ouputs, dim=0)
 
 
-def load_and_transform_text(text, device):
+def get_tokenizer() -> SimpleTokenizer:
+    """Get the BPE tokenizer, which is built once at the first call."""
+    return load_or_build_object(SimpleTokenizer, bpe_path=BPE_PATH)
+
+
+def _encode_text(tokenizer: SimpleTokenizer, text: str, context_length: int):
+    key = (text, context_length)
+    tokens = TEXT_TOKEN_CACHE.get(key)
+    if tokens is None:
+        sot_token = tokenizer.encoder['<|startoftext|>']
+        eot_token = tokenizer.encoder['<|endoftext|>']
+        tokens = [sot_token] + tokenizer.encode(text) + [eot_token]
+        tokens = tuple(tokens[:context_length])
+        TEXT_TOKEN_CACHE.put(key, tokens)
+    return tokens
+
+
+def load_and_transform_text(text, device, context_length=77):
     if text is None:
         return None
-    tokenizer = SimpleTokenizer(bpe_path=BPE_PATH)
-    tokens = [tokenizer(t).unsqueeze(0).to(device) for t in text]
-    tokens = torch.cat(tokens, dim=0)
-    return tokens
+    tokenizer = get_tokenizer()
+    padded = []
+    for t in text:
+        tokens = _encode_text(tokenizer, t, context_length)
+        padded.append(tokens + (0, ) * (context_length - len(tokens)))
+    # Build the batch by a single allocation on the target device.
+    return torch.tensor(padded, dtype=torch.long, device=device)
 
 
 def load_and_transform_audio_data(
@@ -1,4 +1,4 @@
-from typing import Callable, Union
+from typing import Callable, List, Union
 
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
@@ -43,9 +43,21 @@ class ObjectDetection(BaseTool):
         from mmdet.apis import DetInferencer
         self._inferencer = load_or_build_object(
             DetInferencer, model=self.model, device=self.device)
+        self._visualizer = self._inferencer.visualizer
 
     def apply(self, image: ImageIO) -> ImageIO:
-        image = image.to_path()
-        results = self._inferencer(image, return_vis=True)
-        output_image = results['visualization'][0]
-        return ImageIO(output_image)
+        return self.apply_batch([dict(image=image)])[0]
+
+    def apply_batch(self, batch_inputs: List[dict]) -> List[ImageIO]:
+        images = [inputs['image'].to_array() for inputs in batch_inputs]
+        results = self._inferencer(
+            [image[:, :, ::-1] for image in images],  # Input BGR
+            batch_size=len(images),
+            return_datasamples=True,
+        )
+        outputs = []
+        for image, data_sample in zip(images, results['predictions']):
+            self._visualizer.add_datasample(
+                'vis', image, data_sample, draw_gt=False, pred_score_thr=0.3)
+            outputs.append(ImageIO(self._visualizer.get_image()))
+        return outputs
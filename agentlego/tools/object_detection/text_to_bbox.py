@@ -5,6 +5,7 @@ from agentlego.schema import ToolMeta
 from agentlego.types import ImageIO
 from agentlego.utils import load_or_build_object, require
 from ..base import BaseTool
+from ..utils.grounding import ground
 
 
 class TextToBbox(BaseTool):
@@ -30,6 +31,7 @@ class TextToBbox(BaseTool):
         inputs=['image', 'text', 'bool'],
         outputs=['image', 'text'],
     )
+    deterministic = True
 
     @require('mmdet>=3.1.0')
     def __init__(self,
@@ -53,13 +55,9 @@ class TextToBbox(BaseTool):
               top1: bool = True) -> Tuple[ImageIO, str]:
         from mmdet.structures import DetDataSample
 
-        results = self._inferencer(
-            image.to_array()[:, :, ::-1],
-            texts=text,
-            return_datasamples=True,
-        )
-        data_sample = results['predictions'][0]
-        preds: DetDataSample = data_sample.pred_instances
+        data_sample = ground(self._inferencer, self.model, image.to_array(),
+                             text)
+        preds = data_sample.pred_instances
 
         pred_tmpl = ('bbox ({:.0f}, {:.0f}, {:.0f}, {:.0f}), '
                      'score {:.0f}')
@@ -76,9 +74,11 @@ class TextToBbox(BaseTool):
                 pred_descs.append(pred_tmpl.format(*bbox, score * 100))
             pred_str = '\n'.join(pred_descs)
 
-            data_sample.pred_instances = preds
+            # Don't modify the cached prediction.
+            vis_sample = DetDataSample(
+                metainfo=data_sample.metainfo, pred_instances=preds)
             self._visualizer.add_datasample(
-                'vis', image.to_array(), data_sample, draw_gt=False)
+                'vis', image.to_array(), vis_sample, draw_gt=False)
             output_image = ImageIO(self._visualizer.get_image())
 
         return output_image, pred_str
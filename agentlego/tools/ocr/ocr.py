@@ -28,6 +28,7 @@ class OCR(BaseTool):
         inputs=['image'],
         outputs=['text'],
     )
+    deterministic = True
 
     @require('easyocr')
     def __init__(self,
@@ -1,18 +1,100 @@
+import asyncio
 import base64
+import json
+import time
+import weakref
 from io import BytesIO
-from typing import Dict, List, Optional, Union
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
 from urllib.parse import urljoin
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from agentlego.parsers import DefaultParser
 from agentlego.schema import Parameter, ToolMeta
 from agentlego.tools.base import BaseTool
+from agentlego.tools.hooks import (TOOL_HOOKS, arun_stage, payload_bytes,
+                                   run_stage)
 from agentlego.types import AudioIO, ImageIO
-from agentlego.utils import temp_path
+from agentlego.utils.frames import FRAMES_MEDIA_TYPE, decode_frames
+
+_DEFAULT_SESSION: Optional[requests.Session] = None
+
+
+def create_session(pool_size: int = 16,
+                   max_retries: int = 3,
+                   backoff_factor: float = 0.5) -> requests.Session:
+    """Create a session with connection pooling and retries.
+
+    The idempotent requests (GET and HEAD) are retried on connection errors,
+    read errors and 429, 502, 503 and 504 responses. The other requests are
+    only retried if failed to connect, since the server hasn't received them.
+
+    Args:
+        pool_size (int): The number of connections to keep alive for every
+            host. Defaults to 16.
+        max_retries (int): The maximum number of retries. Defaults to 3.
+        backoff_factor (float): The factor of the exponential backoff
+            between retries, in seconds. Defaults to 0.5.
+
+    Returns:
+        requests.Session: The created session.
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def default_session() -> requests.Session:
+    """Get the session shared by all remote tools by default."""
+    global _DEFAULT_SESSION
+    if _DEFAULT_SESSION is None:
+        _DEFAULT_SESSION = create_session()
+    return _DEFAULT_SESSION
 
 
 class RemoteTool(BaseTool):
+    """A tool to call the tool deployed on a tool server.
+
+    Args:
+        url (str): The url of the tool on the tool server.
+        toolmeta (dict | ToolMeta, optional): The meta info of the tool.
+            Defaults to None, which means to request from the server.
+        parameters (dict, optional): The parameters of the tool.
+            Defaults to None, which means to request from the server.
+        parser (Callable): The parser constructor, Defaults to
+            :class:`DefaultParser`.
+        transport (str): The format of the server response. "json" receives
+            images and audios as base64 strings in JSON, "frames" receives
+            them as binary frames, and "raw" receives raw arrays in binary
+            frames to skip PNG & WAV encoding, which is suitable for
+            server-to-server calls. The server falls back to "json" if it
+            doesn't support the others. Defaults to "frames".
+        session (requests.Session, optional): The session to send requests.
+            Defaults to None, which means to use the session shared by all
+            remote tools, see :func:`create_session`.
+        timeout (float | tuple[float, float]): The connect and read timeout
+            in seconds. Defaults to ``(5, 300)``.
+        max_retries (int): The maximum number of retries if the server is
+            busy (responds 429) or the tool is loading (responds 503).
+            Defaults to 3.
+        backoff_factor (float): The factor of the exponential backoff
+            between retries, in seconds. Defaults to 0.5.
+    """
+    # The server hasn't run the call if responds these status.
+    RETRY_STATUS = (429, 503)
 
     def __init__(
         self,
@@ -20,11 +102,25 @@ class RemoteTool(BaseTool):
         toolmeta: Union[dict, ToolMeta, None] = None,
         parameters: Optional[Dict[str, Parameter]] = None,
         parser=DefaultParser,
+        transport: str = 'frames',
+        session: Optional[requests.Session] = None,
+        timeout: Union[float, Tuple[float, float]] = (5, 300),
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
     ):
         if not url.endswith('/'):
             url += '/'
         self.url = url
 
+        assert transport in ['json', 'frames', 'raw']
+        self.transport = transport
+        self.session = session or default_session()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        # The async clients are bound to the event loop they are used in.
+        self._async_clients = weakref.WeakKeyDictionary()
+
         if toolmeta is None or parameters is None:
             toolmeta, parameters = self.request_meta()
 
@@ -33,7 +129,7 @@ class RemoteTool(BaseTool):
 
     def request_meta(self):
         url = urljoin(self.url, 'meta')
-        response = requests.get(url).json()
+        response = self.session.get(url, timeout=self.timeout).json()
         toolmeta = response['toolmeta']
         parameters = {
             p['name']: Parameter(**p)
@@ -41,25 +137,156 @@ class RemoteTool(BaseTool):
         }
         return toolmeta, parameters
 
-    def apply(self, *args, **kwargs):
+    def _build_request(self, args, kwargs) -> Tuple[dict, dict, dict]:
         for arg, arg_name in zip(args, self.parameters):
             kwargs[arg_name] = arg
 
-        form = {}
+        data, files = {}, {}
         for k, v in kwargs.items():
             if isinstance(v, (ImageIO, AudioIO)):
-                file = v.to_path()
-                form[k] = (file, open(file, 'rb'))
+                if v.type == 'path':
+                    filename = Path(v.value).name
+                elif isinstance(v, ImageIO):
+                    filename = 'image.png'
+                else:
+                    filename = 'audio.wav'
+                # Read the content so that the request can be resent.
+                files[k] = (filename, v.to_buffer().getvalue())
             else:
-                form[k] = (None, v)
+                data[k] = str(v)
+
+        if self.transport == 'json':
+            headers = {'Accept': 'application/json'}
+        elif self.transport == 'raw':
+            headers = {'Accept': f'{FRAMES_MEDIA_TYPE}; arrays=raw'}
+        else:
+            headers = {'Accept': FRAMES_MEDIA_TYPE}
+
+        return data, files, headers
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_factor * (2**attempt)
+
+    def apply(self, *args, **kwargs):
+        data, files, headers = self._build_request(args, kwargs)
 
         url = urljoin(self.url, 'call')
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    url,
+                    data=data,
+                    files=files,
+                    headers=headers,
+                    timeout=self.timeout)
+            except requests.ConnectionError as e:
+                raise ConnectionError(
+                    f'Failed to connect the remote tool `{self.name}`.') from e
+            if (response.status_code not in self.RETRY_STATUS
+                    or attempt == self.max_retries):
+                break
+            time.sleep(self._backoff(attempt))
+
+        return self._parse_response(
+            response.headers.get('Content-Type', ''), response.content)
+
+    async def acall(self, *args, **kwargs):
+        """The asynchronous version of calling the tool, with the same hooks
+        and result cache.
+
+        It requires ``httpx`` to send the request asynchronously.
+        """
+        hooks = list(TOOL_HOOKS)
+        with self.in_use():
+            start = time.perf_counter()
+            input_bytes, output_bytes, error = 0, None, None
+            try:
+                self.lazy_setup()
+
+                inputs, kwinputs = run_stage(hooks, self, 'parse_inputs',
+                                             self.parser.parse_inputs, *args,
+                                             **kwargs)
+                input_bytes = payload_bytes(inputs) + payload_bytes(kwinputs)
+                outputs = await arun_stage(hooks, self, 'apply', self._aapply,
+                                           inputs, kwinputs)
+                output_bytes = payload_bytes(outputs)
+                results = run_stage(hooks, self, 'parse_outputs',
+                                    self.parser.parse_outputs, outputs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                for hook in hooks:
+                    hook.after_call(self, seconds, input_bytes, output_bytes,
+                                    error)
+        return results
+
+    async def _aapply(self, inputs: tuple, kwinputs: dict):
+        if self._result_cache is not None:
+            return await self._result_cache.aapply(
+                self,
+                inputs,
+                kwinputs,
+                self._aapply_uncached,
+                ttl=self._result_ttl)
+        return await self._aapply_uncached(inputs, kwinputs)
+
+    async def _aapply_uncached(self, inputs: tuple, kwinputs: dict):
+        return await self.aapply(*inputs, **kwinputs)
+
+    def _async_client(self):
+        """Get the async client of the running event loop."""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            if isinstance(self.timeout, tuple):
+                connect, read = self.timeout
+            else:
+                connect = read = self.timeout
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read, connect=connect),
+                transport=httpx.AsyncHTTPTransport(retries=self.max_retries),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def aapply(self, *args, **kwargs):
+        """The asynchronous version of :meth:`apply`."""
+        import httpx
+
+        client = self._async_client()
+        data, files, headers = self._build_request(args, kwargs)
+
+        url = urljoin(self.url, 'call')
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(
+                    url, data=data, files=files, headers=headers)
+            except httpx.ConnectError as e:
+                raise ConnectionError(
+                    f'Failed to connect the remote tool `{self.name}`.') from e
+            if (response.status_code not in self.RETRY_STATUS
+                    or attempt == self.max_retries):
+                break
+            await asyncio.sleep(self._backoff(attempt))
+
+        return self._parse_response(
+            response.headers.get('Content-Type', ''), response.content)
+
+    def _parse_response(self, content_type: str, content: bytes):
+        if content_type.startswith(FRAMES_MEDIA_TYPE):
+            parsed_res = [
+                self._parse_frame(header, payload)
+                for header, payload in decode_frames(content)
+            ]
+            return parsed_res[0] if len(parsed_res) == 1 else tuple(parsed_res)
+
         try:
-            response = requests.post(url, files=form).json()
-        except requests.ConnectionError as e:
-            raise ConnectionError(
-                f'Failed to connect the remote tool `{self.name}`.') from e
-        except requests.JSONDecodeError:
+            response = json.loads(content)
+        except json.JSONDecodeError:
             raise RuntimeError('Unexcepted server response.')
 
         if isinstance(response, dict):
@@ -81,17 +308,39 @@ class RemoteTool(BaseTool):
                 file = BytesIO(base64.decodebytes(res['data'].encode('ascii')))
                 data = ImageIO(Image.open(file))
             elif res['type'] == 'audio':
-                filename = temp_path('audio', '.wav')
-                with open(filename, 'wb') as f:
-                    f.write(base64.decodebytes(res['data'].encode('ascii')))
-                data = AudioIO(filename)
+                file = BytesIO(base64.decodebytes(res['data'].encode('ascii')))
+                data = AudioIO(file)
             parsed_res.append(data)
 
         return parsed_res[0] if len(parsed_res) == 1 else tuple(parsed_res)
 
+    @staticmethod
+    def _parse_frame(header: dict, payload: memoryview):
+        if header['type'] == 'json':
+            return json.loads(bytes(payload).decode('utf-8'))
+        elif header['type'] == 'image' and header['format'] == 'raw':
+            import numpy as np
+            array = np.frombuffer(payload, dtype=header['dtype'])
+            return ImageIO(array.reshape(header['shape']).copy())
+        elif header['type'] == 'image':
+            from PIL import Image
+            return ImageIO(Image.open(BytesIO(payload)))
+        elif header['type'] == 'audio' and header['format'] == 'raw':
+            import numpy as np
+            import torch
+            array = np.frombuffer(payload, dtype=header['dtype'])
+            tensor = torch.from_numpy(array.reshape(header['shape']).copy())
+            return AudioIO(tensor, sampling_rate=header['sampling_rate'])
+        elif header['type'] == 'audio':
+            return AudioIO(BytesIO(payload))
+        else:
+            raise RuntimeError(f'Unknown frame type `{header["type"]}`.')
+
     @classmethod
-    def from_server(cls, url: str) -> List['RemoteTool']:
-        response = requests.get(url).json()
+    def from_server(cls, url: str, **kwargs) -> List['RemoteTool']:
+        session = kwargs.get('session') or default_session()
+        timeout = kwargs.get('timeout', (5, 300))
+        response = session.get(url, timeout=timeout).json()
         tools = []
         for tool_info in response:
             tool = cls(
@@ -101,6 +350,7 @@ class RemoteTool(BaseTool):
                     p['name']: Parameter(**p)
                     for p in tool_info['parameters']
                 },
+                **kwargs,
             )
             tools.append(tool)
         return tools
@@ -0,0 +1,347 @@
+"""A content-addressed cache of the outputs of deterministic tools.
+
+The results are keyed by the tool, its configs and the digest of the
+parsed inputs, where the images and audios are hashed by their content
+instead of the file path, so that the same image uploaded twice hits the
+cache. The cache has a memory tier and an optional SQLite tier on disk,
+which is shared by processes and survives restarts.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from io import BytesIO
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from agentlego.types import IOType
+from agentlego.utils import LRUCache, hash_array
+from agentlego.utils.cache import _parse_bytes
+
+_MISSING = object()
+
+# The representations to keep in the cached outputs, in order of priority.
+# The files on disk are not kept since they may be removed.
+_KEPT_TYPES = ('array', 'tensor', 'pil', 'buffer')
+
+_SIMPLE_TYPES = (str, int, float, bool, type(None))
+
+
+def _is_simple(value) -> bool:
+    if isinstance(value, _SIMPLE_TYPES):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_simple(v) for v in value)
+    if isinstance(value, dict):
+        return all(
+            isinstance(k, str) and _is_simple(v) for k, v in value.items())
+    return False
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _content_digest(value: IOType) -> str:
+    """The digest of the content of an image or audio, computed from an
+    existing representation without conversion."""
+    cache = value._cache
+    if 'array' in cache:
+        return 'array:' + hash_array(cache['array'])
+    if 'tensor' in cache:
+        return 'tensor:' + hash_array(cache['tensor'].detach().cpu().numpy())
+    if 'path' in cache:
+        return 'file:' + _hash_file(cache['path'])
+    if 'buffer' in cache:
+        return 'file:' + hashlib.blake2b(
+            cache['buffer'].getvalue(), digest_size=16).hexdigest()
+    return 'array:' + hash_array(np.asarray(cache['pil']))
+
+
+def _update_digest(digest, value):
+    if isinstance(value, IOType):
+        digest.update(type(value).__name__.encode())
+        digest.update(_content_digest(value).encode())
+        sampling_rate = getattr(value, '_sampling_rate', None)
+        if sampling_rate is not None:
+            digest.update(f'sr={sampling_rate}'.encode())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}[{len(value)}]'.encode())
+        for item in value:
+            _update_digest(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f'dict[{len(value)}]'.encode())
+        for k in sorted(value):
+            digest.update(repr(k).encode())
+            _update_digest(digest, value[k])
+    else:
+        digest.update(f'{type(value).__name__}:{value!r}'.encode())
+    digest.update(b'\0')
+
+
+def make_key(tool, inputs: tuple, kwinputs: dict) -> str:
+    """Make the cache key of a call.
+
+    Args:
+        tool (BaseTool): The called tool, whose class, name and
+            :meth:`~BaseTool.cache_config` are in the key.
+        inputs (tuple): The positional parsed inputs.
+        kwinputs (dict): The keyword parsed inputs.
+
+    Returns:
+        str: The hex digest of the call.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    cls = type(tool)
+    digest.update(f'{cls.__module__}.{cls.__qualname__}'.encode())
+    _update_digest(digest, tool.name)
+    _update_digest(digest, tool.cache_config())
+    _update_digest(digest, tuple(inputs))
+    _update_digest(digest, kwinputs)
+    return digest.hexdigest()
+
+
+def _copy_io(value: IOType) -> IOType:
+    """A new IO object of the same content, with its own conversion cache."""
+    for kept in _KEPT_TYPES:
+        if kept in value._cache:
+            content = value._cache[kept]
+            break
+    else:
+        kept, content = 'buffer', value.to('buffer')
+    if kept == 'buffer':
+        content = BytesIO(content.getvalue())
+
+    new = object.__new__(type(value))
+    new.__dict__.update(value.__dict__)
+    new.type, new.value, new._cache = kept, content, {kept: content}
+    return new
+
+
+def copy_outputs(outputs):
+    """Copy the IO objects in the outputs, so that the cached outputs are
+    not affected by the conversions of the callers."""
+    if isinstance(outputs, IOType):
+        return _copy_io(outputs)
+    if isinstance(outputs, (list, tuple)):
+        return type(outputs)(copy_outputs(item) for item in outputs)
+    if isinstance(outputs, dict):
+        return {k: copy_outputs(v) for k, v in outputs.items()}
+    return outputs
+
+
+class _DiskTier:
+    """The SQLite tier of :class:`ResultCache`, evicting the least recently
+    used results if the total size exceeds ``max_bytes``."""
+
+    def __init__(self, path: str, max_bytes: int):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS results ('
+                           'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                           'size INTEGER NOT NULL, expire_at REAL, '
+                           'accessed_at REAL NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS results_accessed '
+                           'ON results (accessed_at)')
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expire_at FROM results WHERE key = ?',
+                (key, )).fetchone()
+            if row is None:
+                return _MISSING, None
+            value, expire_at = row
+            if expire_at is not None and expire_at <= now:
+                self._conn.execute('DELETE FROM results WHERE key = ?',
+                                   (key, ))
+                return _MISSING, None
+            self._conn.execute(
+                'UPDATE results SET accessed_at = ? WHERE key = ?', (now, key))
+        return pickle.loads(value), expire_at
+
+    def put(self, key: str, value: Any, expire_at: Optional[float]):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                (key, data, len(data), expire_at, now))
+            self._evict(now)
+
+    def _evict(self, now: float):
+        self._conn.execute('DELETE FROM results WHERE expire_at <= ?', (now, ))
+        total = self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        rows = self._conn.execute(
+            'SELECT key, size FROM results ORDER BY accessed_at')
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key, ))
+            total -= size
+        self._conn.executemany('DELETE FROM results WHERE key = ?', evicted)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM results')
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM results').fetchone()[0]
+
+
+class ResultCache:
+    """A cache of the tool outputs with a memory tier and an optional disk
+    tier.
+
+    Args:
+        max_size (int): The maximum number of results in memory.
+            Defaults to 256.
+        path (str, optional): The SQLite file of the disk tier. Defaults to
+            None, which means to only cache in memory.
+        max_disk_bytes (int): The maximum total size of the pickled results
+            on disk. Defaults to 1 GiB.
+    """
+
+    def __init__(self,
+                 max_size: int = 256,
+                 path: Optional[str] = None,
+                 max_disk_bytes: int = 1 << 30):
+        self.memory = LRUCache(max_size)
+        self.disk = _DiskTier(path, max_disk_bytes) if path else None
+        self.disk_hits = 0
+
+    def get(self, key: str):
+        """Get the result, or ``_MISSING`` if not cached or expired."""
+        entry = self.memory.get(key)
+        if entry is not None:
+            expire_at, value = entry
+            if expire_at is None or expire_at > time.time():
+                return value
+        if self.disk is None:
+            return _MISSING
+
+        value, expire_at = self.disk.get(key)
+        if value is not _MISSING:
+            self.disk_hits += 1
+            self.memory.put(key, (expire_at, value))
+        return value
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Cache the result.
+
+        Args:
+            key (str): The key from :func:`make_key`.
+            value (Any): The outputs of the tool.
+            ttl (float, optional): The seconds to keep the result. Defaults
+                to None, which means never to expire.
+        """
+        expire_at = None if ttl is None else time.time() + ttl
+        self.memory.put(key, (expire_at, value))
+        if self.disk is not None:
+            self.disk.put(key, value, expire_at)
+
+    def apply(self,
+              tool,
+              inputs: tuple,
+              kwinputs: dict,
+              func: Callable,
+              ttl: Optional[float] = None):
+        """Get the outputs of a call from the cache, or call ``func`` with
+        the inputs and cache the outputs."""
+        key = make_key(tool, inputs, kwinputs)
+        outputs = self.get(key)
+        if outputs is _MISSING:
+            outputs = func(inputs, kwinputs)
+            self.put(key, copy_outputs(outputs), ttl)
+            return outputs
+        return copy_outputs(outputs)
+
+    async def aapply(self,
+                     tool,
+                     inputs: tuple,
+                     kwinputs: dict,
+                     func: Callable,
+                     ttl: Optional[float] = None):
+        """The same as :meth:`apply` for a coroutine function."""
+        key = make_key(tool, inputs, kwinputs)
+        outputs = self.get(key)
+        if outputs is _MISSING:
+            outputs = await func(inputs, kwinputs)
+            self.put(key, copy_outputs(outputs), ttl)
+            return outputs
+        return copy_outputs(outputs)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        stats['disk_hits'] = self.disk_hits
+        stats['disk_size'] = len(self.disk) if self.disk is not None else 0
+        return stats
+
+
+def _disk_path() -> Optional[str]:
+    """The path of the disk tier of the default cache, which is enabled by
+    the environment variable ``AGENTLEGO_RESULT_CACHE_DISK``."""
+    value = os.getenv('AGENTLEGO_RESULT_CACHE_DISK', '')
+    if value.lower() in ['', '0', 'false']:
+        return None
+    if value.lower() in ['1', 'true']:
+        cache_home = os.getenv('XDG_CACHE_HOME', '~/.cache')
+        root = os.getenv('AGENTLEGO_HOME',
+                         os.path.join(cache_home, 'agentlego'))
+        return os.path.join(os.path.expanduser(root), 'results.sqlite')
+    return os.path.expanduser(value)
+
+
+_default_cache: Optional[ResultCache] = None
+_default_lock = threading.Lock()
+
+
+def default_result_cache() -> ResultCache:
+    """Get the result cache shared by all tools by default.
+
+    It's configured by the environment variables:
+
+    - ``AGENTLEGO_RESULT_CACHE_SIZE``: The number of results in memory,
+      defaults to 256.
+    - ``AGENTLEGO_RESULT_CACHE_DISK``: "1" to enable the disk tier at
+      ``$AGENTLEGO_HOME/results.sqlite``, or the path of the SQLite file.
+      Defaults to disabled.
+    - ``AGENTLEGO_RESULT_CACHE_MAX_BYTES``: The maximum size of the disk
+      tier, like "512M". Defaults to 1 GiB.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache(
+                max_size=int(os.getenv('AGENTLEGO_RESULT_CACHE_SIZE', 256)),
+                path=_disk_path(),
+                max_disk_bytes=_parse_bytes(
+                    os.getenv('AGENTLEGO_RESULT_CACHE_MAX_BYTES')) or 1 << 30,
+            )
+    return _default_cache
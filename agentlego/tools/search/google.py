@@ -53,6 +53,9 @@ class GoogleSearch(BaseTool):
         inputs=['text'],
         outputs=['text'],
     )
+    deterministic = True
+    # The search results change over time.
+    result_ttl = 600
 
     def __init__(self,
                  toolmeta: Union[dict, ToolMeta] = DEFAULT_TOOLMETA,
@@ -79,6 +82,13 @@ class GoogleSearch(BaseTool):
         self.max_out_len = max_out_len
         self.with_url = with_url
 
+    def cache_config(self) -> dict:
+        config = super().cache_config()
+        # The results don't depend on the API key and the timeout.
+        config.pop('api_key', None)
+        config.pop('timeout', None)
+        return config
+
     def apply(self, query: str) -> str:
         status_code, results = self._search(
             query, search_type=self.search_type, k=self.k)
@@ -1,4 +1,8 @@
+import itertools
+import os
 import random
+import threading
+from functools import partial
 from pathlib import Path
 from typing import TYPE_CHECKING, Callable, Optional, Tuple, Union
 
@@ -9,10 +13,13 @@ from PIL import Image
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
 from agentlego.types import ImageIO
-from agentlego.utils import (download_checkpoint, download_url_to_file,
+from agentlego.utils import (LRUCache, download_checkpoint,
+                             download_url_to_file, hash_array,
                              is_package_available, load_or_build_object,
                              require)
 from ..base import BaseTool
+from ..utils.grounding import ground
+from ..utils.mask import paint_labels
 
 if is_package_available('torch'):
     import torch
@@ -23,6 +30,28 @@ else:
 
 GLOBAL_SEED = 1912
 
+# The image embeddings shared by all SAM predictors in the process, keyed by
+# the predictor and the image content. An embedding of ViT-H takes 4 MB.
+SAM_EMBEDDING_CACHE = LRUCache(
+    max_size=int(os.getenv('AGENTLEGO_SAM_CACHE_SIZE', 16)))
+_predictor_ids = itertools.count()
+
+# The speed/quality presets of the automatic mask generator. The "balanced"
+# preset is the default settings of `SamAutomaticMaskGenerator`.
+MASK_GENERATOR_PRESETS = {
+    'fast':
+    dict(points_per_side=16, points_per_batch=256),
+    'balanced':
+    dict(points_per_side=32, points_per_batch=64),
+    'quality':
+    dict(
+        points_per_side=32,
+        points_per_batch=64,
+        crop_n_layers=1,
+        crop_n_points_downscale_factor=2,
+        min_mask_region_area=100),
+}
+
 
 def load_sam_and_predictor(model, device=None, ckpt_path=None):
 
@@ -68,6 +97,9 @@ class SamPredictor:
         """
         super().__init__()
         self.model = sam_model
+        # Don't use `id(self)` in cache keys since it may be reused after
+        # the predictor is released.
+        self._cache_id = next(_predictor_ids)
 
         from segment_anything.utils.transforms import ResizeLongestSide
 
@@ -125,8 +157,9 @@ class SamPredictor:
 
         original_size = original_image_size
         input_size = tuple(transformed_image.shape[-2:])
-        input_image = self.model.preprocess(transformed_image)
-        features = self.model.image_encoder(input_image)
+        with torch.no_grad():
+            input_image = self.model.preprocess(transformed_image)
+            features = self.model.image_encoder(input_image)
 
         res = {
             'features': features,
@@ -302,14 +335,46 @@ class SamPredictor:
 
         return masks, iou_predictions, low_res_masks
 
-    def get_image_embedding(self, image) -> Tensor:
-        return self.set_image(image)
+    def get_image_embedding(self,
+                            image: np.ndarray,
+                            image_format: str = 'RGB') -> dict:
+        """Get the image embeddings from the :data:`SAM_EMBEDDING_CACHE`,
+        or calculate them by :meth:`set_image` if the image isn't cached.
+
+        Arguments:
+          image (np.ndarray): The image in HWC uint8 format.
+          image_format (str): The color format of the image, in ['RGB', 'BGR'].
+
+        Returns:
+          dict: The image embeddings, which shouldn't be modified in place
+            since it's shared by all callers.
+        """
+        key = (self._cache_id, image_format, hash_array(image))
+        features = SAM_EMBEDDING_CACHE.get(key)
+        if features is None:
+            features = self.set_image(image, image_format)
+            SAM_EMBEDDING_CACHE.put(key, features)
+        return features
 
     @property
     def device(self):
         return self.model.device
 
 
+def _set_cached_image(predictor,
+                      sam_predictor: SamPredictor,
+                      image: np.ndarray,
+                      image_format: str = 'RGB'):
+    """Replace ``set_image`` of the predictor in ``segment_anything`` to
+    get the image embeddings by :meth:`SamPredictor.get_image_embedding`."""
+    features = sam_predictor.get_image_embedding(image, image_format)
+    predictor.reset_image()
+    predictor.features = features['features']
+    predictor.original_size = features['original_size']
+    predictor.input_size = features['input_size']
+    predictor.is_image_set = True
+
+
 class SegmentAnything(BaseTool):
     """A tool to segment all objects on an image.
 
@@ -321,6 +386,12 @@ class SegmentAnything(BaseTool):
         sam_model (str): The model name used to inference. Which can be found
             in the ``segment_anything`` repository.
             Defaults to ``sam_vit_h_4b8939.pth``.
+        preset (str): The speed/quality preset of the automatic mask
+            generator, "fast", "balanced" or "quality". See
+            :data:`MASK_GENERATOR_PRESETS`. Defaults to "balanced".
+        generator_cfg (dict, optional): The extra arguments of
+            ``SamAutomaticMaskGenerator`` to override the preset, like
+            ``points_per_side`` and ``points_per_batch``. Defaults to None.
         device (str): The device to load the model. Defaults to 'cpu'.
     """
     DEFAULT_TOOLMETA = ToolMeta(
@@ -336,33 +407,53 @@ class SegmentAnything(BaseTool):
                  toolmeta: Union[dict, ToolMeta] = DEFAULT_TOOLMETA,
                  parser: Callable = DefaultParser,
                  sam_model: str = 'sam_vit_h_4b8939.pth',
+                 preset: str = 'balanced',
+                 generator_cfg: Optional[dict] = None,
                  device: str = 'cpu'):
         super().__init__(toolmeta=toolmeta, parser=parser)
+        assert preset in MASK_GENERATOR_PRESETS, \
+            f'Unknown preset `{preset}`, choose from ' \
+            f'{list(MASK_GENERATOR_PRESETS)}.'
         self.sam_model = sam_model
+        self.generator_cfg = {
+            **MASK_GENERATOR_PRESETS[preset],
+            **(generator_cfg or {})
+        }
         self.device = device
 
     def setup(self):
+        from segment_anything import SamAutomaticMaskGenerator
+
         self.sam, self.sam_predictor = load_sam_and_predictor(
             self.sam_model, device=self.device)
+        self.mask_generator = SamAutomaticMaskGenerator(
+            self.sam, **self.generator_cfg)
+        # Use the image embeddings in the `SAM_EMBEDDING_CACHE`.
+        self.mask_generator.predictor.set_image = partial(
+            _set_cached_image, self.mask_generator.predictor,
+            self.sam_predictor)
+        # The generator stores the image embeddings in its predictor.
+        self._generator_lock = threading.Lock()
 
     def apply(self, image: ImageIO) -> ImageIO:
-        image = image.to_path()
-        annos = self.segment_anything(image)
+        annos = self.segment_anything(image.to_array())
         full_img, _ = self.show_annos(annos)
         return ImageIO(full_img)
 
-    def segment_anything(self, img_path):
-        if not self._is_setup:
-            self.setup()
-            self._is_setup = True
+    def segment_anything(self, img: Union[str, np.ndarray]):
+        """Segment all objects in the image.
 
-        img = cv2.imread(img_path)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        Args:
+            img (str | np.ndarray): The image path or the RGB image array.
+        """
+        self.lazy_setup()
 
-        from segment_anything import SamAutomaticMaskGenerator
+        if isinstance(img, str):
+            img = cv2.imread(img)
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
-        mask_generator = SamAutomaticMaskGenerator(self.sam)
-        annos = mask_generator.generate(img)
+        with self._generator_lock:
+            annos = self.mask_generator.generate(img)
 
         return annos
 
@@ -388,43 +479,52 @@ class SegmentAnything(BaseTool):
 
     def get_detection_map(self, img_path):
         annos = self.segment_anything(img_path)
-        _, detection_map = self.show_anns(annos)
+        _, detection_map = self.show_annos(annos, render=False)
 
         return detection_map
 
-    def show_annos(self, anns):
+    def show_annos(self, anns, render: bool = True):
+        """Composite the annotations into a colored image and a label map.
+
+        The annotations are painted from the largest to the smallest, so
+        that the small objects stay on top.
+
+        Args:
+            anns (list[dict]): The annotations from SAM.
+            render (bool): Whether to render the colored image. Defaults to
+                True.
+
+        Returns:
+            tuple[PIL.Image.Image | None, np.ndarray]: The colored image, and
+            the label map of shape (H, W, 3) whose first & second channels
+            are the low & high bytes of the label.
+        """
         if len(anns) == 0:
-            return
+            return None, None
 
         sorted_anns = sorted(anns, key=(lambda x: x['area']), reverse=True)
-        full_img = None
+        masks = [ann['segmentation'] for ann in sorted_anns]
+        boxes = None
+        if all('bbox' in ann for ann in sorted_anns):
+            boxes = [ann['bbox'] for ann in sorted_anns]
+        label_map = paint_labels(masks, boxes)
 
-        # for ann in sorted_anns:
-        for i in range(len(sorted_anns)):
-            ann = anns[i]
-            m = ann['segmentation']
-            if full_img is None:
-                full_img = np.zeros((m.shape[0], m.shape[1], 3))
-                map = np.zeros((m.shape[0], m.shape[1]), dtype=np.uint16)
-            map[m != 0] = i + 1
-            color_mask = np.random.random((1, 3)).tolist()[0]
-            full_img[m != 0] = color_mask
-        full_img = full_img * 255
-
-        res = np.zeros((map.shape[0], map.shape[1], 3))
-        res[:, :, 0] = map % 256
-        res[:, :, 1] = map // 256
-        res.astype(np.float32)
-        full_img = Image.fromarray(np.uint8(full_img))
+        full_img = None
+        if render:
+            palette = np.random.random((len(masks) + 1, 3)) * 255
+            palette[0] = 0
+            full_img = Image.fromarray(np.uint8(palette)[label_map])
+
+        res = np.zeros((label_map.shape[0], label_map.shape[1], 3))
+        res[:, :, 0] = label_map % 256
+        res[:, :, 1] = label_map // 256
         return full_img, res
 
 
 def get_image_embedding(self, img):
-    if not self._is_setup:
-        self.setup()
-        self._is_setup = True
+    self.lazy_setup()
 
-    embedding = self.sam_predictor.set_image(img)
+    embedding = self.sam_predictor.get_image_embedding(img)
 
     return embedding
 
@@ -479,12 +579,8 @@ class SegmentObject(BaseTool):
 
     def apply(self, image: ImageIO, text: str) -> ImageIO:
 
-        results = self.grounding(
-            inputs=image.to_array()[:, :, ::-1],  # Input BGR
-            texts=text,
-            no_save_vis=True,
-            return_datasamples=True)
-        results = results['predictions'][0].pred_instances
+        results = ground(self.grounding, self.grounding_model,
+                         image.to_array(), text).pred_instances
 
         boxes_filt = results.bboxes
         pred_phrases = results.label_names
@@ -494,9 +590,7 @@ class SegmentObject(BaseTool):
         return ImageIO(output_image)
 
     def get_mask_with_boxes(self, image, boxes_filt):
-        if not self._is_setup:
-            self.setup()
-            self._is_setup = True
+        self.lazy_setup()
 
         boxes_filt = boxes_filt.cpu()
         transformed_boxes = self.sam_predictor.transform.apply_boxes_torch(
@@ -514,9 +608,7 @@ class SegmentObject(BaseTool):
         return masks
 
     def segment_image_with_boxes(self, image, boxes_filt, pred_phrases):
-        if not self._is_setup:
-            self.setup()
-            self._is_setup = True
+        self.lazy_setup()
 
         masks = self.get_mask_with_boxes(image, boxes_filt)
 
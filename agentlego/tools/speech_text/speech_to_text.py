@@ -1,4 +1,5 @@
-from typing import Callable, Union
+import time
+from typing import Callable, Iterator, List, Optional, Tuple, Union
 
 from mmengine.utils import apply_to
 
@@ -7,6 +8,7 @@ from agentlego.schema import ToolMeta
 from agentlego.types import AudioIO
 from agentlego.utils import is_package_available, load_or_build_object, require
 from ..base import BaseTool
+from ..hooks import TOOL_HOOKS, payload_bytes, run_stage
 
 if is_package_available('torch'):
     import torch
@@ -23,9 +25,98 @@ def resampling_audio(audio: AudioIO, new_rate):
     return AudioIO(tensor, sampling_rate=new_rate)
 
 
+def split_windows(num_samples: int, chunk: int,
+                  stride: int) -> List[Tuple[int, int]]:
+    """Split an audio into overlapping windows.
+
+    Every two adjacent windows overlap by ``2 * stride`` samples, and every
+    window owns the part except the overlaps with its neighbours, so that
+    the owned parts of all windows tile the whole audio.
+
+    Args:
+        num_samples (int): The length of the audio.
+        chunk (int): The length of every window.
+        stride (int): The length of the overlap on every side.
+
+    Returns:
+        List[Tuple[int, int]]: The start and the end of every window.
+    """
+    assert chunk > 2 * stride, '`chunk` should be longer than `2 * stride`.'
+    windows = []
+    start = 0
+    while True:
+        end = min(start + chunk, num_samples)
+        windows.append((start, end))
+        if end >= num_samples:
+            return windows
+        start += chunk - 2 * stride
+
+
+def stitch_segments(window_segments: List[List[dict]],
+                    windows: List[Tuple[float, float]],
+                    stride: float) -> List[List[dict]]:
+    """Convert the segments of every window to the absolute timestamps,
+    and only keep the segments centered in the part owned by the window.
+
+    Args:
+        window_segments (List[List[dict]]): The segments of every window,
+            with the ``text`` and the ``timestamp`` relative to the window.
+        windows (List[Tuple[float, float]]): The start and end seconds of
+            every window.
+        stride (float): The seconds of the overlap on every side.
+
+    Returns:
+        List[List[dict]]: The kept segments of every window.
+    """
+    stitched = []
+    for i, segments in enumerate(window_segments):
+        start, end = windows[i]
+        low = start + stride if i > 0 else float('-inf')
+        high = end - stride if i < len(windows) - 1 else float('inf')
+        kept = []
+        for segment in segments:
+            seg_start, seg_end = segment['timestamp']
+            # The last segment may miss the end if the generation stops.
+            seg_start = start + (seg_start or 0.)
+            seg_end = end if seg_end is None else start + seg_end
+            if low <= (seg_start + seg_end) / 2 < high:
+                kept.append(
+                    dict(text=segment['text'], timestamp=(seg_start, seg_end)))
+        stitched.append(kept)
+    return stitched
+
+
+def _with_tail(text: str, offsets: List[dict]) -> List[dict]:
+    """Append the text after the last timestamp to the segments as a
+    segment ending at the end of the window.
+
+    The offsets only include the segments between two timestamps, and the
+    text after the last timestamp is missing if the window ends in the
+    middle of a sentence or the generation reaches the maximum length.
+    """
+    segments = list(offsets)
+    prefix = ''.join(segment['text'] for segment in segments)
+    if not text.startswith(prefix):
+        return segments
+    tail = text[len(prefix):]
+    if tail.strip():
+        start = segments[-1]['timestamp'][1] if segments else None
+        segments.append(dict(text=tail, timestamp=(start or 0., None)))
+    return segments
+
+
+def _join_texts(texts: List[str]) -> str:
+    """Join the stripped texts by spaces, and skip the empty ones."""
+    return ' '.join(text.strip() for text in texts if text.strip())
+
+
 class SpeechToText(BaseTool):
     """A tool to recognize speech and convert to text.
 
+    The audios longer than ``chunk_length`` are split into overlapping
+    windows, which are transcribed in batches with timestamps, and the
+    segments in the overlaps are deduplicated by the timestamps.
+
     Args:
         toolmeta (dict | ToolMeta): The meta info of the tool. Defaults to
             the :attr:`DEFAULT_TOOLMETA`.
@@ -35,6 +126,13 @@ class SpeechToText(BaseTool):
             in the ``HuggingFace`` model page.
             Defaults to ``openai/whisper-base``.
         device (str): The device to load the model. Defaults to 'cpu'.
+        chunk_length (float, optional): The seconds of every window, which
+            is 30 for the Whisper models. If None, only transcribe the first
+            30 seconds. Defaults to 30.
+        stride_length (float): The seconds of the overlap on every side of
+            a window. Defaults to 5.
+        batch_size (int): The maximum number of windows to generate in a
+            batch. Defaults to 16.
     """
 
     DEFAULT_TOOLMETA = ToolMeta(
@@ -51,10 +149,16 @@ class SpeechToText(BaseTool):
         parser: Callable = DefaultParser,
         model='openai/whisper-base',
         device='cuda',
+        chunk_length: Optional[float] = 30.,
+        stride_length: float = 5.,
+        batch_size: int = 16,
     ):
         super().__init__(toolmeta, parser)
         self.model_name = model
         self.device = device
+        self.chunk_length = chunk_length
+        self.stride_length = stride_length
+        self.batch_size = batch_size
 
     def setup(self) -> None:
         from transformers.models.whisper import (
@@ -66,18 +170,126 @@ class SpeechToText(BaseTool):
             self.model_name).to(self.device)
 
     def apply(self, audio: AudioIO) -> str:
-        target_sampling_rate = self.processor.feature_extractor.sampling_rate
-        if target_sampling_rate != audio.sampling_rate:
-            audio = resampling_audio(audio, target_sampling_rate)
+        return self.transcribe([audio])[0]
+
+    def apply_batch(self, batch_inputs: List[dict]) -> List[str]:
+        return self.transcribe([inputs['audio'] for inputs in batch_inputs])
+
+    @property
+    def sampling_rate(self) -> int:
+        return self.processor.feature_extractor.sampling_rate
+
+    def _waveform(self, audio: AudioIO):
+        if self.sampling_rate != audio.sampling_rate:
+            audio = resampling_audio(audio, self.sampling_rate)
+        return audio.to_tensor().numpy().reshape(-1)
+
+    def _windows(self, waveform) -> List[Tuple[int, int]]:
+        if self.chunk_length is None:
+            return [(0, len(waveform))]
+        return split_windows(
+            len(waveform), int(self.chunk_length * self.sampling_rate),
+            int(self.stride_length * self.sampling_rate))
+
+    def _seconds(self, windows: List[Tuple[int, int]]) -> list:
+        return [(start / self.sampling_rate, end / self.sampling_rate)
+                for start, end in windows]
+
+    def _generate(self, waveforms: list, return_timestamps: bool) -> list:
         encoded_inputs = self.processor(
-            audio.to_tensor().numpy().reshape(-1),
-            return_tensors='pt',
-            sampling_rate=target_sampling_rate).input_features
+            waveforms, return_tensors='pt',
+            sampling_rate=self.sampling_rate).input_features
         encoded_inputs = apply_to(encoded_inputs,
                                   lambda x: isinstance(x, torch.Tensor),
                                   lambda x: x.to(self.device))
-        outputs = self.model.generate(inputs=encoded_inputs)
+        if return_timestamps:
+            outputs = self.model.generate(
+                inputs=encoded_inputs, return_timestamps=True)
+        else:
+            outputs = self.model.generate(inputs=encoded_inputs)
         outputs = apply_to(outputs, lambda x: isinstance(x, torch.Tensor),
                            lambda x: x.to('cpu'))
-        return self.processor.batch_decode(
-            outputs, skip_special_tokens=True)[0]
+        if not return_timestamps:
+            return self.processor.batch_decode(
+                outputs, skip_special_tokens=True)
+        decoded = self.processor.batch_decode(
+            outputs, skip_special_tokens=True, output_offsets=True)
+        return [_with_tail(item['text'], item['offsets']) for item in decoded]
+
+    def transcribe(self, audios: List[AudioIO]) -> List[str]:
+        """Transcribe the audios, and the short audios are generated in a
+        batch."""
+        waveforms = [self._waveform(audio) for audio in audios]
+        windows = [self._windows(waveform) for waveform in waveforms]
+        if all(len(w) == 1 for w in windows):
+            texts = self._generate(waveforms, return_timestamps=False)
+            return [_join_texts([text]) for text in texts]
+
+        # Generate the windows of all audios in batches.
+        batch = [(i, start, end) for i, w in enumerate(windows)
+                 for start, end in w]
+        results = []
+        for j in range(0, len(batch), self.batch_size):
+            chunks = batch[j:j + self.batch_size]
+            results.extend(
+                self._generate(
+                    [waveforms[i][start:end] for i, start, end in chunks],
+                    return_timestamps=True))
+
+        texts = []
+        for w in windows:
+            segments, results = results[:len(w)], results[len(w):]
+            segments = stitch_segments(segments, self._seconds(w),
+                                       self.stride_length)
+            texts.append(
+                _join_texts(
+                    [seg['text'] for window in segments for seg in window]))
+        return texts
+
+    def stream(self, audio: AudioIO, batch_size: int = 1) -> Iterator[str]:
+        """Transcribe an audio window by window, and yield the transcript of
+        every window once it's finished.
+
+        The tool is in use until the iterator is exhausted or closed, and
+        the tool hooks record every window as an "apply" stage and the whole
+        stream as a call.
+
+        Args:
+            audio (AudioIO): The audio.
+            batch_size (int): The number of windows to generate at once.
+                Defaults to 1.
+
+        Returns:
+            Iterator[str]: The text of every window, and the text joined by
+            spaces is the whole transcript.
+        """
+        hooks = list(TOOL_HOOKS)
+        with self.in_use():
+            call_start = time.perf_counter()
+            output_bytes, error = 0, None
+            try:
+                self.lazy_setup()
+                waveform = self._waveform(audio)
+                windows = self._windows(waveform)
+                seconds = self._seconds(windows)
+                for i in range(0, len(windows), batch_size):
+                    batch = windows[i:i + batch_size]
+                    segments = run_stage(
+                        hooks, self, 'apply', self._generate,
+                        [waveform[start:end] for start, end in batch], True)
+                    # The owned part of a window depends on its neighbours.
+                    segments = stitch_segments([[]] * i + segments, seconds,
+                                               self.stride_length)
+                    for window_segments in segments[i:]:
+                        text = _join_texts(
+                            [seg['text'] for seg in window_segments])
+                        output_bytes += len(text)
+                        yield text
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                for hook in hooks:
+                    hook.after_call(self,
+                                    time.perf_counter() - call_start,
+                                    payload_bytes(audio), output_bytes, error)
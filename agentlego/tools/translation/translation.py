@@ -35,6 +35,7 @@ class Translation(BaseTool):
         inputs=['text', 'text', 'text'],
         outputs=['text'],
     )
+    deterministic = True
 
     PROMPT = ('translate {source_lang} to {target_lang}: {input}')
 
@@ -1,49 +1,123 @@
+"""A registry of the diffusion components shared by all diffusion tools.
+
+The pipelines of the same base model, like text-to-image, ControlNet,
+inpainting and InstructPix2Pix pipelines of Stable Diffusion 1.5, are
+assembled from the same VAE, text encoder and tokenizer, and only the
+task-specific models (ControlNet or UNet) are loaded separately. All
+components are loaded by :func:`load_or_build_object`, so every weight is
+loaded only once in the process.
+"""
+import inspect
 from typing import Optional
 
 from agentlego.utils import load_or_build_object
 
+SD_BASE = 'runwayml/stable-diffusion-v1-5'
+
+
+def _dtype(device):
+    import torch
+    return torch.float16 if 'cuda' in str(device) else torch.float32
+
+
+def load_component(component_cls,
+                   model: str,
+                   subfolder: Optional[str] = None,
+                   device=None,
+                   **kwargs):
+    """Load a diffusion component, like a UNet or a ControlNet, once.
+
+    Args:
+        component_cls (type): The class of the component.
+        model (str): The model name or path.
+        subfolder (str, optional): The subfolder of the component in the
+            model repository. Defaults to None.
+        device (str, optional): The device to load the component, also
+            decides the dtype. Defaults to None.
+        **kwargs: The other arguments of ``from_pretrained``.
+    """
+    if 'torch_dtype' not in kwargs:
+        kwargs['torch_dtype'] = _dtype(device)
+    if subfolder is not None:
+        kwargs['subfolder'] = subfolder
+    component = load_or_build_object(component_cls.from_pretrained, model,
+                                     **kwargs)
+    return component.to(device)
+
+
+def load_components(pipeline_cls,
+                    model: str,
+                    variant: Optional[str] = 'fp16',
+                    vae: Optional[str] = None,
+                    vae_variant: Optional[str] = None,
+                    device=None) -> dict:
+    """Load all components of a base model once.
+
+    Returns:
+        dict: The components, which can be shared by multiple pipelines.
+    """
+    from diffusers import AutoencoderKL
+
+    params = {'torch_dtype': _dtype(device)}
+    if variant is not None:
+        params['variant'] = variant
+    if vae is not None:
+        params['vae'] = load_component(
+            AutoencoderKL, vae, variant=vae_variant, device=device)
+
+    pipe = load_or_build_object(pipeline_cls.from_pretrained, model, **params)
+    return dict(pipe.to(device).components)
+
+
+def assemble_pipeline(pipeline_cls, components: dict, **overrides):
+    """Assemble a pipeline as a view over the shared components.
+
+    The scheduler is copied since it holds the states of a run, and the
+    other components are shared.
+
+    Args:
+        pipeline_cls (type): The class of the pipeline.
+        components (dict): The shared components.
+        **overrides: The components to replace or add, like ``unet`` and
+            ``controlnet``.
+    """
+    components = {**components, **overrides}
+    scheduler = components['scheduler']
+    if 'scheduler' not in overrides:
+        components['scheduler'] = scheduler.from_config(scheduler.config)
 
-def load_sd(model: str = 'runwayml/stable-diffusion-v1-5',
+    accepted = inspect.signature(pipeline_cls.__init__).parameters
+    return pipeline_cls(**{
+        k: v
+        for k, v in components.items() if k in accepted
+    })
+
+
+def load_sd(model: str = SD_BASE,
             variant: Optional[str] = 'fp16',
             vae: Optional[str] = None,
             vae_variant: Optional[str] = None,
             controlnet: Optional[str] = None,
             controlnet_variant: Optional[str] = None,
             device=None):
-    import torch
-    from diffusers import (AutoencoderKL, ControlNetModel,
-                           StableDiffusionControlNetPipeline,
+    from diffusers import (ControlNetModel, StableDiffusionControlNetPipeline,
                            StableDiffusionPipeline)
 
-    dtype = torch.float16 if 'cuda' in str(device) else torch.float32
-    params = {'torch_dtype': dtype}
-
-    if variant is not None:
-        params['variant'] = variant
-    if vae is not None:
-        vae = load_or_build_object(
-            AutoencoderKL.from_pretrained,
-            vae,
-            torch_dtype=dtype,
-            variant=vae_variant,
-        )
-        params['vae'] = vae
-
-    t2i = load_or_build_object(StableDiffusionPipeline.from_pretrained, model,
-                               **params)
+    components = load_components(StableDiffusionPipeline, model, variant, vae,
+                                 vae_variant, device)
 
     if controlnet is None:
-        return t2i.to(device)
+        return assemble_pipeline(StableDiffusionPipeline, components)
     else:
-        controlnet = load_or_build_object(
-            ControlNetModel.from_pretrained,
+        controlnet = load_component(
+            ControlNetModel,
             controlnet,
-            torch_dtype=dtype,
             variant=controlnet_variant,
-        )
-        pipe = StableDiffusionControlNetPipeline(
-            **t2i.components, controlnet=controlnet)
-        return pipe.to(device)
+            device=device)
+        return assemble_pipeline(
+            StableDiffusionControlNetPipeline,
+            components,
+            controlnet=controlnet)
 
 
 def load_sdxl(model: str = 'stabilityai/stable-diffusion-xl-base-1.0',
@@ -53,36 +127,58 @@ def load_sdxl(model: str = 'stabilityai/stable-diffusion-xl-base-1.0',
               controlnet: Optional[str] = None,
               controlnet_variant: Optional[str] = None,
               device=None):
-    import torch
-    from diffusers import (AutoencoderKL, ControlNetModel,
+    from diffusers import (ControlNetModel,
                            StableDiffusionXLControlNetPipeline,
                            StableDiffusionXLPipeline)
-    dtype = torch.float16 if 'cuda' in str(device) else torch.float32
-    params = {'torch_dtype': dtype}
 
-    if variant is not None:
-        params['variant'] = variant
-    if vae is not None:
-        vae = load_or_build_object(
-            AutoencoderKL.from_pretrained,
-            vae,
-            torch_dtype=dtype,
-            variant=vae_variant,
-        )
-        params['vae'] = vae
-
-    t2i = load_or_build_object(StableDiffusionXLPipeline.from_pretrained,
-                               model, **params)
+    components = load_components(StableDiffusionXLPipeline, model, variant,
+                                 vae, vae_variant, device)
 
     if controlnet is None:
-        return t2i.to(device)
+        return assemble_pipeline(StableDiffusionXLPipeline, components)
     else:
-        controlnet = load_or_build_object(
-            ControlNetModel.from_pretrained,
+        controlnet = load_component(
+            ControlNetModel,
             controlnet,
-            torch_dtype=dtype,
             variant=controlnet_variant,
-        )
-        pipe = StableDiffusionXLControlNetPipeline(
-            **t2i.components, controlnet=controlnet)
-        return pipe.to(device)
+            device=device)
+        return assemble_pipeline(
+            StableDiffusionXLControlNetPipeline,
+            components,
+            controlnet=controlnet)
+
+
+def load_sd_unet_variant(pipeline_cls,
+                         model: str,
+                         base: Optional[str] = SD_BASE,
+                         variant: Optional[str] = None,
+                         device=None,
+                         **overrides):
+    """Load a pipeline whose UNet is fine-tuned from the base model with the
+    VAE and the text encoder frozen, like inpainting and InstructPix2Pix.
+
+    Args:
+        pipeline_cls (type): The class of the pipeline.
+        model (str): The model name or path of the fine-tuned model.
+        base (str, optional): The base model to share the other components.
+            Defaults to Stable Diffusion 1.5. If None, load all components
+            from ``model``.
+        variant (str, optional): The variant of the UNet. Defaults to None.
+        device (str, optional): The device to load the pipeline.
+        **overrides: The other components to replace.
+    """
+    from diffusers import StableDiffusionPipeline, UNet2DConditionModel
+
+    if base is None:
+        components = load_components(
+            pipeline_cls, model, variant=variant, device=device)
+        return assemble_pipeline(pipeline_cls, components, **overrides)
+
+    components = load_components(StableDiffusionPipeline, base, device=device)
+    unet = load_component(
+        UNet2DConditionModel,
+        model,
+        subfolder='unet',
+        variant=variant,
+        device=device)
+    return assemble_pipeline(pipeline_cls, components, unet=unet, **overrides)
@@ -0,0 +1,49 @@
+import os
+import re
+
+import numpy as np
+
+from agentlego.utils import LRUCache, hash_array
+
+# The grounding results shared by all tools in the process, keyed by the
+# model, the image content and the normalized text prompt.
+GROUNDING_CACHE = LRUCache(
+    max_size=int(os.getenv('AGENTLEGO_GROUNDING_CACHE_SIZE', 32)))
+
+
+def normalize_prompt(text: str) -> str:
+    """Lower the case and collapse the whitespaces of the text prompt, used
+    in the cache key.
+
+    The BERT tokenizer of GLIP is uncased, so that the normalization doesn't
+    change the boxes and scores. The label names come from the prompt sent
+    to the inferencer, which is the original one.
+    """
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def ground(inferencer, model: str, image: np.ndarray, text: str):
+    """Run the grounding detection with the :data:`GROUNDING_CACHE`.
+
+    Args:
+        inferencer (mmdet.apis.DetInferencer): The grounding inferencer.
+        model (str): The model name of the inferencer, used in the cache key.
+        image (np.ndarray): The RGB image.
+        text (str): The text prompt.
+
+    Returns:
+        mmdet.structures.DetDataSample: The prediction, which shouldn't be
+        modified in place since it's shared by all callers. For a cached
+        prediction, the label names keep the case of the first prompt.
+    """
+    key = (model, hash_array(image), normalize_prompt(text))
+    prediction = GROUNDING_CACHE.get(key)
+    if prediction is None:
+        results = inferencer(
+            inputs=image[:, :, ::-1],  # Input BGR
+            texts=text,
+            no_save_vis=True,
+            return_datasamples=True)
+        prediction = results['predictions'][0]
+        GROUNDING_CACHE.put(key, prediction)
+    return prediction
@@ -0,0 +1,175 @@
+"""Morphological operations and compositing of binary masks.
+
+All operations are vectorized with NumPy. The square kernel is separable
+and every pass is a prefix sum regardless of the radius, and the elliptical
+kernel is decomposed into horizontal runs of ``radius + 1`` widths at most.
+The dilation only processes the bounding box of the mask, so the cost grows
+with the extent of the object instead of the number of true pixels.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+KERNEL_SHAPES = ('square', 'ellipse')
+
+
+def _as_bool(mask) -> np.ndarray:
+    if hasattr(mask, 'numpy'):
+        # torch.Tensor
+        mask = mask.detach().cpu().numpy()
+    return np.asarray(mask).astype(bool, copy=False)
+
+
+def _window_any(mask: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """Whether any pixel is true within ``radius`` along the axis."""
+    mask = np.moveaxis(mask, axis, 0)
+    cumsum = np.zeros(
+        (mask.shape[0] + 2 * radius + 1, ) + mask.shape[1:], dtype=np.int32)
+    np.cumsum(mask, axis=0, out=cumsum[radius + 1:mask.shape[0] + radius + 1])
+    cumsum[mask.shape[0] + radius + 1:] = cumsum[mask.shape[0] + radius]
+    window = cumsum[2 * radius + 1:] > cumsum[:mask.shape[0]]
+    return np.moveaxis(window, 0, axis)
+
+
+def _bbox(mask: np.ndarray, margin: int):
+    """The bounding box of the true pixels, expanded by ``margin``."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    height, width = mask.shape
+    top, bottom = max(0, rows[0] - margin), min(height, rows[-1] + margin + 1)
+    left, right = max(0, cols[0] - margin), min(width, cols[-1] + margin + 1)
+    return slice(top, bottom), slice(left, right)
+
+
+def _ellipse_half_widths(radius: int) -> np.ndarray:
+    """The half width of every row of a circular kernel."""
+    dy = np.arange(-radius, radius + 1)
+    return np.floor(np.sqrt(radius**2 - dy**2) + 1e-6).astype(int)
+
+
+def dilate(mask, radius: int, kernel: str = 'square') -> np.ndarray:
+    """Dilate a binary mask.
+
+    Args:
+        mask (np.ndarray | torch.Tensor): The mask of shape (H, W).
+        radius (int): The radius of the kernel. The square kernel has a side
+            length of ``2 * radius + 1``.
+        kernel (str): The kernel shape, "square" or "ellipse".
+            Defaults to "square".
+
+    Returns:
+        np.ndarray: The dilated boolean mask.
+    """
+    assert kernel in KERNEL_SHAPES, f'Unknown kernel shape `{kernel}`.'
+    mask = _as_bool(mask)
+    if radius <= 0 or not mask.any():
+        return mask.copy()
+
+    # Only the pixels near the mask can change.
+    box = _bbox(mask, radius)
+    output = np.zeros_like(mask)
+    output[box] = _dilate(mask[box], radius, kernel)
+    return output
+
+
+def _dilate(mask: np.ndarray, radius: int, kernel: str) -> np.ndarray:
+    if kernel == 'square':
+        return _window_any(_window_any(mask, radius, 0), radius, 1)
+
+    # The horizontal runs of all widths share a prefix sum of every row.
+    height, width = mask.shape
+    cumsum = np.zeros((height, width + 2 * radius + 1), dtype=np.int32)
+    np.cumsum(mask, axis=1, out=cumsum[:, radius + 1:width + radius + 1])
+    cumsum[:, width + radius + 1:] = cumsum[:, width + radius, None]
+
+    output = np.zeros_like(mask)
+    runs = {}
+    for dy, half_width in zip(
+            range(-radius, radius + 1), _ellipse_half_widths(radius)):
+        if abs(dy) >= height:
+            continue
+        if half_width not in runs:
+            start, end = radius - half_width, radius + half_width + 1
+            runs[half_width] = (
+                cumsum[:, end:end + width] > cumsum[:, start:start + width])
+        # Every pixel spreads its horizontal run to the row `y + dy`.
+        src = runs[half_width][max(0, -dy):height - max(0, dy)]
+        output[max(0, dy):height - max(0, -dy)] |= src
+    return output
+
+
+def erode(mask, radius: int, kernel: str = 'square') -> np.ndarray:
+    """Erode a binary mask.
+
+    The area out of the mask is regarded as false, the same as dilating the
+    background.
+
+    Args:
+        mask (np.ndarray | torch.Tensor): The mask of shape (H, W).
+        radius (int): The radius of the kernel.
+        kernel (str): The kernel shape, "square" or "ellipse".
+            Defaults to "square".
+
+    Returns:
+        np.ndarray: The eroded boolean mask.
+    """
+    mask = _as_bool(mask)
+    background = np.pad(~mask, radius, constant_values=True)
+    eroded = ~dilate(background, radius, kernel)
+    return eroded[radius:radius + mask.shape[0], radius:radius + mask.shape[1]]
+
+
+def feather(mask, radius: int) -> np.ndarray:
+    """Soften the edge of a binary mask by a box blur.
+
+    Args:
+        mask (np.ndarray | torch.Tensor): The mask of shape (H, W).
+        radius (int): The radius of the blur.
+
+    Returns:
+        np.ndarray: The float32 alpha mask in the range [0, 1].
+    """
+    mask = _as_bool(mask)
+    if radius <= 0:
+        return mask.astype(np.float32)
+
+    # Integral image with a zero row & column ahead.
+    size = 2 * radius + 1
+    padded = np.pad(mask, radius, mode='edge').astype(np.int64)
+    integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), np.int64)
+    integral[1:, 1:] = padded.cumsum(0).cumsum(1)
+    height, width = mask.shape
+    total = (
+        integral[size:size + height, size:size + width] -
+        integral[:height, size:size + width] -
+        integral[size:size + height, :width] + integral[:height, :width])
+    return (total / (size * size)).astype(np.float32)
+
+
+def paint_labels(masks: Sequence[np.ndarray],
+                 boxes: Optional[Sequence[Sequence[int]]] = None,
+                 dtype=np.uint16) -> np.ndarray:
+    """Paint masks into a label map in order, the later masks on top.
+
+    Args:
+        masks (Sequence[np.ndarray]): The masks of shape (H, W).
+        boxes (Sequence[Sequence[int]], optional): The bounding boxes of the
+            masks in XYWH format, like the ``bbox`` of SAM annotations. Only
+            the pixels in the box are painted. Defaults to None, which means
+            to paint the whole mask.
+        dtype: The dtype of the label map. Defaults to uint16.
+
+    Returns:
+        np.ndarray: The label map, where 0 is the background and ``i + 1``
+        is the ``i``-th mask.
+    """
+    labels = np.zeros(np.shape(masks[0]), dtype=dtype)
+    for i, mask in enumerate(masks):
+        if boxes is not None:
+            x, y, w, h = (int(v) for v in boxes[i])
+            # The right & bottom edges of SAM boxes are inclusive.
+            region = (slice(y, y + h + 1), slice(x, x + w + 1))
+        else:
+            region = (slice(None), slice(None))
+        labels[region][np.asarray(mask[region], dtype=bool)] = i + 1
+    return labels
@@ -1,4 +1,4 @@
-from typing import Callable, Union
+from typing import Callable, List, Union
 
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
@@ -49,3 +49,11 @@ class VisualQuestionAnswering(BaseTool):
     def apply(self, image: ImageIO, text: str) -> str:
         image = image.to_array()[:, :, ::-1]
         return self._inferencer(image, text)[0]['pred_answer']
+
+    def apply_batch(self, batch_inputs: List[dict]) -> List[str]:
+        images = [
+            inputs['image'].to_array()[:, :, ::-1] for inputs in batch_inputs
+        ]
+        texts = [inputs['text'] for inputs in batch_inputs]
+        results = self._inferencer(images, texts, batch_size=len(images))
+        return [res['pred_answer'] for res in results]
@@ -1,10 +1,11 @@
+from io import BytesIO
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional, Union
 
 import numpy as np
 from PIL import Image
 
-from .utils import temp_path
+from .utils import ARTIFACTS
 
 if TYPE_CHECKING:
     import torch
@@ -17,6 +18,11 @@ def _typename(obj):
 class IOType:
     support_types = {}
 
+    # The relative cost of converting from a representation to another,
+    # used to choose the cheapest source among the existing representations.
+    # The conversions not listed here have a cost of 1.
+    conversion_costs = {}
+
     def __init__(self, value):
         if type(value).__qualname__ == 'AgentType':
             # Handle hugginface agent
@@ -35,24 +41,64 @@ class IOType:
                 f'The value type `{type(value)}` is not '
                 f'supported by `{self.__class__.__name__}`')
 
+        # All representations produced, every one is converted at most once.
+        self._cache = {self.type: self.value}
+        if self.type == 'path':
+            ARTIFACTS.retain(self.value, self)
+
     def to(self, dst_type: str):
-        if self.type == dst_type:
-            return self.value
+        """Convert to the specified representation.
 
-        assert dst_type in self.support_types
-        convert_fn = f'_{self.type}_to_{dst_type}'
-        assert hasattr(self, convert_fn)
+        The converted representations are cached, so the returned value may
+        be shared by multiple calls. Please don't modify it in-place.
+        """
+        if dst_type in self._cache:
+            return self._cache[dst_type]
 
-        return getattr(self, convert_fn)(self.value)
+        assert dst_type in self.support_types
+        sources = [
+            src for src in self._cache
+            if hasattr(self, f'_{src}_to_{dst_type}')
+        ]
+        assert len(sources) > 0, f'Cannot convert to `{dst_type}`.'
+        src = min(
+            sources,
+            key=lambda src: self.conversion_costs.get((src, dst_type), 1))
+
+        value = getattr(self, f'_{src}_to_{dst_type}')(self._cache[src])
+        self._cache[dst_type] = value
+        if dst_type == 'path':
+            # Keep the file until this object is deleted.
+            ARTIFACTS.retain(value, self)
+        return value
 
     def __str__(self) -> str:
         return f'{self.__class__.__name__}(value={self.value})'
 
 
 class ImageIO(IOType):
-    support_types = {'path': str, 'pil': Image.Image, 'array': np.ndarray}
-
-    def __init__(self, value: Union[str, np.ndarray, Image.Image]):
+    support_types = {
+        'path': str,
+        'pil': Image.Image,
+        'array': np.ndarray,
+        'buffer': BytesIO,
+    }
+    conversion_costs = {
+        ('array', 'pil'): 1,
+        ('pil', 'array'): 1,
+        ('path', 'buffer'): 2,
+        ('buffer', 'path'): 3,
+        ('path', 'pil'): 5,
+        ('path', 'array'): 5,
+        ('buffer', 'pil'): 5,
+        ('buffer', 'array'): 5,
+        ('pil', 'buffer'): 10,
+        ('array', 'buffer'): 10,
+        ('pil', 'path'): 12,
+        ('array', 'path'): 12,
+    }
+
+    def __init__(self, value: Union[str, np.ndarray, Image.Image, BytesIO]):
         super().__init__(value)
         if self.type == 'path' and not Path(self.value).exists():
             raise FileNotFoundError(f"No such file: '{self.value}'")
@@ -66,6 +112,10 @@ class ImageIO(IOType):
     def to_array(self) -> np.ndarray:
         return self.to('array')
 
+    def to_buffer(self) -> BytesIO:
+        """Get the encoded image file in memory, without writing to disk."""
+        return self.to('buffer')
+
     @staticmethod
     def _path_to_pil(path: str) -> Image.Image:
         return Image.open(path)
@@ -74,33 +124,73 @@ class ImageIO(IOType):
     def _path_to_array(path: str) -> np.ndarray:
         return np.array(Image.open(path).convert('RGB'))
 
+    @staticmethod
+    def _path_to_buffer(path: str) -> BytesIO:
+        return BytesIO(Path(path).read_bytes())
+
     @staticmethod
     def _pil_to_path(image: Image.Image) -> str:
-        filename = temp_path('image', '.png')
-        image.save(filename)
-        return filename
+        return ARTIFACTS.save('image', '.png', image.save)
 
     @staticmethod
     def _pil_to_array(image: Image.Image) -> np.ndarray:
         return np.array(image.convert('RGB'))
 
+    @staticmethod
+    def _pil_to_buffer(image: Image.Image) -> BytesIO:
+        buffer = BytesIO()
+        image.save(buffer, format='png')
+        buffer.seek(0)
+        return buffer
+
     @staticmethod
     def _array_to_pil(image: np.ndarray) -> Image.Image:
         return Image.fromarray(image)
 
     @staticmethod
     def _array_to_path(image: np.ndarray) -> str:
-        filename = temp_path('image', '.png')
-        Image.fromarray(image).save(filename)
-        return filename
+        return ARTIFACTS.save('image', '.png', Image.fromarray(image).save)
+
+    @staticmethod
+    def _array_to_buffer(image: np.ndarray) -> BytesIO:
+        return ImageIO._pil_to_buffer(Image.fromarray(image))
+
+    @staticmethod
+    def _buffer_to_pil(buffer: BytesIO) -> Image.Image:
+        # Use an independent stream since PIL reads the image lazily.
+        return Image.open(BytesIO(buffer.getvalue()))
+
+    @staticmethod
+    def _buffer_to_array(buffer: BytesIO) -> np.ndarray:
+        return np.array(ImageIO._buffer_to_pil(buffer).convert('RGB'))
+
+    @staticmethod
+    def _buffer_to_path(buffer: BytesIO) -> str:
+        image = ImageIO._buffer_to_pil(buffer)
+        suffix = f'.{image.format.lower()}' if image.format else '.png'
+        return ARTIFACTS.write('image', suffix, buffer.getvalue())
 
 
 class AudioIO(IOType):
     DEFAULT_SAMPLING_RATE = 16000
-    support_types = {'tensor': 'torch.Tensor', 'path': str}
+    support_types = {'tensor': 'torch.Tensor', 'path': str, 'buffer': BytesIO}
+    _AUDIO_MAGICS = {
+        b'RIFF': '.wav',
+        b'fLaC': '.flac',
+        b'OggS': '.ogg',
+        b'ID3': '.mp3',
+    }
+    conversion_costs = {
+        ('path', 'buffer'): 2,
+        ('buffer', 'path'): 3,
+        ('path', 'tensor'): 5,
+        ('buffer', 'tensor'): 5,
+        ('tensor', 'buffer'): 10,
+        ('tensor', 'path'): 12,
+    }
 
     def __init__(self,
-                 value: Union[np.ndarray, 'torch.Tensor', str],
+                 value: Union[np.ndarray, 'torch.Tensor', str, BytesIO],
                  sampling_rate: Optional[int] = None):
         if type(value).__qualname__ == 'AgentAudio':
             # Handle hugginface agent
@@ -117,7 +207,7 @@ class AudioIO(IOType):
     def sampling_rate(self) -> int:
         if self._sampling_rate is not None:
             return self._sampling_rate
-        elif self.type == 'path':
+        elif self.type in ['path', 'buffer']:
             self.to('tensor')
             return self._sampling_rate
         else:
@@ -129,17 +219,45 @@ class AudioIO(IOType):
     def to_path(self) -> str:
         return self.to('path')
 
+    def to_buffer(self) -> BytesIO:
+        """Get the encoded audio file in memory, without writing to disk."""
+        return self.to('buffer')
+
     def _path_to_tensor(self, path: str) -> 'torch.Tensor':
         import torchaudio
         audio, sampling_rate = torchaudio.load(path)
         self._sampling_rate = sampling_rate
         return audio
 
+    def _path_to_buffer(self, path: str) -> BytesIO:
+        return BytesIO(Path(path).read_bytes())
+
     def _tensor_to_path(self, tensor: 'torch.Tensor') -> str:
         import torchaudio
-        filename = temp_path('audio', '.wav')
-        torchaudio.save(filename, tensor, self.sampling_rate)
-        return filename
+        return ARTIFACTS.save(
+            'audio', '.wav',
+            lambda path: torchaudio.save(path, tensor, self.sampling_rate))
+
+    def _tensor_to_buffer(self, tensor: 'torch.Tensor') -> BytesIO:
+        import torchaudio
+        buffer = BytesIO()
+        torchaudio.save(buffer, tensor, self.sampling_rate, format='wav')
+        buffer.seek(0)
+        return buffer
+
+    def _buffer_to_tensor(self, buffer: BytesIO) -> 'torch.Tensor':
+        import torchaudio
+        audio, sampling_rate = torchaudio.load(BytesIO(buffer.getvalue()))
+        self._sampling_rate = sampling_rate
+        return audio
+
+    def _buffer_to_path(self, buffer: BytesIO) -> str:
+        head = buffer.getvalue()[:4]
+        suffix = '.wav'
+        for magic, ext in self._AUDIO_MAGICS.items():
+            if head.startswith(magic):
+                suffix = ext
+        return ARTIFACTS.write('audio', suffix, buffer.getvalue())
 
 
 CatgoryToIO = {
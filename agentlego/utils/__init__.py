@@ -1,8 +1,12 @@
-from .cache import load_or_build_object
+from .artifacts import ARTIFACTS, ArtifactStore
+from .batching import MicroBatcher
+from .cache import LRUCache, hash_array, load_or_build_object
 from .dependency import is_package_available, require
 from .file import download_checkpoint, download_url_to_file, temp_path
+from .metrics import METRICS, MetricsRegistry
 
 __all__ = [
     'temp_path', 'load_or_build_object', 'require', 'is_package_available',
-    'download_checkpoint', 'download_url_to_file'
+    'download_checkpoint', 'download_url_to_file', 'MicroBatcher', 'LRUCache',
+    'hash_array', 'METRICS', 'MetricsRegistry', 'ARTIFACTS', 'ArtifactStore'
 ]
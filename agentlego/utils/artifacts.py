@@ -0,0 +1,351 @@
+"""A managed store of the files produced by the tools, like the images and
+audios converted to paths.
+
+The files are named by the digest of their content, so the same content is
+saved once, and are sharded into subdirectories by the digest prefix, like
+``generated/image/3f/3fa8...c1.png``. The store removes the files older than
+``max_age`` and the least recently used files if the total size exceeds
+``max_bytes``, except the files referenced by live :class:`ImageIO` and
+:class:`AudioIO` objects in this process. Only the files in this layout
+are removed, and the other files in the directory are kept.
+"""
+import hashlib
+import os
+import os.path as osp
+import re
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .cache import _parse_bytes
+
+_TMP_DIR = '.tmp'
+# The files saved by the store, named by the digest and the suffix.
+_SHARD_NAME = re.compile(r'[0-9a-f]{2}')
+_FILE_NAME = re.compile(r'[0-9a-f]{32}(\.\w+)?')
+# The default of the settings to keep unchanged in `configure`.
+_UNCHANGED = object()
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _touch(path: str):
+    """Mark the file as recently used."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+class ArtifactStore:
+    """A content-addressed directory of the generated files with a quota.
+
+    The modification time of a file is its last used time, which is
+    updated when the same content is saved again or an IO object refers to
+    the file. Since multiple processes may share the directory, the garbage
+    collection scans the directory instead of trusting the records in this
+    process, and the files of other processes are protected by ``min_age``
+    only.
+
+    Args:
+        root (str): The directory of the files. Defaults to "generated".
+        max_bytes (int, optional): The maximum total size of the files.
+            Defaults to None, which means no limit.
+        max_age (float, optional): The maximum seconds to keep an unused
+            file. Defaults to None, which means no limit.
+        min_age (float): Never remove the files used in the recent seconds,
+            since the paths may have been returned to the agents as strings.
+            Defaults to 60.
+        gc_interval (float): The minimum seconds between two garbage
+            collections. Defaults to 30.
+    """
+
+    def __init__(self,
+                 root: str = 'generated',
+                 max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None,
+                 min_age: float = 60.,
+                 gc_interval: float = 30.):
+        self._lock = threading.RLock()
+        self._refs: Dict[str, int] = {}
+        self.collections = 0
+        self.removed_files = 0
+        self.configure(root, max_bytes, max_age, min_age, gc_interval)
+
+    def configure(self,
+                  root: Optional[str] = None,
+                  max_bytes: Optional[int] = _UNCHANGED,
+                  max_age: Optional[float] = _UNCHANGED,
+                  min_age: Optional[float] = None,
+                  gc_interval: Optional[float] = None):
+        """Set the directory, the quota and the ages of the files. The
+        omitted settings are unchanged, and use None to remove the limit of
+        ``max_bytes`` or ``max_age``."""
+        with self._lock:
+            if root is not None:
+                self.root = osp.abspath(osp.expanduser(root))
+                # The total size is unknown until the next scan.
+                self._total = None
+            if max_bytes is not _UNCHANGED:
+                self.max_bytes = max_bytes
+            if max_age is not _UNCHANGED:
+                self.max_age = max_age
+            if min_age is not None:
+                self.min_age = min_age
+            if gc_interval is not None:
+                self.gc_interval = gc_interval
+            self._last_gc = 0.
+
+    def owns(self, path: str) -> bool:
+        """Whether the file is in the store."""
+        return osp.abspath(path).startswith(self.root + os.sep)
+
+    def _target(self, category: str, digest: str, suffix: str) -> str:
+        return osp.join(self.root, category, digest[:2], digest + suffix)
+
+    def _tmp_file(self, suffix: str) -> str:
+        tmp_dir = osp.join(self.root, _TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        return osp.join(tmp_dir, uuid.uuid4().hex + suffix)
+
+    def _reuse(self, target: str) -> bool:
+        """Mark the file used if it exists. It's under the lock, so that the
+        garbage collection of this process won't remove it meanwhile."""
+        with self._lock:
+            if not osp.exists(target):
+                return False
+            _touch(target)
+            return True
+
+    def _commit(self, tmp: str, target: str) -> str:
+        """Move a complete file to the target, or drop it if the same
+        content exists."""
+        size = osp.getsize(tmp)
+        if self._reuse(target):
+            os.remove(tmp)
+            return target
+        os.makedirs(osp.dirname(target), exist_ok=True)
+        os.replace(tmp, target)
+        with self._lock:
+            if self._total is not None:
+                self._total += size
+        self._maybe_collect(keep=target)
+        return target
+
+    def write(self, category: str, suffix: str, data: bytes) -> str:
+        """Save the content of a file.
+
+        Args:
+            category (str): The subdirectory, like "image" or "audio".
+            suffix (str): The extension of the file, like ".png".
+            data (bytes): The file content.
+
+        Returns:
+            str: The absolute path of the file.
+        """
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        target = self._target(category, digest, suffix)
+        if self._reuse(target):
+            return target
+        tmp = self._tmp_file(suffix)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        return self._commit(tmp, target)
+
+    def save(self, category: str, suffix: str, writer: Callable) -> str:
+        """Save a file written by a function, like ``image.save``.
+
+        Args:
+            category (str): The subdirectory, like "image" or "audio".
+            suffix (str): The extension of the file, like ".png".
+            writer (Callable): The function to write the file to the given
+                path, which ends with the ``suffix``.
+
+        Returns:
+            str: The absolute path of the file.
+        """
+        tmp = self._tmp_file(suffix)
+        try:
+            writer(tmp)
+            target = self._target(category, _file_digest(tmp), suffix)
+            return self._commit(tmp, target)
+        finally:
+            if osp.exists(tmp):
+                os.remove(tmp)
+
+    def retain(self, path: str, owner):
+        """Protect the file from the garbage collection until the ``owner``
+        is deleted."""
+        if not self.owns(path):
+            return
+        path = osp.abspath(path)
+        with self._lock:
+            self._refs[path] = self._refs.get(path, 0) + 1
+        weakref.finalize(owner, self._release, path)
+        _touch(path)
+
+    def _release(self, path: str):
+        with self._lock:
+            count = self._refs.get(path, 0) - 1
+            if count > 0:
+                self._refs[path] = count
+            else:
+                self._refs.pop(path, None)
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """The last used time, the size and the path of every file saved by
+        the store, in the ``<category>/<xx>/<digest><suffix>`` layout. The
+        other files in the directory, like the files of :func:`temp_path`,
+        are never touched."""
+        files = []
+        for category in _list_dirs(self.root):
+            if category.name == _TMP_DIR:
+                continue
+            for shard in _list_dirs(category.path):
+                if not _SHARD_NAME.fullmatch(shard.name):
+                    continue
+                for entry in _list_files(shard.path):
+                    if not (entry.name.startswith(shard.name)
+                            and _FILE_NAME.fullmatch(entry.name)):
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _clean_tmp(self, now: float):
+        """Remove the temporary files left by the crashed writers."""
+        for entry in _list_files(osp.join(self.root, _TMP_DIR)):
+            try:
+                if now - entry.stat().st_mtime > self.min_age:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+    def _maybe_collect(self, keep: Optional[str] = None):
+        now = time.time()
+        if now - self._last_gc < self.gc_interval:
+            # Collect earlier if the quota is exceeded, but at most once a
+            # second to avoid scanning repeatedly if all files are in use.
+            over_quota = (
+                self.max_bytes is not None and self._total is not None
+                and self._total > self.max_bytes)
+            if not over_quota or now - self._last_gc < 1:
+                return
+        if self.max_bytes is None and self.max_age is None:
+            return
+        self.collect(keep=keep)
+
+    def collect(self, keep: Optional[str] = None) -> int:
+        """Remove the expired files and the least recently used files over
+        the quota, down to 90% of the quota to avoid collecting frequently.
+
+        Args:
+            keep (str, optional): A file not to remove, like the file just
+                saved. Defaults to None.
+
+        Returns:
+            int: The number of removed files.
+        """
+        with self._lock:
+            now = time.time()
+            self._last_gc = now
+            self._clean_tmp(now)
+            files = sorted(self._scan())
+            total = sum(size for _, size, _ in files)
+            target = None
+            if self.max_bytes is not None and total > self.max_bytes:
+                target = self.max_bytes * 0.9
+
+            removed = 0
+            for mtime, size, path in files:
+                expired = (
+                    self.max_age is not None and now - mtime > self.max_age)
+                if not expired and (target is None or total <= target):
+                    # The files are sorted from the least recently used.
+                    break
+                if (now - mtime < self.min_age or path in self._refs
+                        or path == keep):
+                    continue
+                try:
+                    # Skip the file used after the scan, like by the other
+                    # processes sharing the directory.
+                    if os.stat(path).st_mtime > mtime:
+                        continue
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            self._total = total
+            self.collections += 1
+            self.removed_files += removed
+            return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                root=self.root,
+                total_bytes=self._total,
+                max_bytes=self.max_bytes,
+                referenced_files=len(self._refs),
+                collections=self.collections,
+                removed_files=self.removed_files,
+            )
+
+
+def _list_dirs(path: str) -> list:
+    try:
+        return [
+            entry for entry in os.scandir(path)
+            if entry.is_dir(follow_symlinks=False)
+        ]
+    except OSError:
+        return []
+
+
+def _list_files(path: str) -> list:
+    try:
+        return [
+            entry for entry in os.scandir(path)
+            if entry.is_file(follow_symlinks=False)
+        ]
+    except OSError:
+        return []
+
+
+def _artifact_root() -> str:
+    """The directory of the default store, set by the environment variable
+    ``AGENTLEGO_ARTIFACT_DIR``, where "tmpfs" means a directory in the
+    shared memory if available."""
+    value = os.getenv('AGENTLEGO_ARTIFACT_DIR', '')
+    if not value:
+        return 'generated'
+    if value.lower() == 'tmpfs':
+        shm = '/dev/shm'
+        base = shm if osp.isdir(shm) else tempfile.gettempdir()
+        return osp.join(base, 'agentlego-artifacts')
+    return value
+
+
+def _float_env(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+ARTIFACTS = ArtifactStore(
+    root=_artifact_root(),
+    max_bytes=_parse_bytes(os.getenv('AGENTLEGO_ARTIFACT_MAX_BYTES')),
+    max_age=_float_env('AGENTLEGO_ARTIFACT_MAX_AGE'),
+)
@@ -0,0 +1,107 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+
+class MicroBatcher:
+    """Gather concurrent requests into batches and dispatch them together.
+
+    The requests submitted from different threads are put into a queue, and a
+    background worker collects them into a batch until ``max_batch_size``
+    requests are collected or ``max_wait`` seconds have elapsed since the
+    first request of the batch arrived.
+
+    Args:
+        batch_fn (Callable): The function to process a batch. It receives a
+            list of requests and should return a list of results in the same
+            order.
+        max_batch_size (int): The maximum number of requests in a batch.
+            Defaults to 8.
+        max_wait (float): The maximum seconds to wait for more requests
+            after the first request of a batch. Defaults to 0.01.
+        single_fn (Callable, optional): The function to process a single
+            request. If a batch fails, every request is processed by it
+            again, so that a bad request won't fail the others. Defaults to
+            None, which means to process the request as a batch of one.
+    """
+
+    def __init__(self,
+                 batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 8,
+                 max_wait: float = 0.01,
+                 single_fn: Optional[Callable[[Any], Any]] = None):
+        assert max_batch_size >= 1, '`max_batch_size` should be positive.'
+        self.batch_fn = batch_fn
+        self.single_fn = single_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def submit(self, request: Any) -> Any:
+        """Submit a request and block until its result is ready."""
+        future = Future()
+        self._start_worker()
+        self._queue.put((request, future))
+        return future.result()
+
+    def _start_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name='MicroBatcher', daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Still take the requests that are already queued.
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            requests = [request for request, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                results = self.batch_fn(requests)
+                if len(results) != len(requests):
+                    raise RuntimeError(
+                        f'The batch function returns {len(results)} results '
+                        f'for {len(requests)} requests.')
+            except Exception as e:
+                if len(batch) == 1:
+                    futures[0].set_exception(e)
+                else:
+                    self._run_single(batch)
+                continue
+
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def _run_single(self, batch: list):
+        """Process the requests of a failed batch one by one, and every
+        request gets its own result or exception."""
+        for request, future in batch:
+            try:
+                if self.single_fn is not None:
+                    result = self.single_fn(request)
+                else:
+                    result = self.batch_fn([request])[0]
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
@@ -1,13 +1,371 @@
-from typing import Callable
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import chain
+from typing import Any, Callable, Dict, Hashable, Optional
 
-CACHED_OBJECTS = {}
+# The default of the settings to keep unchanged in `configure`.
+_UNCHANGED = object()
+
+
+def _is_module(obj) -> bool:
+    return callable(getattr(obj, 'parameters', None)) and callable(
+        getattr(obj, 'buffers', None))
+
+
+def _is_tensor(obj) -> bool:
+    return callable(getattr(obj, 'data_ptr', None)) and callable(
+        getattr(obj, 'element_size', None))
+
+
+def _collect_tensors(obj, tensors: dict, visited: set, depth: int = 0):
+    if id(obj) in visited or depth > 3:
+        return
+    visited.add(id(obj))
+
+    if _is_tensor(obj):
+        tensors[obj.data_ptr()] = obj.numel() * obj.element_size()
+        return
+    if _is_module(obj):
+        for tensor in chain(obj.parameters(), obj.buffers()):
+            tensors[tensor.data_ptr()] = tensor.numel() * tensor.element_size()
+        return
+
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        values = vars(obj).values()
+    else:
+        return
+    for value in values:
+        _collect_tensors(value, tensors, visited, depth + 1)
+
+
+def estimate_tensors(obj) -> Dict[int, int]:
+    """Find the tensors held by an object, including the parameters and
+    buffers of the modules in its attributes.
+
+    Returns:
+        dict: The memory size in bytes of every tensor, indexed by the data
+        pointer.
+    """
+    tensors = {}
+    _collect_tensors(obj, tensors, set())
+    return tensors
+
+
+class _Entry:
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.tensors = estimate_tensors(obj)
+        self.hits = 0
+        self.pinned = False
+        # The tools built the object during setup.
+        self.owners = weakref.WeakSet()
+
+    @property
+    def in_use(self) -> bool:
+        return any(owner._active_calls > 0 for owner in self.owners)
+
+
+class ObjectCache:
+    """A cache of the constructed objects like models, with a memory budget.
+
+    The memory usage of an object is estimated by the sizes of the tensors it
+    holds, and the tensors shared by multiple objects are counted once. If
+    the memory usage exceeds the budget, the least recently used (``lru``) or
+    the least frequently used (``lfu``) objects will be evicted, except the
+    pinned objects and the objects used by running tools. The tools which
+    built an evicted object during setup will be released and will setup
+    again at the next call.
+
+    Args:
+        max_bytes (int, optional): The memory budget in bytes. Defaults to
+            None, which means no limit.
+        policy (str): The eviction policy, "lru" or "lfu". Defaults to "lru".
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, policy: str = 'lru'):
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._lock = threading.RLock()
+        self.configure(max_bytes=max_bytes, policy=policy)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self,
+                  max_bytes: Optional[int] = _UNCHANGED,
+                  policy: Optional[str] = None):
+        """Set the memory budget and the eviction policy. The omitted
+        settings are unchanged, and use None to remove the budget."""
+        with self._lock:
+            if max_bytes is not _UNCHANGED:
+                self.max_bytes = max_bytes
+            if policy is not None:
+                assert policy in ['lru', 'lfu'], \
+                    f'Unknown eviction policy `{policy}`.'
+                self.policy = policy
+            evicted = self._shrink()
+        _release_owners(evicted)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            entry.hits += 1
+            self._entries.move_to_end(key)
+            return entry.obj
+
+    def put(self, key: str, obj: Any):
+        with self._lock:
+            self._entries[key] = _Entry(obj)
+            self._entries.move_to_end(key)
+            owner = _current_owner()
+            if owner is not None:
+                self._entries[key].owners.add(owner)
+            evicted = self._shrink(keep=key)
+        # Release the tools after dropping the lock, since the release waits
+        # for the setup lock of the tool, which may be waiting for this lock.
+        _release_owners(evicted)
+
+    def add_owner(self, key: str, owner):
+        """Record that the ``owner`` tool depends on the cached object."""
+        with self._lock:
+            if key in self._entries and owner is not None:
+                self._entries[key].owners.add(owner)
+
+    def pin(self, key: str):
+        """Never evict the object automatically."""
+        with self._lock:
+            self._entries[key].pinned = True
+
+    def unpin(self, key: str):
+        with self._lock:
+            self._entries[key].pinned = False
+
+    def evict(self, key: str) -> bool:
+        """Remove an object from the cache and release the tools depends on
+        it. The tools in use are released after their calls.
+
+        Returns:
+            bool: Whether the object is in the cache.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+            self.evictions += 1
+        _release_owners([entry])
+        return True
+
+    def clear(self):
+        """Remove all objects from the cache."""
+        for key in list(self._entries):
+            self.evict(key)
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            tensors = {}
+            for entry in self._entries.values():
+                tensors.update(entry.tensors)
+            return sum(tensors.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                num_objects=len(self._entries),
+                total_bytes=self.total_bytes,
+                max_bytes=self.max_bytes,
+            )
+
+    def _shrink(self, keep: Optional[str] = None) -> list:
+        """Remove the objects over the budget, and return the removed
+        entries to release their owners outside the lock."""
+        evicted = []
+        if self.max_bytes is None:
+            return evicted
+        while self.total_bytes > self.max_bytes:
+            candidates = [
+                key for key, entry in self._entries.items() if key != keep
+                and entry.tensors and not entry.pinned and not entry.in_use
+            ]
+            if not candidates:
+                break
+            if self.policy == 'lfu':
+                victim = min(candidates, key=lambda k: self._entries[k].hits)
+            else:
+                # The entries are ordered from the least recently used.
+                victim = candidates[0]
+            evicted.append(self._entries.pop(victim))
+            self.evictions += 1
+        return evicted
+
+
+def _release_owners(entries: list):
+    """Release the owners of the evicted entries, and the owners in use are
+    released after their calls."""
+    for entry in entries:
+        for owner in list(entry.owners):
+            owner._release_if_idle()
+
+
+class LRUCache:
+    """A thread-safe least-recently-used cache with a bounded number of
+    entries, for the intermediate results like image embeddings.
+
+    Args:
+        max_size (int): The maximum number of entries. Defaults to 16.
+    """
+
+    def __init__(self, max_size: int = 16):
+        assert max_size >= 0, '`max_size` should not be negative.'
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=self.hits / total if total else 0.,
+                evictions=self.evictions,
+                size=len(self._entries),
+                max_size=self.max_size,
+            )
+
+
+def hash_array(array) -> str:
+    """Get the digest of the content of an array, including its shape and
+    dtype."""
+    import numpy as np
+
+    array = np.ascontiguousarray(array)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{array.dtype.str}{array.shape}'.encode())
+    digest.update(memoryview(array).cast('B'))
+    return digest.hexdigest()
+
+
+def _parse_bytes(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    value = value.strip().upper().rstrip('B')
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+OBJECT_CACHE = ObjectCache(
+    max_bytes=_parse_bytes(os.getenv('AGENTLEGO_CACHE_MAX_BYTES')),
+    policy=os.getenv('AGENTLEGO_CACHE_POLICY', 'lru'),
+)
+
+_local = threading.local()
+
+
+def _current_owner():
+    owners = getattr(_local, 'owners', None)
+    return owners[-1] if owners else None
+
+
+@contextmanager
+def cache_owner(owner):
+    """Record the objects loaded in the context as dependencies of the
+    ``owner`` tool."""
+    if not hasattr(_local, 'owners'):
+        _local.owners = []
+    _local.owners.append(owner)
+    try:
+        yield
+    finally:
+        _local.owners.pop()
+
+
+_MISSING = object()
+_build_locks: Dict[str, list] = {}
+_build_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _build_lock(key: str):
+    """A lock for every key, and it's removed if no thread is waiting."""
+    with _build_locks_guard:
+        item = _build_locks.setdefault(key, [threading.Lock(), 0])
+        item[1] += 1
+    try:
+        with item[0]:
+            yield
+    finally:
+        with _build_locks_guard:
+            item[1] -= 1
+            if item[1] == 0:
+                _build_locks.pop(key, None)
 
 
 def load_or_build_object(constructor: Callable, *args, **kwargs):
+    """Get the object from the cache or build it.
+
+    If multiple threads request the same object concurrently, only one of
+    them builds it and the others wait for the result.
+    """
     tool_id = str((constructor.__qualname__, args, kwargs))
-    if tool_id in CACHED_OBJECTS:
-        return CACHED_OBJECTS[tool_id]
-    else:
-        tool = constructor(*args, **kwargs)
-        CACHED_OBJECTS[tool_id] = tool
-        return tool
+    with _build_lock(tool_id):
+        obj = OBJECT_CACHE.get(tool_id, default=_MISSING)
+        if obj is not _MISSING:
+            OBJECT_CACHE.add_owner(tool_id, _current_owner())
+            return obj
+        obj = constructor(*args, **kwargs)
+        OBJECT_CACHE.put(tool_id, obj)
+        return obj
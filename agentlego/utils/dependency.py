@@ -1,10 +1,12 @@
+import json
+import os
 import re
+import sys
+import threading
 import warnings
 from functools import wraps
-from importlib.metadata import PackageNotFoundError, distribution
 from inspect import isfunction
-
-from packaging.version import parse
+from typing import Dict, Optional
 
 
 def _digit_version(version_str: str, length: int = 4):
@@ -20,6 +22,8 @@ def _digit_version(version_str: str, length: int = 4):
     Returns:
         tuple[int]: The version info in digits (integers).
     """
+    from packaging.version import parse
+
     version = parse(version_str)
     assert version.release, f'failed to parse version {version_str}'
     release = list(version.release)
@@ -47,6 +51,115 @@ def _digit_version(version_str: str, length: int = 4):
     return tuple(release)
 
 
+def _normalize_name(name: str) -> str:
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def _snapshot_path() -> Optional[str]:
+    """The path of the installed distributions snapshot, which is enabled by
+    the environment variable ``AGENTLEGO_DEPS_SNAPSHOT``."""
+    value = os.getenv('AGENTLEGO_DEPS_SNAPSHOT', '')
+    if value.lower() in ['', '0', 'false']:
+        return None
+    if value.lower() in ['1', 'true']:
+        cache_home = os.getenv('XDG_CACHE_HOME', '~/.cache')
+        root = os.getenv('AGENTLEGO_HOME',
+                         os.path.join(cache_home, 'agentlego'))
+        return os.path.join(os.path.expanduser(root), 'deps_snapshot.json')
+    return os.path.expanduser(value)
+
+
+def _path_mtimes() -> Dict[str, float]:
+    """The modification time of the package directories in ``sys.path``,
+    which changes if any package is installed or removed."""
+    mtimes = {}
+    for path in sys.path:
+        if os.path.basename(path) not in ['site-packages', 'dist-packages']:
+            continue
+        try:
+            mtimes[path] = os.stat(path).st_mtime
+        except OSError:
+            pass
+    return mtimes
+
+
+def _load_snapshot(path: str) -> Optional[Dict[str, str]]:
+    """Load the versions of all installed distributions from the snapshot,
+    or rebuild the snapshot if it's outdated."""
+    mtimes = _path_mtimes()
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+        if (snapshot['executable'] == sys.executable
+                and snapshot['mtimes'] == mtimes):
+            return snapshot['versions']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    from importlib.metadata import distributions
+
+    versions = {}
+    # The earlier distributions in `sys.path` take precedence.
+    for dist in reversed(list(distributions())):
+        name = dist.metadata['Name']
+        if name:
+            versions[_normalize_name(name)] = dist.version
+    snapshot = dict(
+        executable=sys.executable, mtimes=mtimes, versions=versions)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return versions
+
+
+# The versions of resolved distributions, and None for not installed ones.
+_DIST_VERSIONS: Dict[str, Optional[str]] = {}
+_SNAPSHOT: Optional[Dict[str, str]] = None
+_dist_lock = threading.Lock()
+
+
+def get_dist_version(package: str) -> Optional[str]:
+    """Get the version of an installed distribution.
+
+    The results are cached in the process, and if the environment variable
+    ``AGENTLEGO_DEPS_SNAPSHOT`` is set, the versions of all installed
+    distributions are loaded from an on-disk snapshot, which is rebuilt if
+    any directory in ``sys.path`` is modified.
+
+    Args:
+        package (str): The distribution name.
+
+    Returns:
+        str | None: The version, or None if the distribution isn't
+        installed.
+    """
+    global _SNAPSHOT
+    name = _normalize_name(package)
+    with _dist_lock:
+        if name in _DIST_VERSIONS:
+            return _DIST_VERSIONS[name]
+
+        snapshot_path = _snapshot_path()
+        if snapshot_path is not None:
+            if _SNAPSHOT is None:
+                _SNAPSHOT = _load_snapshot(snapshot_path)
+            version = _SNAPSHOT.get(name)
+        else:
+            from importlib.metadata import PackageNotFoundError, distribution
+            try:
+                version = distribution(package).version
+            except PackageNotFoundError:
+                version = None
+
+        _DIST_VERSIONS[name] = version
+        return version
+
+
 def _check_dependency(dep):
     pat = '(' + '|'.join(['>=', '==', '>']) + ')'
     parts = re.split(pat, dep, maxsplit=1)
@@ -64,15 +177,11 @@ def _check_dependency(dep):
     else:
         op, version = None, None
 
-    try:
-        dist = distribution(package)
-        if op is None or getattr(_digit_version(dist.version), op)(
-                _digit_version(version)):
-            return True
-    except PackageNotFoundError:
-        pass
-
-    return False
+    installed = get_dist_version(package)
+    if installed is None:
+        return False
+    return op is None or getattr(_digit_version(installed), op)(
+        _digit_version(version))
 
 
 PACKAGE_AVAILABILITY = dict()
@@ -97,6 +206,9 @@ def is_package_available(dep):
 def require(dep, install=None):
     """A wrapper of function for extra package requirements.
 
+    The requirements are checked at the first call of the function instead of
+    the decoration, to avoid resolving the distributions at import time.
+
     Args:
         dep (Sequence[str) | str): The dependency package name,
             like ``transformers`` or ``transformers>=4.28.0``.
@@ -108,21 +220,29 @@ def require(dep, install=None):
 
     def wrapper(fn):
         assert isfunction(fn)
+        satisfied = False
+
+        def verify_require():
+            nonlocal satisfied
+            if satisfied:
+                return
+            if not all(is_package_available(item) for item in dep):
+                msg = '{name} requires {dep}, please install by `{ins}`.'
+                raise ImportError(
+                    msg.format(
+                        name=fn.__qualname__.replace('.__init__', ''),
+                        dep=', '.join(dep),
+                        ins=install or 'pip install {}'.format(' '.join(
+                            repr(i) for i in dep))))
+            satisfied = True
 
         @wraps(fn)
-        def ask_install(*args, **kwargs):
-            msg = '{name} requires {dep}, please install by `{ins}`.'.format(
-                name=fn.__qualname__.replace('.__init__', ''),
-                dep=', '.join(dep),
-                ins=install
-                or 'pip install {}'.format(' '.join(repr(i) for i in dep)))
-            raise ImportError(msg)
-
-        if all(_check_dependency(item) for item in dep):
-            fn._verify_require = getattr(fn, '_verify_require', lambda: None)
-            return fn
-
-        ask_install._verify_require = ask_install
-        return ask_install
+        def check_and_call(*args, **kwargs):
+            if not satisfied:
+                verify_require()
+            return fn(*args, **kwargs)
+
+        check_and_call._verify_require = verify_require
+        return check_and_call
 
     return wrapper
@@ -8,9 +8,6 @@ from datetime import datetime
 from pathlib import Path
 from typing import Optional
 from urllib.parse import urlparse  # noqa: F401
-from urllib.request import Request, urlopen
-
-from tqdm import tqdm
 
 
 def temp_path(category: str,
@@ -20,7 +17,7 @@ def temp_path(category: str,
     output_dir = Path(root) / category
     output_dir.mkdir(exist_ok=True, parents=True)
     timestamp = datetime.now().strftime('%Y%m%d')
-    uid = str(uuid.uuid4())[:4]
+    uid = uuid.uuid4().hex[:12]
     filename = f'{prefix}{timestamp}_{uid}'
     path = (output_dir / filename).with_suffix(suffix)
     return str(path.absolute())
@@ -48,6 +45,10 @@ def download_url_to_file(url, dst, hash_prefix=None, progress=True):
         progress (bool): whether or not to display a progress
             bar to stderr Defaults to True.
     """
+    from urllib.request import Request, urlopen
+
+    from tqdm import tqdm
+
     file_size = None
     req = Request(url, headers={'User-Agent': 'agentlego'})
     u = urlopen(req)
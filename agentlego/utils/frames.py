@@ -0,0 +1,74 @@
+"""A length-prefixed binary frame format to transport tool outputs.
+
+The payload starts with the number of frames as a 4-byte unsigned integer,
+and every frame consists of::
+
+    | header len (4 bytes) | JSON header | payload len (8 bytes) | payload |
+
+All integers are big-endian. The header describes how to decode the payload,
+like ``{"type": "image", "format": "raw", "dtype": "uint8", "shape": [...]}``.
+"""
+import json
+import struct
+from typing import List, Tuple
+
+FRAMES_MEDIA_TYPE = 'application/vnd.agentlego.frames'
+
+_COUNT = struct.Struct('>I')
+_HEADER_LEN = struct.Struct('>I')
+_PAYLOAD_LEN = struct.Struct('>Q')
+
+
+def encode_frames(frames: List[Tuple[dict, bytes]]) -> bytes:
+    """Encode frames into bytes.
+
+    Args:
+        frames (list[tuple[dict, bytes]]): The header and payload of every
+            frame. The header should be JSON serializable, and the payload
+            can be any C-contiguous bytes-like object.
+
+    Returns:
+        bytes: The encoded bytes.
+    """
+    chunks = [_COUNT.pack(len(frames))]
+    for header, payload in frames:
+        # Count the payload size in bytes even if it's a view of an array.
+        payload = memoryview(payload).cast('B')
+        header = json.dumps(header).encode('utf-8')
+        chunks.append(_HEADER_LEN.pack(len(header)))
+        chunks.append(header)
+        chunks.append(_PAYLOAD_LEN.pack(len(payload)))
+        chunks.append(payload)
+    return b''.join(chunks)
+
+
+def decode_frames(data: bytes) -> List[Tuple[dict, memoryview]]:
+    """Decode frames from bytes.
+
+    The payloads are memory views of the input data, without copy.
+
+    Args:
+        data (bytes): The encoded bytes.
+
+    Returns:
+        list[tuple[dict, memoryview]]: The header and payload of every frame.
+    """
+    view = memoryview(data)
+    offset = 0
+
+    def take(size: int) -> memoryview:
+        nonlocal offset
+        if offset + size > len(view):
+            raise ValueError('Truncated frames data.')
+        chunk = view[offset:offset + size]
+        offset += size
+        return chunk
+
+    num_frames, = _COUNT.unpack(take(_COUNT.size))
+    frames = []
+    for _ in range(num_frames):
+        header_len, = _HEADER_LEN.unpack(take(_HEADER_LEN.size))
+        header = json.loads(bytes(take(header_len)).decode('utf-8'))
+        payload_len, = _PAYLOAD_LEN.unpack(take(_PAYLOAD_LEN.size))
+        frames.append((header, take(payload_len)))
+    return frames
@@ -0,0 +1,288 @@
+"""A lightweight in-process metrics registry.
+
+The metrics are rendered in the Prometheus text exposition format, so that
+they can be scraped without the ``prometheus_client`` package. Every metric
+can be drained into a plain dict and merged into another registry, which
+gathers the metrics recorded in worker processes.
+"""
+import bisect
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Sequence, Tuple
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# The buckets of durations in seconds.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.,
+                   2.5, 5., 10., 30., 60., 120.)
+
+# The buckets of payload sizes in bytes, from 64B to 64MiB.
+BYTES_BUCKETS = tuple(float(4**i * 64) for i in range(11))
+
+
+def _escape(value) -> str:
+    value = str(value).replace('\\', r'\\').replace('\n', r'\n')
+    return value.replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class _Metric:
+    type = ''
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'The metric `{self.name}` expects labels '
+                             f'{self.labelnames}, but got {tuple(labels)}.')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [
+            f'# HELP {self.name} {_escape(self.documentation)}',
+            f'# TYPE {self.name} {self.type}',
+        ]
+        for name, labelnames, labelvalues, value in self.samples():
+            labels = _format_labels(labelnames, labelvalues)
+            lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+    def samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing value of every label combination."""
+
+    type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = defaultdict(float)
+
+    def inc(self, amount: float = 1., **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, self.labelnames, key, value
+
+    def drain(self) -> dict:
+        with self._lock:
+            values, self._values = dict(self._values), defaultdict(float)
+        return values
+
+    def merge(self, values: dict):
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] += value
+
+
+class Gauge(_Metric):
+    """A value of every label combination that can go up and down."""
+
+    type = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, self.labelnames, key, value
+
+    def drain(self) -> dict:
+        # The gauges of worker processes are not merged.
+        return {}
+
+    def merge(self, values: dict):
+        with self._lock:
+            self._values.update(values)
+
+
+class Histogram(_Metric):
+    """The distribution of observed values of every label combination.
+
+    Args:
+        name (str): The metric name.
+        documentation (str): The help text of the metric.
+        labelnames (Sequence[str]): The label names. Defaults to no label.
+        buckets (Sequence[float]): The upper bounds of the buckets, and
+            the ``+Inf`` bucket is always appended.
+            Defaults to :data:`DEFAULT_BUCKETS`.
+    """
+
+    type = 'histogram'
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(b for b in buckets if b != math.inf))
+        # The non-cumulative count of every bucket, and the sum.
+        self._values: Dict[Tuple, list] = {}
+
+    def _new_value(self) -> list:
+        return [[0] * (len(self.buckets) + 1), 0.]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts_sum = self._values.get(key)
+            if counts_sum is None:
+                counts_sum = self._values[key] = self._new_value()
+            counts_sum[0][index] += 1
+            counts_sum[1] += value
+
+    def get(self, **labels) -> Tuple[int, float]:
+        """Get the count and the sum of the observed values."""
+        counts, total = self._values.get(self._key(labels), ([], 0.))
+        return sum(counts), total
+
+    def samples(self):
+        with self._lock:
+            items = sorted(
+                (k, (list(c), s)) for k, (c, s) in self._values.items())
+        bucket_labels = self.labelnames + ('le', )
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf, ), counts):
+                cumulative += count
+                yield (f'{self.name}_bucket', bucket_labels,
+                       key + (_format_value(bound), ), cumulative)
+            yield f'{self.name}_sum', self.labelnames, key, total
+            yield f'{self.name}_count', self.labelnames, key, cumulative
+
+    def drain(self) -> dict:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: dict):
+        with self._lock:
+            for key, (counts, total) in values.items():
+                counts_sum = self._values.get(key)
+                if counts_sum is None:
+                    counts_sum = self._values[key] = self._new_value()
+                for i, count in enumerate(counts):
+                    counts_sum[0][i] += count
+                counts_sum[1] += total
+
+
+class MetricsRegistry:
+    """A collection of metrics.
+
+    The metrics are created by :meth:`counter`, :meth:`gauge` and
+    :meth:`histogram`, which return the existing metric of the same name.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_cls(
+                    name, *args, **kwargs)
+            elif not isinstance(metric, metric_cls):
+                raise ValueError(f'The metric `{name}` is already registered '
+                                 f'as a {metric.type}.')
+        return metric
+
+    def counter(self,
+                name: str,
+                documentation: str,
+                labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self,
+              name: str,
+              documentation: str,
+              labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self,
+                  name: str,
+                  documentation: str,
+                  labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames,
+                                   buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return ''.join(metric.render() + '\n' for metric in metrics)
+
+    def drain(self) -> dict:
+        """Take out the recorded values and reset all metrics.
+
+        Returns:
+            dict: The picklable values of every metric, which can be merged
+            into another registry by :meth:`merge`.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.drain() for metric in metrics}
+
+    def merge(self, values: dict):
+        """Add the values drained from another registry.
+
+        The metrics not registered in this registry are ignored.
+        """
+        for name, metric_values in values.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(metric_values)
+
+
+# The registry of the process.
+METRICS = MetricsRegistry()
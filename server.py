@@ -1,18 +1,30 @@
 import argparse
+import asyncio
 import base64
 import inspect
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
 from io import BytesIO
+from multiprocessing import get_context
 from typing import Dict
 from urllib.parse import quote_plus
 
+import numpy as np
 import uvicorn
-from fastapi import APIRouter, FastAPI, File, Form, UploadFile
+from fastapi import APIRouter, FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import UploadFile as StarletteUploadFile
 from typing_extensions import Annotated
 
 from agentlego.apis import load_tool
 from agentlego.parsers import NaiveParser
 from agentlego.tools.base import BaseTool
+from agentlego.tools.hooks import enable_metrics
 from agentlego.types import AudioIO, CatgoryToIO, ImageIO
+from agentlego.utils.frames import FRAMES_MEDIA_TYPE, encode_frames
+from agentlego.utils.metrics import METRICS, PROMETHEUS_CONTENT_TYPE
 
 prog_description = """\
 Start a server for several tools.
@@ -44,22 +56,378 @@ def parse_args():
         action='store_true',
         help='Avoid setup tools during starting the server.',
     )
+    parser.add_argument(
+        '--warmup-workers',
+        default=4,
+        type=int,
+        help='The number of tools to setup concurrently during starting the '
+        'server. The tools can be called once they are ready.',
+    )
+    parser.add_argument(
+        '--max-batch-size',
+        default=1,
+        type=int,
+        help='The maximum number of concurrent calls to gather into a batch. '
+        'Batching is disabled if it is 1.',
+    )
+    parser.add_argument(
+        '--max-wait',
+        default=0.01,
+        type=float,
+        help='The maximum seconds to wait for more calls to form a batch.',
+    )
+    parser.add_argument(
+        '--executor',
+        default='thread',
+        choices=['thread', 'process'],
+        help='The kind of executor to run the tools. The "process" executor '
+        'loads a copy of the tool in every worker process.',
+    )
+    parser.add_argument(
+        '--workers',
+        default=None,
+        type=int,
+        help='The number of calls of every tool to run concurrently. '
+        'Defaults to the `--max-batch-size`.',
+    )
+    parser.add_argument(
+        '--max-queue',
+        default=16,
+        type=int,
+        help='The number of calls of every tool to wait in the queue. '
+        'The server responds 429 if the queue is full.',
+    )
+    parser.add_argument(
+        '--no-metrics',
+        action='store_true',
+        help='Disable recording the metrics of the tool calls, which are '
+        'exposed at `/metrics` in the Prometheus format.',
+    )
+    parser.add_argument(
+        '--result-cache',
+        action='store_true',
+        help='Reuse the results of the deterministic tools for the same '
+        'inputs. The cache is configured by the `AGENTLEGO_RESULT_CACHE_*` '
+        'environment variables.',
+    )
+    parser.add_argument(
+        '--tool-config',
+        action='append',
+        default=[],
+        metavar='TOOL:KEY=VALUE[,KEY=VALUE]',
+        help='Override the executor settings of a tool, the available keys '
+        'are "executor", "workers" and "max_queue". For example, '
+        '"ObjectReplace:executor=process,workers=2".',
+    )
     args = parser.parse_args()
     return args
 
 
-args = parse_args()
-tools: Dict[str, BaseTool] = {}
-for name in args.tools:
-    tool = load_tool(name, device=args.device, parser=NaiveParser)
-    if not args.no_setup:
-        tool.setup()
-        tool._is_setup = True
-    tools[quote_plus(tool.name.replace(' ', ''))] = tool
+def parse_tool_configs(args) -> Dict[str, dict]:
+    default_cfg = dict(
+        executor=args.executor,
+        workers=args.workers or args.max_batch_size,
+        max_queue=args.max_queue,
+    )
+    configs = {name: dict(default_cfg) for name in args.tools}
+    for item in args.tool_config:
+        name, _, options = item.partition(':')
+        if name not in configs:
+            raise ValueError(f'The tool `{name}` in `--tool-config` is not '
+                             'in the deployed tools.')
+        for option in options.split(','):
+            key, _, value = option.partition('=')
+            if key not in default_cfg:
+                raise ValueError(f'Unknown tool config key `{key}`.')
+            configs[name][key] = value if key == 'executor' else int(value)
+    return configs
+
+
+def decode_inputs(tool: BaseTool, inputs: dict) -> dict:
+    args = {}
+    for p in tool.parameters.values():
+        if p.name not in inputs:
+            continue
+        data = inputs[p.name]
+        if p.category == 'image':
+            from PIL import Image
+            data = ImageIO(Image.open(BytesIO(data['content'])))
+        elif p.category == 'audio':
+            import torchaudio
+            file_format = data['filename'].rpartition('.')[-1] or None
+            raw, sr = torchaudio.load(
+                BytesIO(data['content']), format=file_format)
+            data = AudioIO(raw, sampling_rate=sr)
+        else:
+            data = CatgoryToIO[p.category](data)
+        args[p.name] = data
+    return args
+
+
+def encode_outputs(tool: BaseTool, outs, transport: str = 'json'):
+    """Encode the tool outputs for the response.
+
+    Args:
+        tool (BaseTool): The called tool.
+        outs (Any): The outputs of the tool.
+        transport (str): The response format. "json" encodes images and audios
+            by base64 in JSON, "frames" uses the binary frame format, and
+            "raw" uses the binary frame format with raw arrays instead of
+            PNG and WAV files. Defaults to "json".
+
+    Returns:
+        list | bytes: The JSON-able list for "json" and the encoded bytes for
+        the other transports.
+    """
+    if not isinstance(outs, tuple):
+        outs = [outs]
+
+    frames = []
+    for out, out_category in zip(outs, tool.toolmeta.outputs):
+        if out_category == 'image' and transport == 'raw':
+            array = np.ascontiguousarray(out.to_array())
+            header = dict(
+                type='image',
+                format='raw',
+                dtype=str(array.dtype),
+                shape=list(array.shape))
+            frames.append((header, array.data))
+        elif out_category == 'image':
+            file = BytesIO()
+            out.to_pil().save(file, format='png')
+            frames.append((dict(type='image', format='png'), file.getvalue()))
+        elif out_category == 'audio' and transport == 'raw':
+            array = np.ascontiguousarray(out.to_tensor().cpu().numpy())
+            header = dict(
+                type='audio',
+                format='raw',
+                dtype=str(array.dtype),
+                shape=list(array.shape),
+                sampling_rate=out.sampling_rate)
+            frames.append((header, array.data))
+        elif out_category == 'audio':
+            import torchaudio
+            file = BytesIO()
+            torchaudio.save(
+                file, out.to_tensor(), out.sampling_rate, format='wav')
+            frames.append((dict(type='audio', format='wav'), file.getvalue()))
+        else:
+            frames.append((dict(type='json'), out))
+
+    if transport != 'json':
+        for i, (header, data) in enumerate(frames):
+            if header['type'] == 'json':
+                frames[i] = (header, json.dumps(data).encode('utf-8'))
+        return encode_frames(frames)
+
+    res = []
+    for header, data in frames:
+        if header['type'] == 'json':
+            res.append(data)
+        else:
+            res.append(
+                dict(
+                    type=header['type'],
+                    data=base64.encodebytes(data).decode('ascii'),
+                ))
+    return res
+
+
+def run_tool(tool: BaseTool, inputs: dict, transport: str = 'json'):
+    args = decode_inputs(tool, inputs)
+    outs = tool(**args)
+    return encode_outputs(tool, outs, transport)
+
+
+# The tool instance in the worker process of the process executor.
+_process_tool = None
+
+
+def _init_process_worker(tool_type: str, device: str, metrics: bool,
+                         result_cache: bool):
+    global _process_tool
+    if metrics:
+        enable_metrics()
+    _process_tool = load_tool(tool_type, device=device, parser=NaiveParser)
+    if result_cache and _process_tool.deterministic:
+        _process_tool.enable_result_cache()
+    _process_tool.lazy_setup()
+
+
+def _run_in_process(inputs: dict, transport: str):
+    # Send the metrics recorded in the worker process back with the result.
+    return run_tool(_process_tool, inputs, transport), METRICS.drain()
 
+
+def _ping():
+    return True
+
+
+class ToolWorker:
+    """Run the calls of a tool in its own bounded executor.
+
+    Args:
+        tool (BaseTool): The tool to call.
+        tool_type (str): The tool type used to load the tool in the worker
+            processes.
+        device (str): The device to load the tool in the worker processes.
+        executor (str): The kind of executor, "thread" or "process".
+            Defaults to "thread".
+        workers (int): The number of calls to run concurrently.
+            Defaults to 1.
+        max_queue (int): The number of calls to wait in the queue.
+            Defaults to 16.
+        metrics (bool): Whether to record the metrics of the calls in the
+            worker processes. Defaults to True.
+        result_cache (bool): Whether to cache the results of the tool in
+            the worker processes if it's deterministic. Defaults to False.
+    """
+
+    def __init__(self,
+                 tool: BaseTool,
+                 tool_type: str,
+                 device: str,
+                 executor: str = 'thread',
+                 workers: int = 1,
+                 max_queue: int = 16,
+                 metrics: bool = True,
+                 result_cache: bool = False):
+        self.tool = tool
+        self.kind = executor
+        if executor == 'thread':
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix=tool_type)
+        elif executor == 'process':
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context('spawn'),
+                initializer=_init_process_worker,
+                initargs=(tool_type, device, metrics, result_cache),
+            )
+        else:
+            raise ValueError(f'Unknown executor `{executor}`.')
+        self.num_workers = workers
+        self.capacity = workers + max_queue
+        self.pending = 0
+
+        # The loading state, "lazy" means to setup at the first call.
+        self.state = 'lazy'
+        self.load_seconds = None
+        self.error = None
+
+    @property
+    def available(self) -> bool:
+        return self.state in ['lazy', 'ready']
+
+    def warmup(self):
+        """Setup the tool, or start all worker processes which setup the
+        tool in the initializer."""
+        self.state = 'loading'
+        start = time.perf_counter()
+        try:
+            if self.kind == 'thread':
+                self.tool.lazy_setup()
+            else:
+                futures = [
+                    self.executor.submit(_ping)
+                    for _ in range(self.num_workers)
+                ]
+                wait(futures)
+                for future in futures:
+                    future.result()
+            self.state = 'ready'
+        except Exception as e:
+            self.state = 'failed'
+            self.error = repr(e)
+        finally:
+            self.load_seconds = time.perf_counter() - start
+
+    def status(self) -> dict:
+        return dict(
+            state=self.state,
+            load_seconds=self.load_seconds,
+            error=self.error,
+        )
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.capacity
+
+    async def run(self, inputs: dict, transport: str = 'json'):
+        if self.kind == 'thread':
+            fn = partial(run_tool, self.tool, inputs, transport)
+        else:
+            fn = partial(_run_in_process, inputs, transport)
+
+        # The counter is only touched in the event loop, no lock is needed.
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            res = await loop.run_in_executor(self.executor, fn)
+        finally:
+            self.pending -= 1
+
+        if self.kind == 'process':
+            res, metrics = res
+            METRICS.merge(metrics)
+        return res
+
+
+tools: Dict[str, BaseTool] = {}
+workers: Dict[str, ToolWorker] = {}
 app = FastAPI()
 tool_router = APIRouter()
 
+metrics_enabled = True
+REQUEST_SECONDS = METRICS.histogram(
+    'agentlego_server_request_seconds',
+    'The duration of the requests to call tools, including decoding the '
+    'inputs and encoding the outputs.', ('tool', 'transport'))
+REQUESTS = METRICS.counter('agentlego_server_requests_total',
+                           'The number of the requests to call tools.',
+                           ('tool', 'status'))
+PENDING_CALLS = METRICS.gauge(
+    'agentlego_server_pending_calls',
+    'The number of the running and queued calls of every tool.', ('tool', ))
+TOOL_READY = METRICS.gauge('agentlego_server_tool_ready',
+                           'Whether the tool is available to call.',
+                           ('tool', ))
+
+
+def record_request(tool_name: str,
+                   status: str,
+                   transport: str = None,
+                   start: float = None):
+    if not metrics_enabled:
+        return
+    REQUESTS.inc(tool=tool_name, status=status)
+    if start is not None:
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start, tool=tool_name, transport=transport)
+
+
+@app.get('/healthz')
+def healthz():
+    return dict(status='ok')
+
+
+@app.get('/ready')
+def ready():
+    status = {name: worker.status() for name, worker in workers.items()}
+    all_ready = all(worker.available for worker in workers.values())
+    return JSONResponse(
+        status_code=200 if all_ready else 503,
+        content=dict(ready=all_ready, tools=status),
+    )
+
+
+def metrics():
+    for name, worker in workers.items():
+        PENDING_CALLS.set(worker.pending, tool=name)
+        TOOL_READY.set(int(worker.available), tool=name)
+    return Response(
+        content=METRICS.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 
 @app.get('/')
 def index():
@@ -76,61 +444,59 @@ def index():
 
 def add_tool(tool_name: str):
     tool: BaseTool = tools[tool_name]
+    worker: ToolWorker = workers[tool_name]
 
-    def _call(**kwargs):
-        args = {}
-        for p in tool.parameters.values():
-            data = kwargs[p.name]
-            if p.category == 'image':
-                from PIL import Image
-                data = ImageIO(Image.open(data.file))
-            elif p.category == 'audio':
-                import torchaudio
-                file_format = data.filename.rpartition('.')[-1] or None
-                raw, sr = torchaudio.load(data.file, format=file_format)
-                data = AudioIO(raw, sampling_rate=sr)
-            else:
-                data = CatgoryToIO[p.category](data)
-            args[p.name] = data
-
-        outs = tool(**args)
-        if not isinstance(outs, tuple):
-            outs = [outs]
-
-        res = []
-        for out, out_category in zip(outs, tool.toolmeta.outputs):
-            if out_category == 'image':
-                file = BytesIO()
-                out.to_pil().save(file, format='png')
-                res.append(
-                    dict(
-                        type='image',
-                        data=base64.encodebytes(
-                            file.getvalue()).decode('ascii'),
-                    ))
-            elif out_category == 'audio':
-                import torchaudio
-                file = BytesIO()
-                torchaudio.save(
-                    file, out.to_tensor(), out.sampling_rate, format='wav')
-                res.append(
-                    dict(
-                        type='audio',
-                        data=base64.encodebytes(
-                            file.getvalue()).decode('ascii'),
-                    ))
-            else:
-                res.append(out)
-        return res
+    async def call(agentlego_request: Request, **kwargs):
+        start = time.perf_counter()
+        if not worker.available:
+            record_request(tool_name, 'unavailable')
+            return JSONResponse(
+                status_code=503,
+                content=dict(error=f'The tool `{tool.name}` is not available '
+                             f'({worker.state}), please retry later.'),
+            )
+        if worker.saturated:
+            record_request(tool_name, 'busy')
+            return JSONResponse(
+                status_code=429,
+                content=dict(error=f'The tool `{tool.name}` is busy, '
+                             'please retry later.'),
+            )
+
+        inputs = {}
+        for k, v in kwargs.items():
+            if isinstance(v, StarletteUploadFile):
+                v = dict(filename=v.filename or '', content=await v.read())
+            inputs[k] = v
+
+        # Negotiate the response format by the `Accept` header.
+        accept = agentlego_request.headers.get('accept', '')
+        if FRAMES_MEDIA_TYPE not in accept:
+            transport = 'json'
+        elif 'arrays=raw' in accept:
+            transport = 'raw'
+        else:
+            transport = 'frames'
 
-    def call(**kwargs):
         try:
-            return _call(**kwargs)
+            res = await worker.run(inputs, transport)
         except Exception as e:
+            record_request(tool_name, 'error', transport, start)
             return dict(error=repr(e))
+        record_request(tool_name, 'ok', transport, start)
+
+        if transport == 'json':
+            return res
+        return Response(content=res, media_type=FRAMES_MEDIA_TYPE)
 
-    call_args = {}
-    call_params = []
+    call_args = {'agentlego_request': Request}
+    call_params = [
+        inspect.Parameter(
+            'agentlego_request',
+            inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            annotation=Request,
+        )
+    ]
     for p in tool.parameters.values():
         if p.category in ['image', 'audio']:
             annotation = Annotated[UploadFile, File(media_type=p.category)]
@@ -167,9 +533,49 @@ def add_tool(tool_name: str):
     )
 
 
-for tool_name in tools:
-    add_tool(tool_name)
-app.include_router(tool_router)
+def main():
+    global metrics_enabled
+    args = parse_args()
+    tool_configs = parse_tool_configs(args)
+
+    metrics_enabled = not args.no_metrics
+    if metrics_enabled:
+        enable_metrics()
+        app.add_api_route('/metrics', metrics, methods=['GET'])
+
+    for name in args.tools:
+        cfg = tool_configs[name]
+        tool = load_tool(name, device=args.device, parser=NaiveParser)
+        if args.max_batch_size > 1:
+            tool.enable_batching(args.max_batch_size, args.max_wait)
+        if args.result_cache and tool.deterministic:
+            tool.enable_result_cache()
+        tool_name = quote_plus(tool.name.replace(' ', ''))
+        tools[tool_name] = tool
+        workers[tool_name] = ToolWorker(
+            tool,
+            tool_type=name,
+            device=args.device,
+            metrics=metrics_enabled,
+            result_cache=args.result_cache,
+            **cfg)
+
+    for tool_name in tools:
+        add_tool(tool_name)
+    app.include_router(tool_router)
+
+    if not args.no_setup:
+        # Setup tools in background and serve the ready tools meanwhile.
+        for worker in workers.values():
+            worker.state = 'pending'
+        warmup_executor = ThreadPoolExecutor(
+            max_workers=args.warmup_workers, thread_name_prefix='warmup')
+        for worker in workers.values():
+            warmup_executor.submit(worker.warmup)
+        warmup_executor.shutdown(wait=False)
 
-if __name__ == '__main__':
     uvicorn.run(app, host='0.0.0.0', port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import json
+import os.path as osp
+
+from agentlego.benchmark import benchmark_tool, make_inputs
+from agentlego.benchmark.cli import compare_results, main
+from agentlego.benchmark.stubs import StubImageTool, StubTextTool
+
+
+def test_benchmark_tool():
+    result = benchmark_tool(
+        lambda: StubTextTool(delay=0), iterations=5, warmup=1, concurrency=2)
+    assert result['tool'] == 'StubTextToText'
+    assert result['iterations'] == 5
+    latency = result['latency_ms']
+    assert latency['min'] <= latency['p50'] <= latency['p99'] <= latency['max']
+    assert result['throughput'] > 0
+
+
+def test_make_inputs(tmp_path):
+    tool = StubImageTool()
+    # Fall back to the synthetic fixtures out of the source tree.
+    inputs = make_inputs(tool.name, tool.parameters, str(tmp_path))
+    assert osp.exists(inputs['image'])
+
+    tool = StubTextTool()
+    inputs = make_inputs('Calculator', tool.parameters)
+    assert inputs == {'text': '(3.5 + 2) * 12 / 7'}
+
+
+def test_compare_results(tmp_path):
+    output = str(tmp_path / 'results.json')
+    assert main(['StubTextToText', '-n', '3', '--no-isolate', '-o',
+                 output]) == 0
+    with open(output) as f:
+        results = json.load(f)
+    assert set(results) == {'meta', 'results'}
+
+    slower = json.loads(json.dumps(results))
+    slower['results']['StubTextToText']['latency_ms']['p50'] *= 2
+    slower['results']['StubTextToText']['throughput'] /= 2
+    rows = compare_results(results, slower, threshold=0.1)
+    regressed = {row['metric'] for row in rows if row['regressed']}
+    assert regressed == {'latency_ms.p50', 'throughput'}
@@ -0,0 +1,42 @@
+import numpy as np
+
+from agentlego.search import EmbeddingIndex
+
+VOCAB = ['image', 'audio', 'text', 'pose']
+
+
+def bag_of_words(texts):
+    return np.array([[text.count(word) for word in VOCAB] for text in texts],
+                    dtype=np.float32)
+
+
+class CountingEmbed:
+
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return bag_of_words(texts)
+
+
+def test_embedding_index(tmp_path):
+    choices = ['detect pose in image', 'audio to text', 'image caption text']
+    embed_fn = CountingEmbed()
+    index = EmbeddingIndex('fake/model', embed_fn, index_dir=str(tmp_path))
+
+    assert index.search('human pose', choices, topk=1) == choices[:1]
+    assert index.search('speech audio', choices, topk=2)[0] == choices[1]
+    # The descriptions are embedded only once.
+    assert sorted(embed_fn.texts) == sorted(choices +
+                                            ['human pose', 'speech audio'])
+    assert (tmp_path / 'fake--model.npz').exists()
+
+    # Only the new descriptions are embedded, and the persisted index is
+    # loaded by a new instance.
+    embed_fn = CountingEmbed()
+    index = EmbeddingIndex('fake/model', embed_fn, index_dir=str(tmp_path))
+    choices = choices + ['text to audio']
+    result = index.search('audio', choices, topk=2)
+    assert set(result) == {'audio to text', 'text to audio'}
+    assert embed_fn.texts == ['text to audio', 'audio']
@@ -0,0 +1,107 @@
+import sys
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+from agentlego.parsers import NaiveParser
+from agentlego.tools import BaseTool
+
+pytest.importorskip('fastapi')
+sys.path.insert(0, str(Path(__file__).parents[1]))
+import server  # noqa: E402
+
+
+class EchoTool(BaseTool):
+
+    def __init__(self):
+        super().__init__(
+            dict(
+                name='Echo',
+                description='Echo the text.',
+                inputs=('text', ),
+                outputs=('text', )),
+            parser=NaiveParser)
+
+    def apply(self, text: str) -> str:
+        return text
+
+
+def _args(**kwargs):
+    args = dict(
+        tools=['Calculator', 'ObjectReplace'],
+        executor='thread',
+        workers=None,
+        max_batch_size=4,
+        max_queue=16,
+        tool_config=[],
+    )
+    args.update(kwargs)
+    return Namespace(**args)
+
+
+def test_parse_tool_configs():
+    configs = server.parse_tool_configs(_args())
+    default_cfg = dict(executor='thread', workers=4, max_queue=16)
+    assert configs == dict(Calculator=default_cfg, ObjectReplace=default_cfg)
+
+    configs = server.parse_tool_configs(
+        _args(
+            workers=2,
+            tool_config=['ObjectReplace:executor=process,workers=1']))
+    assert configs['Calculator'] == dict(
+        executor='thread', workers=2, max_queue=16)
+    assert configs['ObjectReplace'] == dict(
+        executor='process', workers=1, max_queue=16)
+
+    with pytest.raises(ValueError, match='not in the deployed tools'):
+        server.parse_tool_configs(_args(tool_config=['OCR:workers=1']))
+    with pytest.raises(ValueError, match='Unknown tool config key'):
+        server.parse_tool_configs(_args(tool_config=['Calculator:queue=1']))
+
+
+@pytest.fixture(scope='module')
+def client():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    tool = EchoTool()
+    server.tools['Echo'] = tool
+    server.workers['Echo'] = server.ToolWorker(
+        tool, tool_type='EchoTool', device='cpu', workers=1, max_queue=1)
+    server.add_tool('Echo')
+    app = FastAPI()
+    app.include_router(server.tool_router)
+    yield TestClient(app)
+    server.tools.pop('Echo')
+    server.workers.pop('Echo').executor.shutdown()
+
+
+def test_call(client):
+    response = client.post('/Echo/call', data=dict(text='hello'))
+    assert response.status_code == 200
+    assert response.json() == ['hello']
+
+
+def test_backpressure(client):
+    worker = server.workers['Echo']
+
+    # The running and queued calls reach the capacity.
+    worker.pending = worker.capacity
+    try:
+        response = client.post('/Echo/call', data=dict(text='hello'))
+    finally:
+        worker.pending = 0
+    assert response.status_code == 429
+    assert 'busy' in response.json()['error']
+
+    worker.state = 'failed'
+    try:
+        response = client.post('/Echo/call', data=dict(text='hello'))
+    finally:
+        worker.state = 'lazy'
+    assert response.status_code == 503
+    assert 'not available (failed)' in response.json()['error']
+
+    response = client.post('/Echo/call', data=dict(text='hello'))
+    assert response.status_code == 200
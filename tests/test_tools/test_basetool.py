@@ -1,3 +1,5 @@
+import pytest
+
 from agentlego.parsers import DefaultParser
 from agentlego.tools.base import BaseTool
 from agentlego.types import ImageIO
@@ -58,3 +60,30 @@ def test_langchain():
 
     assert tool.name == 'Dummy Tool'
     assert tool.description == expected_description
+
+
+def test_hooks():
+    from agentlego.tools.hooks import MetricsHook, register_hook, remove_hook
+    from agentlego.utils.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    hook = register_hook(MetricsHook(registry))
+    try:
+        tool = DummyTool()
+        tool(image='tests/data/images/dog.jpg', query='dog')
+        with pytest.raises(FileNotFoundError):
+            tool(image='not_exist.jpg', query='dog')
+    finally:
+        remove_hook(hook)
+
+    name = 'Dummy Tool'
+    assert hook.stage_seconds.get(tool=name, stage='setup')[0] == 1
+    assert hook.stage_seconds.get(tool=name, stage='parse_inputs')[0] == 2
+    assert hook.stage_seconds.get(tool=name, stage='apply')[0] == 1
+    assert hook.calls.get(tool=name, status='ok') == 1
+    assert hook.calls.get(tool=name, status='error') == 1
+    assert hook.errors.get(
+        tool=name, stage='parse_inputs', error='FileNotFoundError') == 1
+    # The input image is measured by the file size.
+    assert hook.input_bytes.get(tool=name)[1] > 3
+    assert 'agentlego_tool_stage_seconds_bucket' in registry.render()
@@ -0,0 +1,33 @@
+import pytest
+
+from agentlego.tools import Calculator
+from agentlego.tools.calculator.evaluator import EvaluatorPool
+
+
+def test_calculator():
+    tool = Calculator()
+    assert tool('e ** cos(pi)') == '0.36787944117144233'
+    assert tool('math.sqrt(16) + max(1, 2)') == '6.0'
+    with pytest.raises(ZeroDivisionError):
+        tool('1 / 0')
+    with pytest.raises(SyntaxError):
+        tool('import os')
+
+
+def test_evaluator_pool():
+    pool = EvaluatorPool(workers=1, max_memory=256 << 20)
+    try:
+        # The runaway expression is killed and the worker is replaced.
+        with pytest.raises(TimeoutError):
+            pool.evaluate('9**9**9', timeout=0.5)
+        assert pool.evaluate('1 + 1') == '2'
+
+        with pytest.raises(MemoryError):
+            pool.evaluate('[0] * 10**9')
+
+        # The variables are not shared between expressions.
+        assert pool.evaluate('(x := 3) * 2') == '6'
+        with pytest.raises(Exception):
+            pool.evaluate('x')
+    finally:
+        pool.close()
@@ -0,0 +1,27 @@
+import pytest
+
+
+def test_load_and_transform_text():
+    torch = pytest.importorskip('torch')
+    for package in ['ftfy', 'iopath', 'regex', 'timm']:
+        pytest.importorskip(package)
+    from agentlego.tools.imagebind.data import (BPE_PATH,
+                                                load_and_transform_text)
+    from agentlego.tools.imagebind.models.multimodal_preprocessors import \
+        SimpleTokenizer
+
+    texts = ['a photo of a dog', 'a dog ' * 50]
+    tokens = load_and_transform_text(texts, device='cpu')
+    assert tokens.shape == (2, 77) and tokens.dtype == torch.long
+
+    # The start token, the text tokens, the end token and the padding.
+    expected = [49406, 320, 1125, 539, 320, 1929, 49407]
+    assert tokens[0, :7].tolist() == expected
+    assert not tokens[0, 7:].any()
+    # The long text is truncated without the end token.
+    assert tokens[1, 0] == 49406 and tokens[1].all()
+
+    # The same layout as the original tokenizer, with or without the cache.
+    tokenizer = SimpleTokenizer(bpe_path=BPE_PATH)
+    assert torch.equal(tokens, tokenizer(texts))
+    assert torch.equal(load_and_transform_text(texts, device='cpu'), tokens)
@@ -0,0 +1,177 @@
+import asyncio
+import json
+
+import pytest
+
+from agentlego.schema import Parameter
+from agentlego.tools.hooks import ToolHook, register_hook, remove_hook
+from agentlego.tools.remote import RemoteTool, default_session
+from agentlego.tools.result_cache import ResultCache
+
+TOOLMETA = dict(
+    name='Echo', description='', inputs=('text', ), outputs=('text', ))
+PARAMETERS = {'text': Parameter(name='text', category='text')}
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.headers = {'Content-Type': 'application/json'}
+        self.content = json.dumps(body).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSession:
+    """Respond the queued responses in order."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def post(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        return self.responses.pop(0)
+
+    def get(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        return self.responses.pop(0)
+
+
+def _tool(session=None, **kwargs):
+    return RemoteTool(
+        'http://server/Echo',
+        toolmeta=TOOLMETA,
+        parameters=PARAMETERS,
+        session=session,
+        **kwargs)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('agentlego.tools.remote.time.sleep', sleeps.append)
+    return sleeps
+
+
+def test_retry(sleeps):
+    session = FakeSession(
+        FakeResponse(503, dict(error='loading')),
+        FakeResponse(429, dict(error='busy')),
+        FakeResponse(200, ['hello']),
+    )
+    tool = _tool(session)
+    assert tool('hello') == 'hello'
+    assert len(session.requests) == 3
+    assert session.requests[0][0] == 'http://server/Echo/call'
+    assert session.requests[0][1]['data'] == dict(text='hello')
+    assert sleeps == [0.5, 1.0]
+
+    # Give up after the maximum retries.
+    session = FakeSession(*[FakeResponse(429, dict(error='busy'))] * 3)
+    tool = _tool(session, max_retries=2)
+    with pytest.raises(RuntimeError, match='busy'):
+        tool('hello')
+    assert len(session.requests) == 3
+
+    # The other errors are not retried, since the call may have run.
+    session = FakeSession(
+        FakeResponse(500, dict(error='failed')),
+        FakeResponse(200, ['hello']),
+    )
+    tool = _tool(session)
+    with pytest.raises(RuntimeError, match='failed'):
+        tool('hello')
+    assert len(session.requests) == 1
+
+
+def test_session_reuse():
+    assert _tool().session is default_session()
+    assert _tool().session is _tool().session
+
+    session = FakeSession(
+        FakeResponse(200, [
+            dict(
+                domain='Echo',
+                toolmeta=TOOLMETA,
+                parameters=[dict(name='text', category='text')]),
+            dict(
+                domain='Echo2',
+                toolmeta=TOOLMETA,
+                parameters=[dict(name='text', category='text')]),
+        ]))
+    tools = RemoteTool.from_server('http://server/', session=session)
+    urls = [tool.url for tool in tools]
+    assert urls == ['http://server/Echo/', 'http://server/Echo2/']
+    assert all(tool.session is session for tool in tools)
+
+
+class StageHook(ToolHook):
+
+    def __init__(self):
+        self.stages = []
+        self.calls = 0
+
+    def after_stage(self, tool, stage, seconds, error=None):
+        self.stages.append(stage)
+
+    def after_call(self, tool, seconds, input_bytes, output_bytes, error=None):
+        self.calls += 1
+
+
+def test_acall(monkeypatch):
+    httpx = pytest.importorskip('httpx')
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) == 1:
+            return httpx.Response(429, json=dict(error='busy'))
+        return httpx.Response(200, json=['hello'])
+
+    client_cls = httpx.AsyncClient
+
+    def create_client(**kwargs):
+        return client_cls(transport=httpx.MockTransport(handler))
+
+    monkeypatch.setattr(httpx, 'AsyncClient', create_client)
+    monkeypatch.setattr(RemoteTool, '_backoff', lambda self, attempt: 0)
+
+    tool = _tool(FakeSession())
+    tool.enable_result_cache(ResultCache(), force=True)
+    hook = register_hook(StageHook())
+    try:
+        assert asyncio.run(tool.acall('hello')) == 'hello'
+        # The second call is from the result cache in another event loop.
+        assert asyncio.run(tool.acall('hello')) == 'hello'
+    finally:
+        remove_hook(hook)
+
+    assert len(requests) == 2
+    assert hook.calls == 2
+    stages = ['parse_inputs', 'apply', 'parse_outputs']
+    assert hook.stages == ['setup'] + stages * 2
+    assert tool._active_calls == 0
+
+
+def test_async_client_per_loop():
+    pytest.importorskip('httpx')
+    tool = _tool(FakeSession())
+
+    async def get_client():
+        client = tool._async_client()
+        assert tool._async_client() is client
+        return client
+
+    loop1, loop2 = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        client1 = loop1.run_until_complete(get_client())
+        client2 = loop2.run_until_complete(get_client())
+        assert client1 is not client2
+        assert loop1.run_until_complete(get_client()) is client1
+    finally:
+        loop1.close()
+        loop2.close()
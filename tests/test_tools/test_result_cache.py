@@ -0,0 +1,81 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from agentlego.parsers import DefaultParser
+from agentlego.tools.base import BaseTool
+from agentlego.tools.result_cache import _MISSING, ResultCache
+from agentlego.types import ImageIO
+
+
+class CountingTool(BaseTool):
+    DEFAULT_TOOLMETA = dict(
+        name='Counting Tool',
+        description='Flip the image.',
+        inputs=('image', 'text'),
+        outputs=('image', ),
+    )
+    deterministic = True
+
+    def __init__(self, mode='flip'):
+        super().__init__(toolmeta=self.DEFAULT_TOOLMETA, parser=DefaultParser)
+        self.mode = mode
+        self.num_calls = 0
+
+    def apply(self, image: ImageIO, query: str) -> ImageIO:
+        self.num_calls += 1
+        return ImageIO(image.to_array()[::-1].copy())
+
+
+def test_result_cache(tmp_path):
+    image = 'tests/data/images/dog.jpg'
+    copied = str(tmp_path / 'copied.jpg')
+    shutil.copy(image, copied)
+
+    tool = CountingTool()
+    tool.enable_result_cache(ResultCache())
+    first = tool(image, 'a')
+    # The same content is saved to the same file.
+    assert tool(image, 'a') == first
+    # The image content is hashed instead of the path.
+    assert tool(copied, 'a') == first
+    assert tool.num_calls == 1
+    np.testing.assert_equal(
+        ImageIO(first).to_array(),
+        ImageIO(tool(copied, 'a')).to_array())
+
+    tool(image, 'b')
+    assert tool.num_calls == 2
+
+    # The configs are in the key, and the runtime states are not.
+    assert tool.cache_config() == dict(mode='flip')
+    other = CountingTool(mode='other')
+    other.enable_result_cache(tool._result_cache)
+    other(image, 'a')
+    assert other.num_calls == 1
+
+    tool.deterministic = False
+    with pytest.raises(ValueError):
+        tool.enable_result_cache()
+
+
+def test_result_cache_disk(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    cache = ResultCache(path=path)
+    cache.put('image', ImageIO(np.zeros((2, 2, 3), np.uint8)))
+    cache.put('expired', 'value', ttl=-1)
+
+    # Load from disk in a new cache.
+    cache = ResultCache(path=path)
+    assert cache.get('image').to_array().shape == (2, 2, 3)
+    assert cache.get('expired') is _MISSING
+    assert cache.stats()['disk_hits'] == 1
+
+    # Evict the least recently used results over the size limit.
+    cache = ResultCache(max_size=0, path=path, max_disk_bytes=1000)
+    for i in range(10):
+        cache.put(str(i), 'x' * 200)
+    assert cache.get('0') is _MISSING
+    assert cache.get('9') == 'x' * 200
+    assert cache.stats()['disk_size'] < 10
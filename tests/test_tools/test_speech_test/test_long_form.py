@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+
+import pytest
+
+from agentlego.tools.speech_text.speech_to_text import (_join_texts,
+                                                        _with_tail,
+                                                        split_windows,
+                                                        stitch_segments)
+from agentlego.types import AudioIO
+
+
+def test_split_windows():
+    windows = split_windows(100, chunk=30, stride=5)
+    assert windows == [(0, 30), (20, 50), (40, 70), (60, 90), (80, 100)]
+    assert split_windows(30, chunk=30, stride=5) == [(0, 30)]
+    assert split_windows(10, chunk=30, stride=5) == [(0, 10)]
+
+
+def test_stitch_segments():
+    windows = [(0., 30.), (20., 50.)]
+    window_segments = [
+        [
+            dict(text=' Hello', timestamp=(0., 10.)),
+            dict(text=' world', timestamp=(20., 28.)),
+        ],
+        [
+            # The same speech as the last segment of the first window.
+            dict(text=' world', timestamp=(0., 8.)),
+            dict(text=' again', timestamp=(10., None)),
+        ],
+    ]
+    stitched = stitch_segments(window_segments, windows, stride=5.)
+    assert [[seg['text'] for seg in w] for w in stitched] == [
+        [' Hello', ' world'],
+        [' again'],
+    ]
+    assert stitched[1][0]['timestamp'] == (30., 50.)
+
+
+def test_with_tail():
+    offsets = [dict(text=' Hello', timestamp=(0., 1.))]
+    segments = _with_tail(' Hello world', offsets)
+    assert segments[-1] == dict(text=' world', timestamp=(1., None))
+    assert _with_tail(' Hello', offsets) == offsets
+    # Without any timestamp, the whole window is a segment.
+    assert _with_tail(' Hi', []) == [dict(text=' Hi', timestamp=(0., None))]
+
+
+def test_join_texts():
+    assert _join_texts([' Hello', ' ', 'world ', '']) == 'Hello world'
+    assert _join_texts([' ']) == ''
+
+
+class FakeProcessor:
+    """Every sample of the fake audio is its index, and the fake model
+    "recognizes" a word for every second of the window."""
+
+    feature_extractor = SimpleNamespace(sampling_rate=10)
+
+    def __call__(self, waveforms, return_tensors, sampling_rate):
+        import torch
+        features = torch.full((len(waveforms), 30), -1.)
+        for i, waveform in enumerate(waveforms):
+            features[i, :len(waveform)] = torch.as_tensor(waveform)
+        return SimpleNamespace(input_features=features)
+
+    def batch_decode(self, outputs, skip_special_tokens, output_offsets=False):
+        results = []
+        for row in outputs.tolist():
+            samples = [int(v) for v in row if v >= 0]
+            start = samples[0] // 10
+            words = sorted({v // 10 for v in samples})
+            text = ''.join(f' w{word}' for word in words)
+            if not output_offsets:
+                results.append(text)
+                continue
+            # The last word has no timestamp, like cut by the window end.
+            offsets = [
+                dict(
+                    text=f' w{word}',
+                    timestamp=(word - start, word - start + 1))
+                for word in words[:-1]
+            ]
+            results.append(dict(text=text, offsets=offsets))
+        return results
+
+
+@pytest.fixture()
+def tool():
+    pytest.importorskip('torch')
+    pytest.importorskip('transformers')
+    from agentlego.tools import SpeechToText
+
+    tool = SpeechToText(
+        device='cpu', chunk_length=3., stride_length=0.5, batch_size=2)
+    tool.processor = FakeProcessor()
+    tool.model = SimpleNamespace(generate=lambda inputs, **kwargs: inputs)
+    tool._is_setup = True
+    return tool
+
+
+def _audio(seconds):
+    import torch
+    return AudioIO(torch.arange(seconds * 10.)[None], sampling_rate=10)
+
+
+def test_transcribe_long_form(tool):
+    texts = tool.transcribe([_audio(7), _audio(2)])
+    assert texts == ['w0 w1 w2 w3 w4 w5 w6', 'w0 w1']
+    # The short audios are transcribed without timestamps.
+    assert tool.transcribe([_audio(2)]) == ['w0 w1']
+
+
+def test_stream(tool):
+    texts = []
+    for text in tool.stream(_audio(7)):
+        assert tool._active_calls == 1
+        texts.append(text)
+    assert texts == ['w0 w1', 'w2 w3', 'w4 w5 w6']
+    assert tool._active_calls == 0
@@ -0,0 +1,36 @@
+from agentlego.tools.utils.diffusers import assemble_pipeline
+
+
+class FakeScheduler:
+
+    def __init__(self, config):
+        self.config = config
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config)
+
+
+class FakePipeline:
+
+    def __init__(self, unet, vae, scheduler, controlnet=None):
+        self.unet = unet
+        self.vae = vae
+        self.scheduler = scheduler
+        self.controlnet = controlnet
+
+
+def test_assemble_pipeline():
+    scheduler = FakeScheduler(dict(steps=10))
+    components = dict(
+        unet='unet', vae='vae', scheduler=scheduler, safety_checker='sc')
+
+    pipe = assemble_pipeline(FakePipeline, components, controlnet='canny')
+    assert pipe.unet == 'unet' and pipe.controlnet == 'canny'
+    # The weights are shared but the scheduler isn't.
+    assert pipe.scheduler is not scheduler
+    assert pipe.scheduler.config == scheduler.config
+
+    pipe = assemble_pipeline(FakePipeline, components, unet='inpaint')
+    assert pipe.unet == 'inpaint' and pipe.vae == 'vae'
+    assert components['unet'] == 'unet'
@@ -0,0 +1,35 @@
+import numpy as np
+
+from agentlego.tools.utils.grounding import (GROUNDING_CACHE, ground,
+                                             normalize_prompt)
+
+
+class FakeInferencer:
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, inputs, texts, **kwargs):
+        self.calls.append(texts)
+        return dict(predictions=[f'{texts}-{len(self.calls)}'])
+
+
+def test_ground_cache():
+    GROUNDING_CACHE.clear()
+    inferencer = FakeInferencer()
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+
+    first = ground(inferencer, 'glip', image, 'A  dog ')
+    assert ground(inferencer, 'glip', image.copy(), 'a dog') == first
+    # The original prompt is sent to the inferencer for the label names.
+    assert inferencer.calls == ['A  dog ']
+
+    # Different images, prompts and models are cached separately.
+    ground(inferencer, 'glip', image + 1, 'a dog')
+    ground(inferencer, 'glip', image, 'a cat')
+    ground(inferencer, 'glip-l', image, 'a dog')
+    assert len(inferencer.calls) == 4
+
+
+def test_normalize_prompt():
+    assert normalize_prompt('  The\tRed\n Cup ') == 'the red cup'
@@ -0,0 +1,58 @@
+import numpy as np
+
+from agentlego.tools.utils.mask import dilate, erode, feather, paint_labels
+
+
+def test_dilate_square():
+    mask = np.zeros((9, 9), dtype=bool)
+    mask[4, 4] = True
+    mask[0, 8] = True
+    dilated = dilate(mask, radius=2)
+    expect = np.zeros_like(mask)
+    expect[2:7, 2:7] = True
+    expect[0:3, 6:9] = True
+    assert (dilated == expect).all()
+
+
+def test_dilate_ellipse():
+    mask = np.zeros((7, 7), dtype=bool)
+    mask[3, 3] = True
+    dilated = dilate(mask, radius=3, kernel='ellipse')
+    ys, xs = np.nonzero(dilated)
+    # A disk of radius 3.
+    assert ((ys - 3)**2 + (xs - 3)**2 <= 9).all()
+    assert dilated.sum() == 29
+    assert dilated[0, 3] and dilated[3, 0] and not dilated[0, 0]
+
+
+def test_erode():
+    mask = np.zeros((8, 8), dtype=bool)
+    mask[1:7, 1:7] = True
+    expect = np.zeros_like(mask)
+    expect[2:6, 2:6] = True
+    assert (erode(mask, radius=1) == expect).all()
+    # The border outside the image is regarded as background.
+    assert not erode(np.ones((4, 4), dtype=bool), radius=1)[0].any()
+
+
+def test_feather():
+    mask = np.zeros((5, 5), dtype=bool)
+    mask[:, :2] = True
+    alpha = feather(mask, radius=1)
+    assert alpha.dtype == np.float32
+    np.testing.assert_allclose(alpha[2], [1, 2 / 3, 1 / 3, 0, 0], atol=1e-6)
+
+
+def test_paint_labels():
+    big = np.zeros((6, 6), dtype=bool)
+    big[1:5, 1:5] = True
+    small = np.zeros((6, 6), dtype=bool)
+    small[2:4, 3:6] = True
+    # XYWH boxes with inclusive right & bottom edges as SAM.
+    labels = paint_labels([big, small], boxes=[[1, 1, 3, 3], [3, 2, 2, 1]])
+    expect = np.zeros((6, 6), dtype=np.uint16)
+    expect[big] = 1
+    expect[small] = 2
+    assert labels.dtype == np.uint16
+    assert (labels == expect).all()
+    assert (paint_labels([big, small]) == expect).all()
@@ -0,0 +1,39 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from agentlego.types import ImageIO
+
+
+def test_image_buffer():
+    array = np.random.randint(0, 255, (16, 16, 3), dtype=np.uint8)
+
+    buffer = ImageIO(array).to_buffer()
+    assert isinstance(buffer, BytesIO)
+    assert buffer.getvalue().startswith(b'\x89PNG')
+
+    image = ImageIO(buffer)
+    assert image.type == 'buffer'
+    np.testing.assert_array_equal(image.to_array(), array)
+    assert isinstance(image.to_pil(), Image.Image)
+    # Converting twice won't be affected by the stream position.
+    np.testing.assert_array_equal(image.to_array(), array)
+
+
+def test_conversion_cache(monkeypatch):
+    array = np.random.randint(0, 255, (16, 16, 3), dtype=np.uint8)
+    image = ImageIO(array)
+
+    pil = image.to_pil()
+    assert image.to_pil() is pil
+    buffer = image.to_buffer()
+    assert image.to_buffer() is buffer
+
+    # The path is written from the encoded buffer instead of encoding the
+    # array again.
+    calls = []
+    monkeypatch.setattr(ImageIO, '_buffer_to_path',
+                        staticmethod(lambda x: calls.append(x) or 'a.png'))
+    assert image.to_path() == 'a.png'
+    assert calls == [buffer]
@@ -0,0 +1,112 @@
+import gc
+import os
+import os.path as osp
+import time
+from pathlib import Path
+
+import numpy as np
+
+from agentlego.types import ImageIO
+from agentlego.utils import ARTIFACTS, ArtifactStore
+
+
+def _age(path, seconds):
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_artifact_store(tmp_path):
+    store = ArtifactStore(root=str(tmp_path), max_bytes=2500, min_age=0)
+
+    # The same content is saved once, in a sharded subdirectory.
+    path = store.write('image', '.png', b'a' * 1000)
+    assert store.write('image', '.png', b'a' * 1000) == path
+    name = osp.basename(path)
+    assert path == str(tmp_path / 'image' / name[:2] / name)
+    writer = lambda p: Path(p).write_bytes(b'a' * 1000)  # noqa: E731
+    assert store.save('image', '.png', writer) == path
+    assert not os.listdir(tmp_path / '.tmp')
+
+    # The least recently used file is removed if exceeding the quota.
+    other = store.write('audio', '.wav', b'b' * 1000)
+    _age(path, 20)
+    _age(other, 10)
+    store.write('audio', '.wav', b'c' * 1000)
+    assert store.collect() == 1
+    assert not osp.exists(path) and osp.exists(other)
+
+    # The referenced and the recently used files are kept.
+    class Owner:
+        pass
+
+    owner = Owner()
+    store.retain(other, owner)
+    _age(other, 10)
+    store.configure(max_age=0, min_age=2)
+    latest = store.write('audio', '.wav', b'd' * 1000)
+    assert store.collect() == 0
+    assert osp.exists(other) and osp.exists(latest)
+
+    # The expired file is removed once unreferenced.
+    del owner
+    gc.collect()
+    assert store.collect() == 1
+    assert not osp.exists(other)
+
+
+def test_configure(tmp_path):
+    store = ArtifactStore(root=str(tmp_path), max_bytes=100, max_age=10)
+    # The omitted settings are unchanged.
+    store.configure(min_age=1)
+    assert (store.max_bytes, store.max_age, store.min_age) == (100, 10, 1)
+    store.configure(root=str(tmp_path / 'other'), max_age=None)
+    assert store.root == str(tmp_path / 'other')
+    assert (store.max_bytes, store.max_age) == (100, None)
+
+
+def test_image_to_path(tmp_path):
+    old_root = ARTIFACTS.root
+    ARTIFACTS.configure(root=str(tmp_path))
+    try:
+        array = np.zeros((4, 4, 3), np.uint8)
+        image = ImageIO(array)
+        path = image.to_path()
+        assert ARTIFACTS.owns(path)
+        assert ImageIO(array.copy()).to_path() == path
+        assert path in ARTIFACTS._refs
+        del image
+        gc.collect()
+        assert path not in ARTIFACTS._refs
+    finally:
+        ARTIFACTS.configure(root=old_root)
+
+
+def test_artifact_used_after_scan(tmp_path, monkeypatch):
+    store = ArtifactStore(root=str(tmp_path), max_age=10, min_age=0)
+    path = store.write('image', '.png', b'a')
+    _age(path, 100)
+    scanned = store._scan()
+
+    # Another process uses the file between the scan and the removal.
+    os.utime(path)
+    monkeypatch.setattr(store, '_scan', lambda: scanned)
+    assert store.collect() == 0
+    assert osp.exists(path)
+
+
+def test_artifact_foreign_files(tmp_path):
+    store = ArtifactStore(root=str(tmp_path), max_age=10, min_age=1)
+    saved = store.write('image', '.png', b'a')
+    user_file = tmp_path / 'image' / '20240101_abcd.png'
+    user_file.write_bytes(b'b')
+    tmp_file = tmp_path / '.tmp' / 'crashed.png'
+    tmp_file.parent.mkdir(exist_ok=True)
+    tmp_file.write_bytes(b'c')
+    for path in (saved, user_file, tmp_file):
+        _age(path, 100)
+
+    # Only the files saved by the store and the stale temporary files are
+    # removed.
+    assert store.collect() == 1
+    assert not osp.exists(saved) and not tmp_file.exists()
+    assert user_file.exists()
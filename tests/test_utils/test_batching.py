@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from agentlego.utils.batching import MicroBatcher
+
+
+def test_micro_batcher():
+    batch_sizes = []
+
+    def batch_fn(requests):
+        batch_sizes.append(len(requests))
+        return [i * 2 for i in requests]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait=0.1)
+    results = {}
+
+    def call(i):
+        results[i] = batcher.submit(i)
+
+    threads = [threading.Thread(target=call, args=(i, )) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: i * 2 for i in range(8)}
+    assert max(batch_sizes) <= 4
+    assert len(batch_sizes) < 8
+
+
+def test_micro_batcher_error():
+
+    def batch_fn(requests):
+        raise ValueError('failed')
+
+    batcher = MicroBatcher(batch_fn)
+    with pytest.raises(ValueError, match='failed'):
+        batcher.submit(1)
+
+
+def test_micro_batcher_fallback():
+    batch_sizes = []
+
+    def batch_fn(requests):
+        batch_sizes.append(len(requests))
+        return [single_fn(i) for i in requests]
+
+    def single_fn(request):
+        if request == 3:
+            raise ValueError('bad request')
+        return request * 2
+
+    batcher = MicroBatcher(
+        batch_fn, max_batch_size=4, max_wait=0.1, single_fn=single_fn)
+    results, errors = {}, {}
+
+    def call(i):
+        try:
+            results[i] = batcher.submit(i)
+        except ValueError as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i, )) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Only the bad request fails, and the others in its batch succeed.
+    assert max(batch_sizes) > 1
+    assert results == {0: 0, 1: 2, 2: 4}
+    assert list(errors) == [3]
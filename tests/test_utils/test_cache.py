@@ -0,0 +1,243 @@
+import threading
+import time
+
+from agentlego.parsers import NaiveParser
+from agentlego.tools import BaseTool
+from agentlego.utils import load_or_build_object
+from agentlego.utils.cache import (LRUCache, ObjectCache, estimate_tensors,
+                                   hash_array)
+
+
+class FakeTensor:
+
+    def __init__(self, ptr, nbytes):
+        self.ptr = ptr
+        self.nbytes = nbytes
+
+    def data_ptr(self):
+        return self.ptr
+
+    def element_size(self):
+        return 1
+
+    def numel(self):
+        return self.nbytes
+
+
+class FakeModel:
+
+    def __init__(self, *tensors):
+        self.weights = list(tensors)
+
+
+def test_estimate_tensors():
+    shared = FakeTensor(1, 100)
+    model = FakeModel(shared, FakeTensor(2, 50))
+    pipeline = dict(a=model, b=FakeModel(shared))
+    assert sum(estimate_tensors(pipeline).values()) == 150
+
+
+def test_object_cache_lru():
+    cache = ObjectCache(max_bytes=250)
+    cache.put('a', FakeModel(FakeTensor(1, 100)))
+    cache.put('b', FakeModel(FakeTensor(2, 100)))
+    assert cache.get('a') is not None
+    cache.put('c', FakeModel(FakeTensor(3, 100)))
+
+    # `b` is the least recently used.
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 1
+    assert stats['total_bytes'] == 200
+
+
+def test_object_cache_lfu_and_pin():
+    cache = ObjectCache(max_bytes=250)
+    # The budget is unchanged if omitted.
+    cache.configure(policy='lfu')
+    assert cache.max_bytes == 250
+    cache.put('a', FakeModel(FakeTensor(1, 100)))
+    cache.put('b', FakeModel(FakeTensor(2, 100)))
+    cache.get('b')
+    cache.pin('a')
+    cache.put('c', FakeModel(FakeTensor(3, 100)))
+    # `a` is the least frequently used, but it's pinned.
+    assert 'a' in cache and 'b' not in cache
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+class DummyTool(BaseTool):
+
+    def __init__(self, cache):
+        super().__init__(
+            dict(name='Dummy', description='', inputs=(), outputs=('text', )),
+            parser=NaiveParser)
+        self.cache = cache
+
+    def setup(self):
+        self.model = FakeModel(FakeTensor(1, 100))
+        self.cache.put('model', self.model)
+
+    def apply(self):
+        return 'done'
+
+
+def test_evict_releases_tool():
+    cache = ObjectCache()
+    tool = DummyTool(cache)
+    assert tool() == 'done'
+    assert tool._is_setup and hasattr(tool, 'model')
+
+    cache.evict('model')
+    assert not tool._is_setup and not hasattr(tool, 'model')
+    assert tool() == 'done'
+    assert tool._is_setup and 'model' in cache
+
+
+def test_evict_during_call():
+    started, resume = threading.Event(), threading.Event()
+
+    class BlockingTool(DummyTool):
+
+        def apply(self):
+            started.set()
+            resume.wait(timeout=10)
+            return self.model.weights[0].nbytes
+
+    cache = ObjectCache()
+    tool = BlockingTool(cache)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(tool()))
+    thread.start()
+    assert started.wait(timeout=10)
+
+    # The tool in use keeps its model until the call exits.
+    assert cache.evict('model')
+    assert tool._is_setup and hasattr(tool, 'model')
+    resume.set()
+    thread.join(timeout=10)
+    assert results == [100]
+    assert not tool._is_setup and not hasattr(tool, 'model')
+
+    # The next call setups the tool again.
+    started.clear()
+    assert tool() == 100
+    assert tool._is_setup and 'model' in cache
+
+
+def test_single_flight_build():
+    num_builds = []
+
+    def build_model(name):
+        num_builds.append(name)
+        time.sleep(0.1)
+        return FakeModel()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            load_or_build_object(build_model, 'single-flight')))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(num_builds) == 1
+    assert all(res is results[0] for res in results)
+
+
+def test_concurrent_lazy_setup():
+    num_setups = []
+
+    class SlowTool(DummyTool):
+
+        def setup(self):
+            num_setups.append(1)
+            time.sleep(0.1)
+            super().setup()
+
+    tool = SlowTool(ObjectCache())
+    threads = [threading.Thread(target=tool) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(num_setups) == 1
+
+
+def test_no_eviction_during_setup():
+
+    class TwoModelTool(DummyTool):
+
+        def setup(self):
+            self.first = FakeModel(FakeTensor(11, 100))
+            self.cache.put('first', self.first)
+            self.second = FakeModel(FakeTensor(12, 100))
+            self.cache.put('second', self.second)
+
+    cache = ObjectCache(max_bytes=150)
+    tool = TwoModelTool(cache)
+    tool.lazy_setup()
+    # The objects of the tool being setup are kept over the budget.
+    assert tool._is_setup and 'first' in cache and 'second' in cache
+
+    # The idle tool is released once its object is evicted.
+    cache.put('other', FakeModel(FakeTensor(13, 10)))
+    assert 'first' not in cache and not tool._is_setup
+
+
+def test_concurrent_setup_with_budget():
+
+    class KeyedTool(DummyTool):
+
+        def setup(self):
+            # Every tool has its own object, which evicts the others.
+            self.model = FakeModel(FakeTensor(id(self), 100))
+            self.cache.put(f'model-{id(self)}', self.model)
+
+    cache = ObjectCache(max_bytes=150)
+    tools = [KeyedTool(cache) for _ in range(4)]
+
+    def run(tool):
+        for _ in range(50):
+            tool()
+            tool.release()
+
+    threads = [threading.Thread(target=run, args=(t, )) for t in tools]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not any(thread.is_alive() for thread in threads)
+
+
+def test_lru_cache():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    # `b` is the least recently used.
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 1
+    assert stats['evictions'] == 1 and stats['size'] == 2
+
+
+def test_hash_array():
+    import numpy as np
+
+    array = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    assert hash_array(array) == hash_array(array.copy())
+    assert hash_array(array) != hash_array(array.reshape(4, 3))
+    assert hash_array(array) != hash_array(array.astype(np.int32))
+    # Non-contiguous views are hashed by content.
+    assert hash_array(array[:, ::-1]) == hash_array(array[:, ::-1].copy())
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from agentlego.utils import dependency
+from agentlego.utils.dependency import (get_dist_version, is_package_available,
+                                        require)
+
+
+def test_require_deferred():
+
+    @require('not-installed-package>=1.0')
+    def build():
+        return 'built'
+
+    @require('numpy')
+    def build_numpy():
+        return 'built'
+
+    # The missing requirement raises at the call instead of the decoration.
+    with pytest.raises(ImportError, match='not-installed-package'):
+        build()
+    with pytest.raises(ImportError):
+        build._verify_require()
+    assert build_numpy() == 'built'
+    assert build_numpy.__wrapped__.__name__ == 'build_numpy'
+
+
+def test_dist_version_cache(monkeypatch):
+    monkeypatch.setattr(dependency, '_DIST_VERSIONS', {})
+    monkeypatch.delenv('AGENTLEGO_DEPS_SNAPSHOT', raising=False)
+    assert get_dist_version('numpy') is not None
+    assert get_dist_version('not-installed-package') is None
+    assert set(dependency._DIST_VERSIONS) == {'numpy', 'not-installed-package'}
+    assert is_package_available('numpy>=1.0')
+
+
+def test_dist_snapshot(monkeypatch, tmp_path):
+    path = tmp_path / 'snapshot.json'
+    monkeypatch.setenv('AGENTLEGO_DEPS_SNAPSHOT', str(path))
+    monkeypatch.setattr(dependency, '_DIST_VERSIONS', {})
+    monkeypatch.setattr(dependency, '_SNAPSHOT', None)
+
+    version = get_dist_version('NumPy')
+    assert version is not None
+    snapshot = json.loads(path.read_text())
+    assert snapshot['versions']['numpy'] == version
+
+    # The snapshot is used until `sys.path` is modified.
+    snapshot['versions']['numpy'] = '0.0.1'
+    path.write_text(json.dumps(snapshot))
+    assert dependency._load_snapshot(str(path))['numpy'] == '0.0.1'
+    snapshot['mtimes'] = {}
+    path.write_text(json.dumps(snapshot))
+    assert dependency._load_snapshot(str(path))['numpy'] == version
@@ -0,0 +1,46 @@
+import pytest
+
+from agentlego.utils.frames import decode_frames, encode_frames
+
+
+def test_frames():
+    frames = [
+        (dict(type='json'), b'"hello"'),
+        (dict(type='image', format='raw', dtype='uint8',
+              shape=[2, 2]), bytes(range(4))),
+        (dict(type='empty'), b''),
+    ]
+    data = encode_frames(frames)
+    decoded = decode_frames(data)
+    assert len(decoded) == 3
+    for (header, payload), (dec_header, dec_payload) in zip(frames, decoded):
+        assert dec_header == header
+        assert isinstance(dec_payload, memoryview)
+        assert bytes(dec_payload) == payload
+
+    with pytest.raises(ValueError, match='Truncated'):
+        decode_frames(data[:-3])
+
+
+def test_frames_array_payload():
+    import numpy as np
+    array = np.arange(24, dtype=np.float32).reshape(2, 3, 4)
+    data = encode_frames([(dict(type='array'), array.data)])
+    (_, payload), = decode_frames(data)
+    decoded = np.frombuffer(payload, dtype=np.float32).reshape(2, 3, 4)
+    np.testing.assert_array_equal(decoded, array)
+
+
+def test_parse_raw_image_frame():
+    import numpy as np
+
+    from agentlego.tools.remote import RemoteTool
+
+    array = np.arange(12, dtype=np.uint8).reshape(2, 2, 3)
+    header = dict(type='image', format='raw', dtype='uint8', shape=[2, 2, 3])
+    (_, payload), = decode_frames(encode_frames([(header, array.data)]))
+    image = RemoteTool._parse_frame(header, payload)
+    result = image.to_array()
+    np.testing.assert_array_equal(result, array)
+    # The array can be modified in-place, like drawing on it.
+    result[0, 0] = 255
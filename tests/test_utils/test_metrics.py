@@ -0,0 +1,48 @@
+import pytest
+
+from agentlego.utils.metrics import MetricsRegistry
+
+
+def test_metrics_render():
+    registry = MetricsRegistry()
+    counter = registry.counter('calls_total', 'The calls.', ('tool', ))
+    histogram = registry.histogram(
+        'call_seconds', 'The durations.', ('tool', ), buckets=(0.1, 1.))
+    counter.inc(tool='a')
+    counter.inc(2, tool='a')
+    histogram.observe(0.05, tool='a')
+    histogram.observe(0.5, tool='a')
+    histogram.observe(5, tool='a')
+
+    assert registry.counter('calls_total', 'The calls.') is counter
+    with pytest.raises(ValueError):
+        registry.gauge('calls_total', 'The calls.')
+    with pytest.raises(ValueError):
+        counter.inc(name='a')
+
+    lines = registry.render().splitlines()
+    assert '# TYPE calls_total counter' in lines
+    assert 'calls_total{tool="a"} 3' in lines
+    assert 'call_seconds_bucket{tool="a",le="0.1"} 1' in lines
+    assert 'call_seconds_bucket{tool="a",le="1"} 2' in lines
+    assert 'call_seconds_bucket{tool="a",le="+Inf"} 3' in lines
+    assert 'call_seconds_sum{tool="a"} 5.55' in lines
+    assert 'call_seconds_count{tool="a"} 3' in lines
+
+
+def test_metrics_merge():
+    worker = MetricsRegistry()
+    worker.counter('calls_total', 'The calls.', ('tool', )).inc(tool='a')
+    worker.histogram('call_seconds', 'The durations.').observe(0.5)
+
+    main = MetricsRegistry()
+    counter = main.counter('calls_total', 'The calls.', ('tool', ))
+    histogram = main.histogram('call_seconds', 'The durations.')
+    counter.inc(tool='a')
+
+    main.merge(worker.drain())
+    assert counter.get(tool='a') == 2
+    assert histogram.get() == (1, 0.5)
+    # The drained values are reset.
+    main.merge(worker.drain())
+    assert counter.get(tool='a') == 2